@@ -1,7 +1,36 @@
-from src.models.v_dev_engine import calculate_v_dev
-from src.models.geospatial_filter import is_near_infrastructure
+import os
+import pandas as pd
+from src.models.v_dev_engine import calculate_v_dev, calculate_v_dev_batch
+from src.models.geospatial_filter import is_near_infrastructure, near_infrastructure_batch, HOT_ZONE_M
+from src.models.baseline_store import FleetBaselineStore, BASELINE_STORE_PATH
+from src.models.zone_rules import load_zones
+
+def load_baseline(path=BASELINE_STORE_PATH):
+    """Loads the precomputed fleet baseline once at startup (None if it has not been built)."""
+    if not os.path.exists(path):
+        return None
+    store = FleetBaselineStore.load(path)
+    print(f"[+] Fleet baseline loaded: {len(store.acc.table):,} peer groups over {len(store.days)} day(s)")
+    return store
+
+def _fill_baseline(vessels, baseline):
+    # Peer-group stats from the store for vessels that do not carry their own
+    if baseline is None or 'type_avg_speed' in vessels:
+        return vessels
+    month = pd.to_datetime(vessels['timestamp']).dt.month.to_numpy() if 'timestamp' in vessels \
+        else pd.Timestamp.now(tz='UTC').month
+    found = baseline.lookup_batch(vessels['vessel_type'], vessels['lat'].to_numpy(), vessels['lon'].to_numpy(), month)
+    return vessels.assign(type_avg_speed=found['type_avg_speed'].to_numpy(),
+                          type_std_dev=found['type_std_dev'].fillna(0).to_numpy())
+
+def evaluate_gray_zone_risk(vessel_data, cable_coords, baseline=None):
+    # 0. Peer-group baseline from the fleet store when the caller does not pass one
+    if baseline is not None and 'type_avg_speed' not in vessel_data:
+        month = pd.Timestamp(vessel_data.get('timestamp', pd.Timestamp.now(tz='UTC'))).month
+        mu, sigma = baseline.lookup(vessel_data['vessel_type'], vessel_data['lat'], vessel_data['lon'], month)
+        vessel_data = {**vessel_data, 'type_avg_speed': mu if mu is not None else vessel_data['sog'],
+                       'type_std_dev': sigma or 0}
 
-def evaluate_gray_zone_risk(vessel_data, cable_coords):
     # 1. Check Speed Anomaly (Stage 2)
     v_score = calculate_v_dev(
         vessel_data['sog'], 
@@ -22,12 +51,40 @@ def evaluate_gray_zone_risk(vessel_data, cable_coords):
     return {
         "risk_detected": is_suspicious,
         "v_dev_score": round(v_score, 2),
-        "distance_deg": round(distance, 4)
+        "distance_m": round(distance, 1)
     }
 
+def evaluate_gray_zone_risk_batch(vessels, cables, buffer_m=HOT_ZONE_M, baseline=None):
+    """
+    Batch version of evaluate_gray_zone_risk for a live feed.
+    vessels: DataFrame (or dict of arrays) with lat, lon, sog, type_avg_speed, type_std_dev.
+    With a FleetBaselineStore, type_avg_speed/type_std_dev may be omitted and are
+    looked up from vessel_type (+ optional timestamp for the month) instead.
+    cables: {name: [(lon, lat), ...]} or a list of coordinate lists; prepared once and cached.
+    Returns one row per vessel with the risk decision and the distance in metres.
+    """
+    vessels = _fill_baseline(pd.DataFrame(vessels), baseline)
+
+    # 1. Check Speed Anomaly (Stage 2)
+    v_score = calculate_v_dev_batch(vessels['sog'], vessels['type_avg_speed'], vessels['type_std_dev'])
+
+    # 2. Check Proximity (Stage 3)
+    proximity = near_infrastructure_batch(vessels['lat'], vessels['lon'], cables, buffer_m=buffer_m)
+
+    # 3. Decision Logic (The Attribution Logic)
+    report = pd.DataFrame({
+        'risk_detected': (v_score > 3.0) & proximity['in_hot_zone'].to_numpy(),
+        'v_dev_score': v_score.round(2),
+        'distance_m': proximity['distance_m'].round(1).to_numpy(),
+        'nearest_cable': proximity['nearest_cable'].to_numpy(),
+    }, index=vessels.index)
+    if 'mmsi' in vessels:
+        report.insert(0, 'mmsi', vessels['mmsi'])
+    return report
+
 if __name__ == "__main__":
-    # Mock Scenario: Svalbard Cable
-    svalbard_cable = [(15.0, 78.0), (16.0, 78.5), (17.0, 79.0)]
+    # Mock Scenario: Svalbard Cable (route from config/zones.json)
+    svalbard_cable = [tuple(p) for p in load_zones()['svalbard_cable']['line']]
     
     # A ship that is slow AND near the cable
     test_ship = {
@@ -35,11 +92,23 @@ if __name__ == "__main__":
         'type_avg_speed': 14.5, 'type_std_dev': 1.1
     }
     
-    report = evaluate_gray_zone_risk(test_ship, svalbard_cable)
+    baseline = load_baseline()
+    report = evaluate_gray_zone_risk(test_ship, svalbard_cable, baseline=baseline)
     
     print("\n--- ATTRIBUTION REPORT ---")
     if report['risk_detected']:
         print(f"STATUS: [!] PRIORITY ALPHA - GRAY ZONE ACTIVITY DETECTED")
-        print(f"REASON: Speed Anomaly ({report['v_dev_score']}) inside Critical Buffer.")
+        print(f"REASON: Speed Anomaly ({report['v_dev_score']}) inside Critical Buffer ({report['distance_m']} m from cable).")
     else:
-        print("STATUS: Low Risk.")
\ No newline at end of file
+        print("STATUS: Low Risk.")
+
+    # Same decision for a batch of vessels against several cables
+    fleet = pd.DataFrame({
+        'mmsi': [257000001, 257000002, 257000003],
+        'lat': [78.48, 78.10, 79.60], 'lon': [15.95, 15.10, 12.00],
+        'sog': [2.2, 14.1, 1.5],
+        'type_avg_speed': [14.5, 14.5, 10.0], 'type_std_dev': [1.1, 1.1, 2.0],
+    })
+    cables = {'Svalbard-1': svalbard_cable, 'Svalbard-2': [(15.5, 78.2), (13.0, 77.0)]}
+    print("\n--- BATCH ATTRIBUTION REPORT ---")
+    print(evaluate_gray_zone_risk_batch(fleet, cables, baseline=baseline).to_string(index=False))
\ No newline at end of file
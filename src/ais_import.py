@@ -0,0 +1,30 @@
+"""
+Convert-once import: decodes daily AIS zips into the columnar store so every
+later scan (cable_scan, master_analyzer, pipeline_v3_kinetic) reads Parquet
+instead of inflating and re-parsing the CSV.
+
+Usage: python src/ais_import.py data/raw_ais/AIS_2024_01_*.zip
+"""
+import argparse
+from models.ais_archive import AISArchive, STORE_DIR
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert daily AIS zips into the columnar store.")
+    parser.add_argument('zips', nargs='+', help="Daily AIS_YYYY_MM_DD.zip files")
+    parser.add_argument('--store', default=STORE_DIR, help=f"Store directory (default: {STORE_DIR})")
+    parser.add_argument('--force', action='store_true', help="Re-convert days that are already in the store")
+    args = parser.parse_args()
+
+    archive = AISArchive(args.store)
+    print(f"[*] Importing {len(args.zips)} daily file(s) into {args.store}...")
+    for zip_path in sorted(args.zips):
+        try:
+            archive.import_zip(zip_path, overwrite=args.force)
+        except Exception as e:
+            print(f"[!] Failed to convert {zip_path}: {e}")
+
+    total = sum(p['rows'] for p in archive.partitions.values())
+    print(f"\n[+] Store holds {len(archive.partitions)} day(s), {total:,} rows.")
+
+if __name__ == "__main__":
+    main()
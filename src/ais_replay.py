@@ -0,0 +1,92 @@
+"""
+Replays archived daily AIS zips as a live feed, for testing the streaming
+monitor offline. Rows go out in BaseDateTime order as CSV lines (header
+first) at an accelerated speed, either to each client of a TCP server or
+appended to a file that stream_monitor.py --tail follows.
+
+Usage:
+    python src/ais_replay.py data/raw_ais/AIS_2024_01_19.zip --speed 600 --port 10110
+    python src/ais_replay.py data/raw_ais/AIS_2024_01_19.zip --speed 0 --out data/live_feed.csv
+"""
+import sys
+import time
+import asyncio
+import argparse
+from itertools import chain
+from models.ais_stream import replay_blocks, paced
+
+DEFAULT_PORT = 10110  # Conventional AIS/NMEA-over-TCP port
+
+
+def _blocks(paths, bbox):
+    return chain.from_iterable(replay_blocks(p, bbox) for p in sorted(paths))
+
+
+async def replay_to_file(paths, speed, out, bbox=None):
+    f = sys.stdout if out == '-' else open(out, 'a')
+    sent, started = 0, time.perf_counter()
+    try:
+        async for lines in paced(_blocks(paths, bbox), speed):
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            sent += len(lines)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return sent, time.perf_counter() - started
+
+
+async def serve(paths, speed, host, port, bbox=None, once=False):
+    """TCP server; every client gets its own replay from the start of the first day."""
+    done = asyncio.Event()
+
+    async def handle(reader, writer):
+        peer = writer.get_extra_info('peername')
+        print(f"[*] Client {peer} connected, replaying at {speed:g}x...")
+        sent, started = 0, time.perf_counter()
+        try:
+            async for lines in paced(_blocks(paths, bbox), speed):
+                writer.write(('\n'.join(lines) + '\n').encode())
+                await writer.drain()
+                sent += len(lines)
+        except (ConnectionResetError, BrokenPipeError):
+            print(f"[-] Client {peer} disconnected")
+        finally:
+            writer.close()
+            elapsed = time.perf_counter() - started
+            print(f"[+] {peer}: {sent:,} lines in {elapsed:.1f}s ({sent / max(elapsed, 1e-9):,.0f}/s)")
+            if once:
+                done.set()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"[*] Serving {len(paths)} day(s) on {host}:{port}")
+    async with server:
+        if once:
+            await done.wait()
+        else:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay daily AIS zips as an accelerated live feed.")
+    parser.add_argument('zips', nargs='+', help="Daily AIS_YYYY_MM_DD.zip files (or CSV/NMEA recordings)")
+    parser.add_argument('--speed', type=float, default=60.0, help="x real time (0 = as fast as possible)")
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('LON_MIN', 'LAT_MIN', 'LON_MAX', 'LAT_MAX'))
+    parser.add_argument('--out', help="Append to this file ('-' for stdout) instead of serving TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--once', action='store_true', help="Exit after the first client's replay ends")
+    args = parser.parse_args()
+
+    try:
+        if args.out:
+            sent, elapsed = asyncio.run(replay_to_file(args.zips, args.speed, args.out, args.bbox))
+            print(f"[+] {sent:,} lines in {elapsed:.1f}s ({sent / max(elapsed, 1e-9):,.0f}/s)", file=sys.stderr)
+        else:
+            asyncio.run(serve(args.zips, args.speed, args.host, args.port, args.bbox, args.once))
+    except KeyboardInterrupt:
+        print("\n[*] Replay stopped.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
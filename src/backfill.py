@@ -0,0 +1,207 @@
+"""
+Day-parallel backfill over an AIS archive range.
+Fans the daily zips (or their converted partitions) out to a process pool.
+Each worker evaluates every zone rule of config/zones.json (models.zone_rules)
+on one day in a single pass and stores that day's hits, tagged by ZONE and
+RULE, plus a per-type SpeedAccumulator under OUTPUT_DIR/days. The parent
+then reduces the days into one hit table and one merged baseline, and
+reports per-worker throughput.
+
+Runs are incremental and resumable: a job ledger (models.job_ledger) skips
+days whose zip and configuration are unchanged since they last completed,
+and each worker checkpoints every chunk, so a failed day resumes where it
+stopped. Re-running a year after one corrected day reprocesses that day only.
+
+Usage: python src/backfill.py --start 2024-01-01 --end 2024-01-31 --workers 32 [--zones config/zones.json] [--force]
+"""
+import os
+import time
+import argparse
+import functools
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from models.ais_reader import AISReader, write_csv
+from models.baseline_stats import SpeedAccumulator
+from models.baseline_store import FleetBaselineStore
+from models.zone_rules import ZoneRuleEngine, ZONES_PATH
+from models.job_ledger import JobLedger, ChunkCheckpoint, config_fingerprint, file_signature, file_sha256
+
+RAW_DIR = 'data/raw_ais'
+OUTPUT_DIR = 'data/backfill'
+LEDGER_NAME = '_ledger.json'
+PARTS_DIR = '_parts'  # Chunk checkpoints of days in progress
+DAYS_DIR = 'days'     # Per-day hits (.parquet) and speed statistics (.stats.json)
+
+def daily_paths(start, end, raw_dir=RAW_DIR):
+    """AIS_YYYY_MM_DD.zip paths for every day in [start, end] (missing days are skipped)."""
+    paths = []
+    for day in pd.date_range(start, end, freq='D'):
+        path = os.path.join(raw_dir, day.strftime('AIS_%Y_%m_%d.zip'))
+        if os.path.exists(path):
+            paths.append(path)
+        else:
+            print(f"[!] Missing daily file: {path}")
+    return paths
+
+def _type_keys(vessel_type):
+    # Same string keys as v_dev_engine's CSV-based baseline ('' for a blank type)
+    return vessel_type.astype('string').fillna('').to_numpy(dtype=object)
+
+def job_config(zones_path, baseline_path=None):
+    """Fingerprint of everything besides the day zips that shapes the output."""
+    baseline = {'path': baseline_path, **file_signature(baseline_path)} if baseline_path else None
+    return config_fingerprint({'zones': file_sha256(zones_path), 'baseline': baseline})
+
+@functools.lru_cache(maxsize=None)
+def load_engine(zones_path, baseline_path=None):
+    # Compiled once per worker process (the STRtree is rebuilt, not pickled)
+    baseline = FleetBaselineStore.load(baseline_path) if baseline_path else None
+    return ZoneRuleEngine.load(zones_path, baseline=baseline)
+
+def scan_day(zip_path, zones_path=ZONES_PATH, baseline_path=None, output_dir=OUTPUT_DIR, config=None):
+    """
+    Worker: every (zone, rule) hit for one day, plus the per-type speed
+    statistics of the in-zone pings, written under output_dir/days.
+    Resumes from the day's last checkpointed chunk.
+    """
+    t0 = time.perf_counter()
+    engine = load_engine(zones_path, baseline_path)
+    name = JobLedger.key(zip_path)
+
+    # Converted days read only the rows of tiles some zone touches (one read for all zones);
+    # raw zips are decoded once. Either way each batch is evaluated against every rule at once.
+    reader = AISReader(zip_path)
+    batches = reader.batches(bbox=engine.bbox(), tiles=engine.tiles) if reader.source == 'archive' \
+        else reader.batches()
+    ckpt = ChunkCheckpoint(os.path.join(output_dir, PARTS_DIR, name), zip_path, tag=f"{reader.source}:{config}")
+    resumed = ckpt.done
+    for i, batch in ckpt.resume(batches):
+        out, pings = engine.evaluate(batch, in_zone=True)
+        # Speed statistics cover every in-zone ping once, whatever the rules matched
+        stats = SpeedAccumulator().update(_type_keys(pings['VesselType']), pings['SOG'])
+        ckpt.save(i, out, stats=stats.table)
+
+    hits = list(ckpt.frames())
+    acc = SpeedAccumulator()
+    for table in ckpt.frames('stats'):
+        acc.merge(SpeedAccumulator(table))
+
+    day_dir = os.path.join(output_dir, DAYS_DIR)
+    os.makedirs(day_dir, exist_ok=True)
+    outputs = [os.path.join(day_dir, f"{name}.stats.json")]
+    acc.save(outputs[0] + '.tmp')
+    os.replace(outputs[0] + '.tmp', outputs[0])
+    hits = pd.concat(hits, ignore_index=True) if hits else None
+    if hits is not None:
+        outputs.append(os.path.join(day_dir, f"{name}.parquet"))
+        hits.to_parquet(outputs[1] + '.tmp')
+        os.replace(outputs[1] + '.tmp', outputs[1])
+    ckpt.clear()
+
+    elapsed = time.perf_counter() - t0
+    return {
+        'path': zip_path,
+        'day': os.path.basename(zip_path),
+        'pid': os.getpid(),
+        'rows': reader.rows_scanned,
+        'seconds': elapsed,
+        'resumed_chunks': resumed,
+        'hit_rows': 0 if hits is None else len(hits),
+        'outputs': outputs,
+    }
+
+def load_day(entry):
+    """(hits or None, SpeedAccumulator) of one completed day from its ledger entry."""
+    hits, acc = None, SpeedAccumulator()
+    for path in entry['outputs']:
+        if path.endswith('.parquet'):
+            hits = pd.read_parquet(path)
+        else:
+            acc = SpeedAccumulator.load(path)
+    return hits, acc
+
+def run_backfill(start, end, zones_path=ZONES_PATH, baseline_path=None, workers=os.cpu_count(),
+                 raw_dir=RAW_DIR, output_dir=OUTPUT_DIR, force=False):
+    paths = daily_paths(start, end, raw_dir)
+    if not paths:
+        print("[-] No daily files in range.")
+        return None, None
+
+    # Compile in the parent first so a bad config fails before the pool starts
+    engine = load_engine(zones_path, baseline_path)
+    config = job_config(zones_path, baseline_path)
+    ledger = JobLedger(os.path.join(output_dir, LEDGER_NAME), config=config)
+    todo = paths if force else ledger.pending(paths)
+    print(f"[*] {len(paths) - len(todo)} of {len(paths)} day(s) already current in the ledger.")
+    t0 = time.perf_counter()
+    per_worker = {}
+
+    if todo:
+        print(f"[*] Backfilling {len(todo)} day(s) x {len(engine.zone_names)} zone(s) x "
+              f"{len(engine.rule_names)} rule(s) on {workers} worker(s)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(scan_day, p, zones_path, baseline_path, output_dir, config): p for p in todo}
+            for fut in as_completed(futures):
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    # The day's finished chunks stay checkpointed; the next run resumes it
+                    print(f"[!] {futures[fut]} failed: {e}")
+                    ledger.forget(futures[fut])
+                    continue
+                ledger.complete(res['path'], outputs=res['outputs'], rows_out=res['hit_rows'],
+                                rows_scanned=res['rows'])
+
+                w = per_worker.setdefault(res['pid'], {'days': 0, 'rows': 0, 'seconds': 0.0})
+                w['days'] += 1
+                w['rows'] += res['rows']
+                w['seconds'] += res['seconds']
+                resumed = f", resumed after chunk {res['resumed_chunks']}" if res['resumed_chunks'] else ""
+                print(f"    {res['day']}: {res['rows']:,} rows in {res['seconds']:.1f}s "
+                      f"({res['rows'] / max(res['seconds'], 1e-9):,.0f} rows/s, pid {res['pid']}{resumed})")
+
+    wall = time.perf_counter() - t0
+
+    # Reduce step over every completed day in range: append hits, merge the per-day statistics
+    hits, baseline = [], SpeedAccumulator()
+    for path in paths:
+        entry = ledger.entry(path)
+        if entry is None:
+            continue
+        day_hits, acc = load_day(entry)
+        if day_hits is not None:
+            hits.append(day_hits)
+        baseline.merge(acc)
+    hits = pd.concat(hits, ignore_index=True).sort_values('BaseDateTime', kind='stable', ignore_index=True) \
+        if hits else pd.DataFrame()
+
+    os.makedirs(output_dir, exist_ok=True)
+    if len(hits):
+        write_csv(hits, os.path.join(output_dir, 'zone_hits.csv'))
+    baseline.save(os.path.join(output_dir, 'speed_baseline.json'))
+
+    if per_worker:
+        print("\n--- WORKER THROUGHPUT ---")
+        print(f"{'PID':<8} | {'Days':<5} | {'Rows':<14} | {'Rows/s'}")
+        print("-" * 48)
+        for pid, w in sorted(per_worker.items()):
+            print(f"{pid:<8} | {w['days']:<5} | {w['rows']:<14,} | {w['rows'] / max(w['seconds'], 1e-9):,.0f}")
+        total_rows = sum(w['rows'] for w in per_worker.values())
+        print(f"\n[+] {total_rows:,} rows in {wall:.1f}s wall ({total_rows / max(wall, 1e-9):,.0f} rows/s aggregate)")
+    if len(hits):
+        print(hits.groupby(['ZONE', 'RULE']).size().rename('pings').to_string())
+    return hits, baseline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel AIS backfill over a date range.")
+    parser.add_argument('--start', required=True, help="First day, YYYY-MM-DD")
+    parser.add_argument('--end', required=True, help="Last day, YYYY-MM-DD")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--raw-dir', default=RAW_DIR)
+    parser.add_argument('--out', default=OUTPUT_DIR)
+    parser.add_argument('--zones', default=ZONES_PATH, help="Zone and rule config (JSON)")
+    parser.add_argument('--baseline', default=None, help="Fleet baseline .npz for v_dev_min rules")
+    parser.add_argument('--force', action='store_true', help="Reprocess every day, ignoring the ledger")
+    args = parser.parse_args()
+    run_backfill(args.start, args.end, zones_path=args.zones, baseline_path=args.baseline,
+                 workers=args.workers, raw_dir=args.raw_dir, output_dir=args.out, force=args.force)
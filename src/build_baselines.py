@@ -0,0 +1,70 @@
+"""
+Offline build of the fleet speed-baseline store (VesselType x tile x month).
+Incremental: days already folded into the store are skipped, so the nightly
+run only pays for the new files. A job ledger keyed on each zip's
+size/mtime/SHA-256 spots a corrected day; its old contribution (kept per day
+under <store>_days/) is taken back out before the new one is folded in.
+
+Usage: python src/build_baselines.py data/raw_ais/AIS_2024_01_*.zip
+"""
+import os
+import argparse
+from models.ais_reader import AISReader
+from models.ais_archive import partition_name
+from models.baseline_store import FleetBaselineStore, BASELINE_STORE_PATH
+from models.job_ledger import JobLedger, state_ledger_path
+
+BASELINE_COLUMNS = ['BaseDateTime', 'LAT', 'LON', 'SOG', 'VesselType']
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or extend the fleet speed-baseline store.")
+    parser.add_argument('zips', nargs='+', help="Daily AIS_YYYY_MM_DD.zip files")
+    parser.add_argument('--store', default=BASELINE_STORE_PATH, help=f"Baseline file (default: {BASELINE_STORE_PATH})")
+    parser.add_argument('--rebuild', action='store_true', help="Start from an empty store")
+    args = parser.parse_args()
+
+    if os.path.exists(args.store) and not args.rebuild:
+        store = FleetBaselineStore.load(args.store)
+        print(f"[*] Extending baseline store ({len(store.days)} day(s) already folded in)")
+    else:
+        store = FleetBaselineStore()
+
+    ledger = JobLedger(state_ledger_path(args.store))
+    if args.rebuild:
+        ledger.files = {}
+    day_dir = os.path.splitext(args.store)[0] + '_days'
+
+    for zip_path in sorted(args.zips):
+        day = partition_name(zip_path)
+        if day in store.days and ledger.entry(zip_path) is None:
+            # Folded in before the ledger existed: its current content is taken as the folded one
+            ledger.complete(zip_path)
+        if ledger.is_current(zip_path):
+            print(f"[*] {day} already in baseline, skipping.")
+            continue
+        day_path = os.path.join(day_dir, f"{day}.npz")
+        if day in store.days:
+            if not os.path.exists(day_path):
+                print(f"[!] {day} changed since it was folded in, but its contribution was not kept; "
+                      f"run with --rebuild to replace it.")
+                continue
+            print(f"[!] {day} changed since it was folded in; replacing its contribution.")
+            store.remove(FleetBaselineStore.load(day_path))
+
+        # Each day is kept on its own as well, so a corrected file can be taken back out
+        day_store = FleetBaselineStore(days=[day], tile_deg=store.tile_deg)
+        reader = AISReader(zip_path, usecols=BASELINE_COLUMNS)
+        for batch in reader.batches():
+            day_store.update(batch)
+        os.makedirs(day_dir, exist_ok=True)
+        day_store.save(day_path)
+        store.merge(day_store)
+        # Save after every day so an interrupted build keeps its progress
+        store.save(args.store)
+        ledger.complete(zip_path, outputs=[day_path], rows_scanned=reader.rows_scanned)
+        print(f"[+] {day}: folded {reader.rows_scanned:,} pings into the baseline")
+
+    print(f"\n[+] Baseline store: {len(store.acc.table):,} peer groups over {len(store.days)} day(s) -> {args.store}")
+
+if __name__ == "__main__":
+    main()
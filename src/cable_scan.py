@@ -1,6 +1,9 @@
-import zipfile
-import csv
-import io
+import os
+import sys
+import pandas as pd
+from models.ais_reader import AISReader, write_csv, AIS_SCHEMA
+from models.job_ledger import JobLedger, ChunkCheckpoint, config_fingerprint
+from models.zone_rules import zone_bbox
 
 ZIP_PATH = 'data/raw_ais/AIS_2024_01_19.zip'
 OUTPUT_PATH = 'data/cable_suspects.csv'
@@ -15,45 +18,46 @@ The landing site at Lynn, MA (Zone 19) was selected due to its role as a primary
 4. Analytical Objective: To identify "Type 31" (Towing/Tug) vessels—as seen in the GULF DAWN sample—operating at speeds below the fleet mean ($V_{avg}$) within the security perimeter.
 """
 
-LAT_MIN, LAT_MAX = 42.40, 42.50
-LON_MIN, LON_MAX = -71.00, -70.80
+ZONE = 'lynn_hibernia'  # The box itself is defined once, in config/zones.json
+BBOX = zone_bbox(ZONE)
 
-hits = []
+LEDGER_PATH = 'data/cable_scan_ledger.json'
+PARTS_DIR = 'data/_parts/cable_scan'  # Chunk checkpoints of an interrupted scan
 
-print("Starting scan of 5+ million rows. This may take 2-3 minutes...")
+# The ledger skips the scan when this zip and box already produced OUTPUT_PATH (one day per output);
+# an interrupted scan resumes from its last checkpointed chunk.
+ledger = JobLedger(LEDGER_PATH, config=config_fingerprint(ZIP_PATH, BBOX, OUTPUT_PATH))
+if ledger.is_current(ZIP_PATH):
+    entry = ledger.entry(ZIP_PATH)
+    print(f"[*] {ZIP_PATH} unchanged since {entry['completed']}: {entry['rows_out']} pings in {OUTPUT_PATH}")
+    sys.exit(0)
 
-try:
-    with zipfile.ZipFile(ZIP_PATH, 'r') as z:
-        csv_name = z.namelist()[0]
-        with z.open(csv_name) as f:
-            wrapper = io.TextIOWrapper(f, encoding='utf-8')
-            reader = csv.DictReader(wrapper)
-            
-            headers = reader.fieldnames
-            count = 0
-            
-            for row in reader:
-                count += 1
-                lat = float(row['LAT'])
-                lon = float(row['LON'])
-                
-                # Check if the ship is in our "Cable Hot Zone"
-                if LAT_MIN <= lat <= LAT_MAX and LON_MIN <= lon <= LON_MAX:
-                    hits.append(row)
-                
-                if count % 1000000 == 0:
-                    print(f"Scanned {count} rows...")
-
-    # Save the results
-    if hits:
-        with open(OUTPUT_PATH, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(hits)
-        print(f"\n[!] Success! Found {len(hits)} pings near the cable landing.")
-        print(f"Results saved to: {OUTPUT_PATH}")
-    else:
-        print("\nNo ships found in the landing zone for this day.")
+print("Starting chunked scan of the daily AIS file...")
+
+reader = AISReader(ZIP_PATH)
+ckpt = ChunkCheckpoint(os.path.join(PARTS_DIR, JobLedger.key(ZIP_PATH)), ZIP_PATH, tag=reader.source)
+if ckpt.done:
+    print(f"[*] Resuming after {ckpt.done} checkpointed chunk(s)")
 
+try:
+    for i, batch in ckpt.resume(reader.batches(bbox=BBOX)):
+        # Check if the ship is in our "Cable Hot Zone" (vectorized bbox mask)
+        ckpt.save(i, batch)
+        print(f"Scanned {reader.rows_scanned} rows...")
 except Exception as e:
-    print(f"Error during scan: {e}")
\ No newline at end of file
+    print(f"[!] Scan failed after {ckpt.done} chunk(s): {e}. Re-run to resume from there.")
+    raise
+
+# Save the results (a day without hits still replaces the previous report, header only)
+hits = list(ckpt.frames())
+if hits:
+    # Converted partitions are tile-ordered; restore time order for the report
+    hits = pd.concat(hits, ignore_index=True).sort_values('BaseDateTime', kind='stable', ignore_index=True)
+    print(f"\n[!] Success! Found {len(hits)} pings near the cable landing.")
+else:
+    hits = pd.DataFrame(columns=list(reader.usecols or AIS_SCHEMA))
+    print("\nNo ships found in the landing zone for this day.")
+write_csv(hits, OUTPUT_PATH)
+print(f"Results saved to: {OUTPUT_PATH}")
+ledger.complete(ZIP_PATH, outputs=[OUTPUT_PATH], rows_out=len(hits), rows_scanned=reader.rows_scanned)
+ckpt.clear()
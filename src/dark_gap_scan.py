@@ -0,0 +1,79 @@
+"""
+Nightly AIS dark-gap scan.
+Builds each day's per-MMSI timeline in one pass, finds transmission gaps that
+bracket a pipeline/cable corridor, and appends them to data/dark_gaps.csv.
+The detector state (last fix per vessel, days done) is saved after every
+day, so runs are incremental and gaps spanning midnight are not lost. A job
+ledger keyed on each zip's size/mtime/SHA-256 skips unchanged days and
+re-scans a corrected one, replacing the rows it appended.
+
+Usage: python src/dark_gap_scan.py data/raw_ais/AIS_2024_01_*.zip
+"""
+import os
+import argparse
+from models.ais_reader import AISReader
+from models.ais_archive import partition_name
+from models.infrastructure import get_registry, PIPE_ZIP, CABLE_ZIP
+from models.timeline import VesselTimeline, TIMELINE_COLUMNS
+from models.dark_gaps import DarkGapDetector, DARK_GAP_S, CORRIDOR_M, DARK_STATE_PATH
+from models.job_ledger import JobLedger, state_ledger_path, csv_rows
+
+OUTPUT_PATH = 'data/dark_gaps.csv'
+
+def load_infrastructure():
+    # Pipes and cables in one engine (INFRA_ID 'pipe:i' / 'cable:i'), local UTM zone
+    return get_registry(PIPE_ZIP, CABLE_ZIP).engine(('pipe', 'cable'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Find AIS dark gaps that bracket infrastructure corridors.")
+    parser.add_argument('zips', nargs='+', help="Daily AIS_YYYY_MM_DD.zip files, processed in date order")
+    parser.add_argument('--min-gap-hours', type=float, default=DARK_GAP_S / 3600)
+    parser.add_argument('--corridor-m', type=float, default=CORRIDOR_M)
+    parser.add_argument('--state', default=DARK_STATE_PATH)
+    args = parser.parse_args()
+
+    detector = DarkGapDetector(load_infrastructure(), min_gap_s=args.min_gap_hours * 3600,
+                               corridor_m=args.corridor_m).load_state(args.state)
+
+    ledger = JobLedger(state_ledger_path(args.state))
+    rows = csv_rows(OUTPUT_PATH)
+
+    for zip_path in sorted(args.zips):
+        day = partition_name(zip_path)
+        if day in detector.days and ledger.entry(zip_path) is None:
+            # Scanned before the ledger existed: its current content is taken as the scanned one
+            ledger.complete(zip_path)
+        if ledger.is_current(zip_path):
+            print(f"[*] {day} already scanned, skipping.")
+            continue
+        corrected = day in detector.days
+        if corrected:
+            dropped = ledger.drop_rows(zip_path, OUTPUT_PATH)
+            rows -= dropped or 0
+            note = "its earlier rows stay in the output" if dropped is None else f"{dropped} earlier row(s) replaced"
+            print(f"[!] {day} changed since it was scanned; re-scanning it ({note}).")
+            # Scanned on its own: the carried fixes belong to a later day
+            held, detector.carry = detector.carry, None
+        elif detector.days and day < max(detector.days):
+            print(f"[!] {day} is older than the last scanned day; gaps across it may be missed.")
+
+        print(f"[*] Building per-MMSI timeline for {day}...")
+        reader = AISReader(zip_path, usecols=TIMELINE_COLUMNS)
+        timeline = VesselTimeline.from_batches(reader.batches())
+        gaps = detector.process(timeline)
+        if corrected:
+            detector.carry = held
+
+        if len(gaps):
+            gaps.to_csv(OUTPUT_PATH, mode='a', header=not os.path.exists(OUTPUT_PATH), index=False)
+        detector.days.add(day)
+        detector.save_state(args.state)
+        ledger.complete(zip_path, row_start=rows, rows_out=len(gaps), rows_scanned=reader.rows_scanned)
+        rows += len(gaps)
+        print(f"[+] {day}: {len(timeline):,} fixes, {len(timeline.vessels):,} vessels, "
+              f"{len(gaps)} dark gap(s) near infrastructure")
+
+    print(f"\n[+] Dark gaps appended to {OUTPUT_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Daily ship-to-ship encounter scan.
+Finds pairs of vessels that stay close together inside the pipeline/cable
+corridor (a tug or support vessel meeting the suspect ship) and appends one
+row per encounter episode to data/encounters.csv, flagging episodes that
+involve a towing vessel or tug. Vessel positions are compared at common time
+slices through a spatial hash, never all pairs. State (last fix per vessel,
+episodes still open at midnight) is saved after every day, so runs are
+incremental; --final closes the episodes still open after the last day.
+A job ledger keyed on each zip's size/mtime/SHA-256 skips unchanged days
+and re-scans a corrected one, replacing the rows it appended.
+
+Usage: python src/encounter_scan.py data/raw_ais/AIS_2024_01_*.zip [--final]
+"""
+import os
+import time
+import argparse
+import pandas as pd
+from models.ais_reader import AISReader
+from models.ais_archive import partition_name
+from models.infrastructure import get_registry, PIPE_ZIP, CABLE_ZIP
+from models.timeline import VesselTimeline, TIMELINE_COLUMNS
+from models.encounters import (EncounterDetector, ENCOUNTER_M, MIN_ENCOUNTER_S, CORRIDOR_M, SLICE_S,
+                               ENCOUNTER_STATE_PATH)
+from models.job_ledger import JobLedger, state_ledger_path, csv_rows
+
+OUTPUT_PATH = 'data/encounters.csv'
+
+def read_day(zip_path):
+    """(timeline, {MMSI: VesselType}) for one daily file, in one pass."""
+    batches = list(AISReader(zip_path, usecols=TIMELINE_COLUMNS + ['VesselType']).batches())
+    types = pd.concat([b[['MMSI', 'VesselType']].dropna() for b in batches]) if batches else pd.DataFrame()
+    types = types.drop_duplicates('MMSI', keep='last') if len(types) else types
+    return VesselTimeline.from_batches(iter(batches)), dict(zip(types.get('MMSI', []), types.get('VesselType', [])))
+
+def append(encounters, path):
+    if len(encounters):
+        encounters.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Find ship-to-ship encounters near pipelines and cables.")
+    parser.add_argument('zips', nargs='*', help="Daily AIS_YYYY_MM_DD.zip files, processed in date order")
+    parser.add_argument('--layers', nargs='+', default=['pipe', 'cable'], choices=['pipe', 'cable'])
+    parser.add_argument('--distance-m', type=float, default=ENCOUNTER_M, help="Vessels closer than this are together")
+    parser.add_argument('--min-minutes', type=float, default=MIN_ENCOUNTER_S / 60)
+    parser.add_argument('--corridor-m', type=float, default=CORRIDOR_M)
+    parser.add_argument('--slice-s', type=int, default=SLICE_S, help="Time step at which vessels are compared")
+    parser.add_argument('--final', action='store_true', help="Close episodes still open after the last day")
+    parser.add_argument('--state', default=ENCOUNTER_STATE_PATH)
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    infra = get_registry(PIPE_ZIP, CABLE_ZIP).engine(tuple(args.layers))
+    detector = EncounterDetector(infra, encounter_m=args.distance_m, min_duration_s=args.min_minutes * 60,
+                                 corridor_m=args.corridor_m, slice_s=args.slice_s).load_state(args.state)
+
+    ledger = JobLedger(state_ledger_path(args.state))
+    rows = csv_rows(args.output)
+
+    for zip_path in sorted(args.zips):
+        day = partition_name(zip_path)
+        if day in detector.days and ledger.entry(zip_path) is None:
+            # Scanned before the ledger existed: its current content is taken as the scanned one
+            ledger.complete(zip_path)
+        if ledger.is_current(zip_path):
+            print(f"[*] {day} already scanned, skipping.")
+            continue
+        corrected = day in detector.days
+        if corrected:
+            dropped = ledger.drop_rows(zip_path, args.output)
+            rows -= dropped or 0
+            note = "its earlier rows stay in the output" if dropped is None else f"{dropped} earlier row(s) replaced"
+            print(f"[!] {day} changed since it was scanned; re-scanning it ({note}).")
+            # Scanned on its own: the carried fixes and open episodes belong to a later day
+            held = detector.carry, detector.open
+            detector.carry = detector.open = None
+        elif detector.days and day < max(detector.days):
+            print(f"[!] {day} is older than the last scanned day; encounters across it may be missed.")
+
+        print(f"[*] Building per-MMSI timeline for {day}...")
+        timeline, types = read_day(zip_path)
+        started = time.perf_counter()
+        encounters = detector.process(timeline, types)
+        elapsed = time.perf_counter() - started
+        if corrected:
+            # Episodes still open at the end of the corrected day are not carried on
+            detector.carry, detector.open = held
+
+        append(encounters, args.output)
+        detector.days.add(day)
+        detector.save_state(args.state)
+        ledger.complete(zip_path, row_start=rows, rows_out=len(encounters), rows_scanned=len(timeline))
+        rows += len(encounters)
+        s = detector.stats
+        print(f"[+] {day}: {s['corridor_fixes']:,} corridor fixes -> {s['candidates']:,} hashed pairs -> "
+              f"{s['contacts']:,} contacts -> {len(encounters)} encounter(s) "
+              f"({int(encounters['SUPPORT_VESSEL'].sum())} with a tug/towing vessel) in {elapsed:.2f}s")
+
+    if args.final:
+        encounters = detector.flush()
+        append(encounters, args.output)
+        rows += len(encounters)
+        detector.save_state(args.state)
+        print(f"[+] {len(encounters)} encounter(s) still open at the end closed")
+
+    print(f"\n[+] Encounters appended to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,63 @@
-import requests
+"""
+Lists Sentinel-1 passes over the study area.
+Refreshes the local SAR catalogue (data/sar_catalog.sqlite) from the CDSE
+STAC API - paginated, tiled and concurrent, skipping tiles still within their
+TTL - and prints the passes from the local index.
 
-# The modern CDSE STAC V1 Endpoint
-URL = "https://stac.dataspace.copernicus.eu/v1/search"
-
-# We want "Ground Range Detected" (GRD) for ship detection
-COLLECTION = "SENTINEL-1-GRD" 
+Usage: python src/find_sar_stac.py [--url STAC_URL] [--force] [--at LON LAT TIME]
+"""
+import argparse
+import pandas as pd
+from models.sar_catalog import SARCatalog, STAC_URL, COLLECTION, CATALOG_PATH
 
 # Broadened to cover the entire coast of Massachusetts
-BBOX = [-71.5, 41.5, -69.5, 43.5] 
+BBOX = [-71.5, 41.5, -69.5, 43.5]
 # Search from Jan 1 to Feb 15
-DATETIME = "2024-01-01T00:00:00Z/2024-02-15T23:59:59Z"
-
-def find_sar_v1():
-    print(f"[*] Querying {COLLECTION} via new V1 API...")
-    
-    payload = {
-        "collections": [COLLECTION],
-        "bbox": BBOX,
-        "datetime": DATETIME,
-        "limit": 50
-    }
+START = "2024-01-01T00:00:00Z"
+END = "2024-02-15T23:59:59Z"
+
 
+def find_sar_v1(url=STAC_URL, force=False, db_path=CATALOG_PATH):
+    print(f"[*] Querying {COLLECTION} via V1 API ({url})...")
+    catalog = SARCatalog(db_path, url=url)
     try:
-        response = requests.post(URL, json=payload, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
-        features = data.get('features', [])
-        
-        if not features:
-            print("[!] Still no results. Checking if S1A had an outage...")
-            return
-
-        print(f"\n[!] Success! Found {len(features)} SAR passes in January:")
-        print(f"{'Date/Time (UTC)':<25} | {'Product ID'}")
-        print("-" * 80)
-        
-        for feat in features:
-            dt = feat['properties'].get('datetime', 'N/A')
-            pid = feat['id']
-            print(f"{dt:<25} | {pid}")
-            
-    except Exception as e:
-        print(f"API Error: {e}")
+        queried = catalog.refresh(BBOX, START, END, force=force)
+        print(f"[*] {queried} catalogue tiles refreshed (others still within TTL)")
+        scenes = catalog.scenes(BBOX, START, END)
+    finally:
+        catalog.close()
+
+    if scenes.empty:
+        print("[!] Still no results. Checking if S1A had an outage...")
+        return scenes
+
+    print(f"\n[!] Success! Found {len(scenes)} SAR passes:")
+    print(f"{'Date/Time (UTC)':<25} | {'Product ID'}")
+    print("-" * 80)
+    for dt, pid in zip(scenes['datetime'], scenes['scene_id']):
+        print(f"{dt:<25} | {pid}")
+    return scenes
+
+
+def passes_at(lon, lat, when, db_path=CATALOG_PATH):
+    catalog = SARCatalog(db_path)
+    try:
+        hits = catalog.covering_passes(lon, lat, pd.Timestamp(when))
+    finally:
+        catalog.close()
+    print(f"\n[*] Passes covering ({lon}, {lat}) within 12h of {when}: {len(hits)}")
+    for dt, pid in zip(hits['datetime'], hits['scene_id']):
+        print(f"    {dt:<25} | {pid}")
+    return hits
+
 
 if __name__ == "__main__":
-    find_sar_v1
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Refresh and list the local Sentinel-1 catalogue.")
+    parser.add_argument('--url', default=STAC_URL, help="STAC search endpoint (e.g. a local mock server)")
+    parser.add_argument('--force', action='store_true', help="Re-query tiles even if still within TTL")
+    parser.add_argument('--at', nargs=3, metavar=('LON', 'LAT', 'TIME'), help="Also list passes covering a point")
+    args = parser.parse_args()
+
+    find_sar_v1(args.url, args.force)
+    if args.at:
+        passes_at(float(args.at[0]), float(args.at[1]), args.at[2])
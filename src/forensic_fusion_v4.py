@@ -1,134 +1,134 @@
-import os, requests
+import os, argparse, requests
+import numpy as np
 import pandas as pd
-import geopandas as gpd
-import matplotlib.pyplot as plt
-from io import BytesIO
-from PIL import Image
-from shapely.geometry import Point
-from shapely.ops import nearest_points
 from dotenv import load_dotenv
+from models.ais_reader import AISReader
+from models.sar_evidence import SAREvidenceFetcher, CHIP_OFFSET_DEG
+from models.evidence_render import render_batch, DPI
+from models.timeline import VesselTimeline
+from models.interpolate import positions_at
 
 load_dotenv()
 CLIENT_ID = os.getenv("SH_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SH_CLIENT_SECRET")
+OUTPUT_DIR = "output/final_evidence"
+RAW_DIR = "data/raw_ais"
+SAR_TIME = pd.Timestamp("2021-01-25 14:10:00")  # Acquisition of the DANIT scene
+AIS_WINDOW = pd.Timedelta(minutes=10)           # Dead-reckoning horizon around the pass
 
-def get_token():
-    auth_url = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token"
-    resp = requests.post(auth_url, data={"grant_type": "client_credentials", "client_id": CLIENT_ID, "client_secret": CLIENT_SECRET})
-    return resp.json().get("access_token")
+def place_at(track, mmsi, when):
+    """Position of one vessel at `when` from its pings (MMSI, BaseDateTime, LAT, LON[, SOG, COG])."""
+    at = positions_at(VesselTimeline.from_frame(track), [mmsi], when,
+                      max_extrapolate_s=AIS_WINDOW.total_seconds()).iloc[0]
+    return None if at['METHOD'] == 'none' else at
+
+def place_at_passes(passes, raw_dir=RAW_DIR):
+    """
+    Every event vessel at its pass's exact SAR_TIME, from that day's AIS (one
+    read and one batch interpolation per pass day). Adds AIS_LAT, AIS_LON,
+    RADIUS_M and METHOD; NaN where the vessel cannot be placed.
+    """
+    passes = passes.reset_index(drop=True)
+    when = pd.to_datetime(passes['SAR_TIME'], utc=True).dt.tz_localize(None)
+    out = pd.DataFrame({'AIS_LAT': np.nan, 'AIS_LON': np.nan, 'RADIUS_M': np.nan, 'METHOD': 'none'},
+                       index=passes.index)
+    if 'MMSI' not in passes:
+        return out
+    mmsi = pd.to_numeric(passes['MMSI'], errors='coerce')
+    for day, rows in passes[mmsi.notna()].groupby(when.dt.normalize()):
+        zip_path = os.path.join(raw_dir, day.strftime('AIS_%Y_%m_%d.zip'))
+        if not os.path.exists(zip_path):
+            print(f"[!] Missing daily file: {zip_path} (event positions used)")
+            continue
+        bbox = [rows['LON'].min() - CHIP_OFFSET_DEG, rows['LAT'].min() - CHIP_OFFSET_DEG,
+                rows['LON'].max() + CHIP_OFFSET_DEG, rows['LAT'].max() + CHIP_OFFSET_DEG]
+        t = when[rows.index]
+        pings = AISReader(zip_path).scan(bbox=bbox, start=t.min() - AIS_WINDOW, end=t.max() + AIS_WINDOW)
+        if pings.empty:
+            continue
+        at = positions_at(VesselTimeline.from_frame(pings), mmsi[rows.index].astype(np.int64), t.to_numpy(),
+                          max_extrapolate_s=AIS_WINDOW.total_seconds())
+        out.loc[rows.index, ['AIS_LAT', 'AIS_LON', 'RADIUS_M', 'METHOD']] = \
+            at[['LAT', 'LON', 'RADIUS_M', 'METHOD']].to_numpy()
+    return out
+
+def generate_forensic_evidence(fetcher=None, dpi=DPI, sar_time=SAR_TIME):
+    # One fetcher (token, pooled session, chip cache) can be shared across calls
+    fetcher = fetcher or SAREvidenceFetcher(CLIENT_ID, CLIENT_SECRET)
 
-def generate_forensic_evidence():
-    token = get_token()
-    
     # 1. LOAD DATA & TARGET CENTROID
     df = pd.read_csv("data/kinetic_sync_list.csv")
-    ship_data = df[df['VESSEL_NAME'].str.contains("DANIT", case=False, na=False)].iloc[0]
+    track = df[df['VESSEL_NAME'].str.contains("DANIT", case=False, na=False)]
+    ship_data = track.iloc[0]
     lat_s, lon_s = ship_data['LAT'], ship_data['LON']
+    # Ship position at the acquisition time, not whichever ping matched first
+    at = place_at(track.rename(columns={'TIMESTAMP': 'BaseDateTime', 'SPEED': 'SOG'}), ship_data['MMSI'], sar_time)
+    if at is not None:
+        lat_s, lon_s = at['LAT'], at['LON']
+        print(f"[*] Ship at {sar_time}: {lat_s:.5f}, {lon_s:.5f} +/- {at['RADIUS_M']:.0f} m ({at['METHOD']})")
+    else:
+        print(f"[!] No DANIT ping within {AIS_WINDOW} of {sar_time}; using its first sync-list position")
     
     # Focus Zoom: Adjusted to keep the ship and pipeline segment centered
     offset = 0.025 
     bbox = [lon_s - offset, lat_s - offset, lon_s + offset, lat_s + offset]
 
-    # 2. SAR API REQUEST
-    payload = {
-        "input": {
-            "bounds": {"bbox": bbox, "properties": {"crs": "http://www.opengis.net/def/crs/OGC/1.3/CRS84"}},
-            "data": [{"type": "S1GRD", "dataFilter": {
-                "timeRange": {"from": "2021-01-24T00:00:00Z", "to": "2021-01-26T23:59:59Z"},
-                "mosaickingOrder": "mostRecent"
-            }}]
-        },
-        "output": {"width": 1024, "height": 1024, "responses": [{"identifier": "default", "format": {"type": "image/png"}}]},
-        "evalscript": """
-        //VERSION=3
-        function setup() { return { input: ["VV"], output: { bands: 1, sampleType: "AUTO" } }; }
-        function evaluatePixel(sample) {
-          let db = 10 * Math.log10(Math.max(0.0001, sample.VV));
-          return [(db + 20) / 25]; 
-        }
-        """
-    }
-
+    # 2. SAR CHIP (served from data/sar_chips when already downloaded)
     print("[*] Requesting SAR Imagery...")
-    resp = requests.post("https://sh.dataspace.copernicus.eu/api/v1/process", 
-                         headers={"Authorization": f"Bearer {token}"}, json=payload)
-    
-    if resp.status_code != 200:
-        print(f"[-] API Error: {resp.text}")
+    try:
+        chip_path, cached = fetcher.fetch(bbox, "2021-01-24T00:00:00Z", "2021-01-26T23:59:59Z")
+    except requests.RequestException as e:
+        print(f"[-] API Error: {e}")
         return
+    if cached:
+        print(f"[*] Using cached chip: {chip_path}")
 
-    sar_img = Image.open(BytesIO(resp.content))
+    # 3. FORENSIC PLOT (headless; standoff to the nearest pipe computed by the renderer)
+    job = {'chip_path': chip_path, 'bbox': bbox, 'lat': lat_s, 'lon': lon_s,
+           'sar_time': f"{sar_time:%Y-%m-%d %H:%M} UTC",
+           'out_path': f"{OUTPUT_DIR}/FORENSIC_FUSION_FINAL.png"}
+    if at is not None:
+        job['radius_m'], job['method'] = at['RADIUS_M'], at['METHOD']
+    result = render_batch('forensic', [job], workers=1, dpi=dpi)[0]
+    if result:
+        print(f"[!!!] Evidence Locked: {result[1]:.2f}m standoff.")
 
-    # 3. FIXED GEOSPATIAL MATH (Connecting Ship to Pipe)
-    pipes_raw = gpd.read_file("zip://data/infrastructure/pc_pipe.zip").to_crs(epsg=4326)
-    ship_pt = Point(lon_s, lat_s)
-    
-    # Merge all pipeline segments into one geometry to find the absolute nearest point
-    pipeline_union = pipes_raw.unary_union
-    # Find the nearest points: p_src (on ship), p_pipe (on pipeline)
-    p_src, p_pipe = nearest_points(ship_pt, pipeline_union)
-    lon_p, lat_p = p_pipe.x, p_pipe.y
-
-    # Calculate distance in meters for the legend using a metric projection (EPSG:3857)
-    pipes_m = pipes_raw.to_crs(epsg=3857)
-    ship_pt_m = gpd.GeoSeries([ship_pt], crs=4326).to_crs(epsg=3857).iloc[0]
-    dist_meters = pipes_m.distance(ship_pt_m).min()
-
-    # 4. THE FORENSIC PLOT
-    fig, ax = plt.subplots(figsize=(14, 14), facecolor='black')
-    
-    # Layer 1: SAR Image
-    ax.imshow(sar_img, cmap='magma', extent=[bbox[0], bbox[2], bbox[1], bbox[3]], 
-              origin='upper', zorder=1)
-    
-    # Layer 2: Pipeline (Red Line)
-    pipes_raw.plot(ax=ax, color='#FF3B30', linewidth=4, alpha=0.9, label='San Pedro Pipeline Corridor', zorder=2)
-    
-    # Layer 3: THE YELLOW CONNECTION LINE
-    # This now uses p_pipe coordinates to ensure it touches the red line
-    ax.plot([lon_s, lon_p], [lat_s, lat_p], color='yellow', linestyle='--', linewidth=3, 
-            marker='o', markersize=6, label='Forensic Standoff Vector', zorder=6)
-
-    # Add the meter label directly next to the line
-    ax.text((lon_s + lon_p)/2, (lat_s + lat_p)/2 + 0.001, f"{dist_meters:.1f}m", 
-            color='yellow', fontweight='bold', ha='center', fontsize=12,
-            bbox=dict(facecolor='black', alpha=0.7, edgecolor='none'))
-
-    # Layer 4: MSC DANIT AIS Center
-    ax.scatter(lon_s, lat_s, color='#00FFFF', s=300, edgecolors='white', marker='P', label='MSC DANIT (AIS)', zorder=7)
-
-    # 5. AXES & LABELS
-    ax.tick_params(axis='both', colors='white', labelsize=10)
-    ax.set_xlabel("Longitude", color='white')
-    ax.set_ylabel("Latitude", color='white')
-    for spine in ax.spines.values():
-        spine.set_edgecolor('#444444')
-
-    # 6. UPDATED TECHNICAL LEGEND (Removed Elly)
-    tech_legend = (
-        f"--- FORENSIC ATTRIBUTION DATA ---\n"
-        f"SAR ACQUISITION: 2021-01-25 14:10 UTC\n"
-        f"VESSEL: MSC DANIT (9618288)\n"
-        f"SHIP POSITION: {lat_s:.5f}, {lon_s:.5f}\n"
-        f"NEAREST PIPE INTERCEPT: {lat_p:.5f}, {lon_p:.5f}\n"
-        f"CALCULATED DISTANCE: {dist_meters:.2f} meters\n"
-        f"PROXIMITY STATUS: CRITICAL THREAT"
-    )
-    
-    ax.text(0.02, 0.02, tech_legend, transform=ax.transAxes, color='white', fontsize=12,
-            family='monospace', bbox=dict(facecolor='black', alpha=0.8, edgecolor='#00FFFF'))
-
-    ax.set_xlim(bbox[0], bbox[2])
-    ax.set_ylim(bbox[1], bbox[3])
-    
-    plt.legend(loc='upper right', facecolor='black', labelcolor='white', fontsize=11)
-    
-    save_path = "output/final_evidence/FORENSIC_FUSION_FINAL.png"
-    os.makedirs("output/final_evidence", exist_ok=True)
-    plt.savefig(save_path, dpi=300, facecolor='black', bbox_inches='tight')
-    
-    print(f"[!!!] Evidence Locked: {dist_meters:.2f}m standoff.")
-    plt.show()
+def render_event_evidence(passes_path, workers=os.cpu_count(), dpi=DPI, raw_dir=RAW_DIR):
+    """One forensic figure per fetched event/pass chip (output of sar_event_join.py --fetch)."""
+    passes = pd.read_csv(passes_path)
+    passes = passes[passes['CHIP_PATH'].notna()].drop_duplicates(['EVENT_ID', 'CHIP_PATH']).reset_index(drop=True)
+    # The vessel is drawn where AIS puts it at the acquisition time (event position as fallback)
+    placed = place_at_passes(passes, raw_dir)
+    print(f"[*] {int((placed['METHOD'] != 'none').sum())} of {len(passes)} vessels placed at their pass time")
+    offset = CHIP_OFFSET_DEG  # Same extent the fetcher requested
+    jobs = []
+    for ev, at in zip(passes.itertuples(index=False), placed.itertuples(index=False)):
+        name = ev.VESSEL_NAME if isinstance(getattr(ev, 'VESSEL_NAME', None), str) else 'UNKNOWN'
+        job = {
+            'chip_path': ev.CHIP_PATH,
+            'bbox': [ev.LON - offset, ev.LAT - offset, ev.LON + offset, ev.LAT + offset],
+            'lat': ev.LAT, 'lon': ev.LON,
+            'vessel': f"{name} ({getattr(ev, 'MMSI', 'N/A')})",
+            'sar_time': ev.SAR_TIME,
+            'out_path': f"{OUTPUT_DIR}/event_{ev.EVENT_ID}_{ev.SCENE_ID}.png",
+        }
+        if at.METHOD != 'none':
+            job.update(lat=at.AIS_LAT, lon=at.AIS_LON, radius_m=at.RADIUS_M, method=at.METHOD)
+        jobs.append(job)
+    print(f"[*] Rendering {len(jobs)} evidence figures on {workers} worker(s) at {dpi} dpi...")
+    results = render_batch('forensic', jobs, workers=workers, dpi=dpi)
+    print(f"[+] {sum(r is not None for r in results)} figures written to {OUTPUT_DIR}")
+    return results
 
 if __name__ == "__main__":
-    generate_forensic_evidence()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Render SAR + AIS + pipeline forensic evidence.")
+    parser.add_argument('--passes', help="Render every fetched chip in this event/pass table instead of the DANIT case")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--dpi', type=int, default=DPI)
+    parser.add_argument('--sar-time', default=str(SAR_TIME), help="DANIT case: scene acquisition time (UTC)")
+    args = parser.parse_args()
+
+    if args.passes:
+        render_event_evidence(args.passes, args.workers, args.dpi)
+    else:
+        generate_forensic_evidence(dpi=args.dpi, sar_time=pd.Timestamp(args.sar_time))
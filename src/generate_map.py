@@ -1,47 +1,71 @@
-import csv
+"""
+Map export of flagged pings for Google Earth (KML) or web maps (GeoJSON,
+pre-tiled z/x/y GeoJSON). Points are streamed to disk chunk by chunk; with
+--tracks, pings are collapsed into one LineString per vessel track, and
+--cluster-zoom merges nearby pings into counted clusters.
+
+Usage:
+    python src/generate_map.py                                  # data/cable_anomalies.kml
+    python src/generate_map.py --tracks --format geojson -o data/cable_anomalies.geojson
+    python src/generate_map.py --format tiles -o data/anomaly_tiles --max-zoom 12 --tracks
+"""
+import argparse
+from models.map_export import (read_table, export_points_kml, export_points_geojson, export_kml, export_geojson,
+                               export_tiles, TRACK_GAP_S)
 
 INPUT_PATH = 'data/anomalies_flagged.csv'
 OUTPUT_PATH = 'data/cable_anomalies.kml'
+MAP_NAME = 'Maritime Gray-Zone Anomalies'
+MAP_DESCRIPTION = 'Vessels flagged for loitering near Lynn, MA Cable Landing'
 
-def create_kml():
-    kml_header = """<?xml version="1.0" encoding="UTF-8"?>
-<kml xmlns="http://www.opengis.net/kml/2.2">
-<Document>
-    <name>Maritime Gray-Zone Anomalies</name>
-    <description>Vessels flagged for loitering near Lynn, MA Cable Landing</description>
-"""
-    kml_footer = """</Document>
-</kml>"""
+def create_kml(input_path=INPUT_PATH, output_path=OUTPUT_PATH):
+    """One placemark per flagged ping (the original export), streamed to disk."""
+    n = export_points_kml(input_path, output_path, MAP_NAME, MAP_DESCRIPTION)
+    print(f"[!] KML file generated: {output_path} ({n:,} placemarks)")
+    print("You can now drag this file into Google Earth (Web or Desktop) to see the locations.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export flagged pings as KML, GeoJSON or GeoJSON tiles.")
+    parser.add_argument('input', nargs='?', default=INPUT_PATH)
+    parser.add_argument('-o', '--output', help="Output file (directory for --format tiles)")
+    parser.add_argument('--format', choices=['kml', 'geojson', 'tiles'], default='kml')
+    parser.add_argument('--tracks', action='store_true', help="Collapse pings into per-vessel track LineStrings")
+    parser.add_argument('--gap-hours', type=float, default=TRACK_GAP_S / 3600, help="Silence that splits a track")
+    parser.add_argument('--cluster-zoom', type=int, help="Cluster pings on the screen grid of this zoom level")
+    parser.add_argument('--min-zoom', type=int, default=0)
+    parser.add_argument('--max-zoom', type=int, default=12)
+    parser.add_argument('--cluster-below', type=int, default=10, help="Tiles below this zoom hold clusters")
+    args = parser.parse_args()
 
-    placemarks = ""
-    
+    output = args.output or {'kml': OUTPUT_PATH, 'geojson': 'data/cable_anomalies.geojson',
+                             'tiles': 'data/anomaly_tiles'}[args.format]
+    gap_s = args.gap_hours * 3600
     try:
-        with open(INPUT_PATH, mode='r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                name = row['VesselName']
-                lat = row['LAT']
-                lon = row['LON']
-                mmsi = row['MMSI']
-                z = row['Z_Score']
-                
-                placemarks += f"""
-    <Placemark>
-        <name>{name}</name>
-        <description>MMSI: {mmsi} | Z-Score: {z} | Status: {row['Status']}</description>
-        <Point>
-            <coordinates>{lon},{lat},0</coordinates>
-        </Point>
-    </Placemark>"""
-        
-        with open(OUTPUT_PATH, 'w') as f:
-            f.write(kml_header + placemarks + kml_footer)
-            
-        print(f"[!] KML file generated: {OUTPUT_PATH}")
-        print("You can now drag this file into Google Earth (Web or Desktop) to see the locations.")
+        if not args.tracks and args.cluster_zoom is None and args.format != 'tiles':
+            # Plain point export: never loads the whole table
+            if args.format == 'kml':
+                create_kml(args.input, output)
+            else:
+                n = export_points_geojson(args.input, output)
+                print(f"[+] GeoJSON generated: {output} ({n:,} features)")
+            return
+
+        df = read_table(args.input)
+        print(f"[*] {len(df):,} flagged pings from {df['MMSI'].nunique():,} vessels")
+        if args.format == 'tiles':
+            n = export_tiles(df, output, args.min_zoom, args.max_zoom, args.cluster_below,
+                             tracks=args.tracks, gap_s=gap_s)
+            print(f"[+] {n:,} tiles written under {output} (zoom {args.min_zoom}-{args.max_zoom})")
+        elif args.format == 'kml':
+            n = export_kml(df, output, MAP_NAME, MAP_DESCRIPTION, tracks=args.tracks,
+                           cluster_zoom=args.cluster_zoom, gap_s=gap_s)
+            print(f"[!] KML file generated: {output} ({n:,} placemarks)")
+        else:
+            n = export_geojson(df, output, tracks=args.tracks, cluster_zoom=args.cluster_zoom, gap_s=gap_s)
+            print(f"[+] GeoJSON generated: {output} ({n:,} features)")
 
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    create_kml()
\ No newline at end of file
+    main()
@@ -1,17 +1,19 @@
-import zipfile
-import io
-import csv
 import os
+import pandas as pd
 from datetime import datetime, timedelta
+from models.ais_reader import AISReader, write_csv
+from models.timeline import VesselTimeline
+from models.interpolate import vessels_at
+from models.zone_rules import zone_bbox
 
 # --- SETTINGS ---
 ZIP_PATH = 'data/raw_ais/AIS_2024_01_31.zip'
 OUTPUT_DIR = 'data'
-CABLE_LAT_MIN, CABLE_LAT_MAX = 42.40, 42.50
-CABLE_LON_MIN, CABLE_LON_MAX = -71.00, -70.80
+CABLE_ZONE = 'lynn_hibernia'  # Hibernia landing box, defined in config/zones.json
+CABLE_BBOX = zone_bbox(CABLE_ZONE)
 
 SAR_TIMESTAMP = datetime.strptime("2024-01-31 22:43:47", "%Y-%m-%d %H:%M:%S")
-SAR_WINDOW = timedelta(minutes=5)
+SAR_WINDOW = timedelta(minutes=5)  # Dead-reckoning horizon around a vessel's nearest fix
 
 def run_master_analysis():
     if not os.path.exists(OUTPUT_DIR): os.makedirs(OUTPUT_DIR)
@@ -23,63 +25,45 @@ def run_master_analysis():
     print("[*] Filtering for Cable Zone and SAR Synchronization window...")
 
     try:
-        with zipfile.ZipFile(ZIP_PATH, 'r') as z:
-            csv_name = z.namelist()[0]
-            with z.open(csv_name) as f:
-                wrapper = io.TextIOWrapper(f, encoding='utf-8')
-                reader = csv.DictReader(wrapper)
-                
-                headers = reader.fieldnames
-                count = 0
-                
-                for row in reader:
-                    count += 1
-                    lat = float(row['LAT'])
-                    lon = float(row['LON'])
-                    
-                    # 1. Spatial Filter: Is it near the cable?
-                    if CABLE_LAT_MIN <= lat <= CABLE_LAT_MAX and CABLE_LON_MIN <= lon <= CABLE_LON_MAX:
-                        hits.append(row)
-                        
-                        # 2. SAR Sync Filter: Was it there during the satellite pass?
-                        # Format: 2024-01-31T22:43:47
-                        ts_str = row['BaseDateTime'].replace('T', ' ')
-                        vessel_time = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                        
-                        if (SAR_TIMESTAMP - SAR_WINDOW) <= vessel_time <= (SAR_TIMESTAMP + SAR_WINDOW):
-                            sar_sync_list.append(row)
-
-                    if count % 1000000 == 0:
-                        print(f"Scanned {count} million rows...")
+        reader = AISReader(ZIP_PATH)
+        # 1. Spatial Filter: Is it near the cable? (vectorized bbox mask per chunk)
+        for batch in reader.batches(bbox=CABLE_BBOX):
+            if len(batch):
+                hits.append(batch)
+            print(f"Scanned {reader.rows_scanned // 1000000} million rows...")
+        count = reader.rows_scanned
 
         # --- PROCESS HITS FOR LOITERING ---
         if hits:
+            # Converted partitions are tile-ordered; restore time order for the report
+            hits = pd.concat(hits, ignore_index=True).sort_values('BaseDateTime', kind='stable', ignore_index=True)
+
+            # 2. SAR Sync: where was each vessel at the exact acquisition time?
+            #    (interpolated between its fixes, or dead-reckoned up to SAR_WINDOW)
+            at_pass = vessels_at(VesselTimeline.from_frame(hits), SAR_TIMESTAMP,
+                                 max_extrapolate_s=SAR_WINDOW.total_seconds())
+            names = hits.drop_duplicates('MMSI', keep='last').set_index('MMSI')['VesselName']
+            sar_sync_list = at_pass.rename(columns={'TIME': 'BaseDateTime'})
+            sar_sync_list.insert(1, 'VesselName', sar_sync_list['MMSI'].map(names).to_numpy())
+
             # Save raw spatial hits
-            with open(f"{OUTPUT_DIR}/jan31_spatial_hits.csv", 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=headers)
-                writer.writeheader()
-                writer.writerows(hits)
+            write_csv(hits, f"{OUTPUT_DIR}/jan31_spatial_hits.csv")
 
             # Save SAR Sync hits
-            if sar_sync_list:
-                with open(f"{OUTPUT_DIR}/jan31_sar_sync_list.csv", 'w', newline='') as f:
-                    writer = csv.DictWriter(f, fieldnames=headers)
-                    writer.writeheader()
-                    writer.writerows(sar_sync_list)
+            if len(sar_sync_list):
+                write_csv(sar_sync_list, f"{OUTPUT_DIR}/jan31_sar_sync_list.csv")
 
             print(f"\n[!] ANALYSIS COMPLETE")
             print(f"Total rows scanned: {count}")
             print(f"Pings in Cable Zone: {len(hits)}")
             print(f"Vessels active during SAR pass: {len(sar_sync_list)}")
             
-            if sar_sync_list:
+            if len(sar_sync_list):
                 print("\n[!] SAR-SYNCED VESSELS (Jan 31 22:43):")
-                # Print unique vessels found during the pass
-                seen = set()
-                for v in sar_sync_list:
-                    if v['MMSI'] not in seen:
-                        print(f"- {v['VesselName']} (MMSI: {v['MMSI']}) at {v['LAT']}, {v['LON']}")
-                        seen.add(v['MMSI'])
+                # One position per vessel, with its uncertainty radius
+                for _, v in sar_sync_list.iterrows():
+                    print(f"- {v['VesselName']} (MMSI: {v['MMSI']}) at {v['LAT']}, {v['LON']} "
+                          f"+/- {v['RADIUS_M']:.0f} m ({v['METHOD']})")
         else:
             print("\n[!] No vessels found in the landing zone for Jan 31.")
 
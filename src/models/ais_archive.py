@@ -0,0 +1,222 @@
+"""
+Convert-once columnar AIS archive.
+Each daily AIS zip is decoded a single time into a Parquet partition under
+STORE_DIR. The manifest keeps per-partition min/max LAT/LON/time so queries
+can skip whole days, and Parquet row-group statistics let a query skip blocks
+inside a day. Rows are tile-sorted per chunk and a TileIndex (tile_index.py)
+maps each tile to its row ranges, so zone/corridor queries decode only the
+matching tiles. AISReader picks a partition up automatically when it exists.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+from .tile_index import TileIndex, TILE_DEG, tile_keys, run_lengths
+
+STORE_DIR = 'data/ais_store'
+MANIFEST_NAME = '_manifest.json'
+ROW_GROUP_SIZE = 32_000  # Pings per Parquet row group (the unit of skipping)
+
+
+def partition_name(zip_path):
+    """AIS_2024_01_19.zip -> AIS_2024_01_19"""
+    return os.path.splitext(os.path.basename(zip_path))[0]
+
+
+def _source_signature(zip_path):
+    st = os.stat(zip_path)
+    return {'source_size': st.st_size, 'source_mtime': int(st.st_mtime)}
+
+
+def ranges_overlap(lo, hi, q_lo, q_hi):
+    """True when [lo, hi] can intersect [q_lo, q_hi]. Query bounds may be None."""
+    if q_lo is not None and hi < q_lo:
+        return False
+    if q_hi is not None and lo > q_hi:
+        return False
+    return True
+
+
+class AISArchive:
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self.manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+        self.partitions = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.partitions = json.load(f)['partitions']
+
+    def _save_manifest(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'partitions': self.partitions}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def lookup(self, zip_path):
+        """
+        Returns the manifest entry for a converted zip, or None.
+        An entry is ignored if the source zip is still on disk and has changed since import.
+        """
+        entry = self.partitions.get(partition_name(zip_path))
+        if entry is None or not os.path.exists(os.path.join(self.store_dir, entry['file'])):
+            return None
+        if os.path.exists(zip_path):
+            sig = _source_signature(zip_path)
+            if sig['source_size'] != entry['source_size'] or sig['source_mtime'] != entry['source_mtime']:
+                return None
+        return entry
+
+    def import_zip(self, zip_path, overwrite=False):
+        """Decodes one daily zip into a Parquet partition and records its statistics."""
+        from .ais_reader import AISReader, AIS_SCHEMA
+
+        name = partition_name(zip_path)
+        if not overwrite and self.lookup(zip_path) is not None:
+            print(f"[*] {name} already converted, skipping.")
+            return self.partitions[name]
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        out_file = f"{name}.parquet"
+        tmp_path = os.path.join(self.store_dir, out_file + '.tmp')
+
+        index_file = f"{name}.tiles.npz"
+
+        stats = {'rows': 0}
+        tiles, starts, stops = [], [], []
+        writer = None
+        reader = AISReader(zip_path, store_dir=None)
+        for batch in reader.record_batches():
+            # Sort each chunk by tile so a tile occupies one contiguous run per chunk
+            keys = tile_keys(batch.column('LON').to_numpy(), batch.column('LAT').to_numpy())
+            order = np.argsort(keys, kind='stable')
+            batch = batch.take(pa.array(order))
+
+            t, a, b = run_lengths(keys[order], offset=stats['rows'])
+            tiles.append(t)
+            starts.append(a)
+            stops.append(b)
+
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, batch.schema, compression='zstd')
+            writer.write_batch(batch, row_group_size=ROW_GROUP_SIZE)
+            _update_stats(stats, batch)
+        if writer is None:
+            # A day without rows still gets its (empty) partition, so lookup() finds it and
+            # the zip is not decoded again on every scan
+            writer = pq.ParquetWriter(tmp_path, pa.schema(list(AIS_SCHEMA.items())), compression='zstd')
+        writer.close()
+        os.replace(tmp_path, os.path.join(self.store_dir, out_file))
+        TileIndex(*(np.concatenate(v) if v else [] for v in (tiles, starts, stops))).save(
+            os.path.join(self.store_dir, index_file))
+
+        entry = {'file': out_file, 'tile_index': index_file, 'tile_deg': TILE_DEG,
+                 'source': os.path.abspath(zip_path), **_source_signature(zip_path), **stats}
+        self.partitions[name] = entry
+        self._save_manifest()
+        print(f"[+] Converted {name}: {stats['rows']:,} rows -> {out_file}")
+        return entry
+
+    def partition_may_match(self, entry, bbox=None, start=None, end=None):
+        """Manifest-level pruning: can this day contain anything inside bbox/[start, end]?"""
+        if entry['rows'] == 0:
+            return False
+        if bbox is not None:
+            if not ranges_overlap(entry['lon_min'], entry['lon_max'], bbox[0], bbox[2]):
+                return False
+            if not ranges_overlap(entry['lat_min'], entry['lat_max'], bbox[1], bbox[3]):
+                return False
+        t_lo = None if start is None else pd.Timestamp(start)
+        t_hi = None if end is None else pd.Timestamp(end)
+        return ranges_overlap(pd.Timestamp(entry['t_min']), pd.Timestamp(entry['t_max']), t_lo, t_hi)
+
+    def open_partition(self, entry):
+        return pq.ParquetFile(os.path.join(self.store_dir, entry['file']))
+
+    def tile_index(self, entry):
+        """The partition's TileIndex, or None for partitions imported without one."""
+        path = os.path.join(self.store_dir, entry.get('tile_index', ''))
+        if not entry.get('tile_index') or not os.path.exists(path):
+            return None
+        return TileIndex.load(path)
+
+    def read_ranges(self, pf, starts, stops, row_groups=None, batch_rows=1_000_000, columns=None):
+        """
+        Yields Arrow tables holding only rows inside the merged [start, stop)
+        ranges. Only the row groups those ranges touch are decoded, optionally
+        restricted further to row_groups (from the statistics pruning).
+        """
+        md = pf.metadata
+        rg_bounds = np.zeros(md.num_row_groups + 1, dtype=np.int64)
+        rg_bounds[1:] = np.cumsum([md.row_group(i).num_rows for i in range(md.num_row_groups)])
+
+        first = np.searchsorted(rg_bounds, starts, side='right') - 1
+        last = np.searchsorted(rg_bounds, stops - 1, side='right') - 1
+        touched = np.unique(np.concatenate([np.arange(a, b + 1) for a, b in zip(first, last)] or [[]])).astype(int)
+        if row_groups is not None:
+            touched = np.intersect1d(touched, row_groups)
+
+        pending, pending_rows = [], 0
+        for i in touched:
+            lo, hi = rg_bounds[i], rg_bounds[i + 1]
+            sel = (starts < hi) & (stops > lo)
+            # +1 at each range start, -1 at each stop, cumsum > 0 marks rows inside a range
+            edges = np.zeros(hi - lo + 1, dtype=np.int32)
+            np.add.at(edges, np.clip(starts[sel] - lo, 0, hi - lo), 1)
+            np.add.at(edges, np.clip(stops[sel] - lo, 0, hi - lo), -1)
+            mask = np.cumsum(edges[:-1]) > 0
+
+            table = pf.read_row_group(int(i), columns=columns).filter(pa.array(mask))
+            pending.append(table)
+            pending_rows += table.num_rows
+            if pending_rows >= batch_rows:
+                yield pa.concat_tables(pending)
+                pending, pending_rows = [], 0
+        if pending:
+            yield pa.concat_tables(pending)
+
+    def row_groups(self, pf, bbox=None, start=None, end=None):
+        """Row-group level pruning: ids whose footer min/max may match the query."""
+        names = pf.schema_arrow.names
+        t_lo = None if start is None else pd.Timestamp(start)
+        t_hi = None if end is None else pd.Timestamp(end)
+
+        keep = []
+        for i in range(pf.metadata.num_row_groups):
+            rg = pf.metadata.row_group(i)
+            ok = True
+            if bbox is not None:
+                ok = _rg_overlap(rg, names, 'LON', bbox[0], bbox[2]) and _rg_overlap(rg, names, 'LAT', bbox[1], bbox[3])
+            if ok and (t_lo is not None or t_hi is not None):
+                ok = _rg_overlap(rg, names, 'BaseDateTime', t_lo, t_hi)
+            if ok:
+                keep.append(i)
+        return keep
+
+
+def _rg_overlap(rg, names, col, q_lo, q_hi):
+    s = rg.column(names.index(col)).statistics
+    if s is None or not s.has_min_max:
+        return True
+    lo, hi = s.min, s.max
+    if col == 'BaseDateTime':
+        lo, hi = pd.Timestamp(lo), pd.Timestamp(hi)
+    return ranges_overlap(lo, hi, q_lo, q_hi)
+
+
+def _update_stats(stats, batch):
+    if batch.num_rows == 0:
+        return
+    for col, key in (('LAT', 'lat'), ('LON', 'lon'), ('BaseDateTime', 't')):
+        mm = pc.min_max(batch.column(col))
+        lo, hi = mm['min'].as_py(), mm['max'].as_py()
+        if lo is None:
+            continue
+        if key == 't':
+            lo, hi = str(pd.Timestamp(lo)), str(pd.Timestamp(hi))
+        stats[f'{key}_min'] = lo if f'{key}_min' not in stats else min(stats[f'{key}_min'], lo)
+        stats[f'{key}_max'] = hi if f'{key}_max' not in stats else max(stats[f'{key}_max'], hi)
+    stats['rows'] += batch.num_rows
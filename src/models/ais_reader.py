@@ -0,0 +1,249 @@
+"""
+Shared AIS ingest engine.
+Decodes a MarineCadastre daily AIS zip in large blocks into typed columns, so
+every scanner filters with vectorized masks instead of calling float() per row.
+Memory is capped by CHUNK_BYTES, not by the size of the day file.
+When the day has been converted into the Parquet store (see ais_archive.py,
+src/ais_import.py) the reader serves it from there instead of the zip.
+"""
+import zipfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+from .ais_archive import AISArchive, STORE_DIR
+from .tile_index import tiles_for_bbox
+
+CHUNK_BYTES = 64 << 20  # ~64MB of CSV text per batch (roughly 600k pings)
+CHUNK_ROWS = 1_000_000  # Batch size when reading from the Parquet store
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"  # Format used by BaseDateTime in the raw CSVs
+
+# Typed schema for the daily CSV. BaseDateTime is parsed straight to datetime64.
+AIS_SCHEMA = {
+    'MMSI': pa.int64(),
+    'BaseDateTime': pa.timestamp('s'),
+    'LAT': pa.float64(),
+    'LON': pa.float64(),
+    'SOG': pa.float64(),
+    'COG': pa.float64(),
+    'Heading': pa.float64(),
+    'VesselName': pa.string(),
+    'IMO': pa.string(),
+    'CallSign': pa.string(),
+    'VesselType': pa.int16(),
+    'Status': pa.int16(),
+    'Length': pa.float64(),
+    'Width': pa.float64(),
+    'Draft': pa.float64(),
+    'Cargo': pa.string(),
+    'TransceiverClass': pa.string(),
+}
+
+# Rows missing any of these (after coercion) are dropped: nothing can place them
+REQUIRED_COLUMNS = ('MMSI', 'BaseDateTime', 'LAT', 'LON')
+
+# VesselType/Status are often blank: keep them as nullable ints so they
+# round-trip to CSV as "31" rather than "31.0".
+_PANDAS_TYPES = {pa.int16(): pd.Int16Dtype()}
+
+
+def _csv_member(z):
+    return [n for n in z.namelist() if n.endswith('.csv')][0]
+
+
+def bbox_mask(df, bbox):
+    """bbox: [lon_min, lat_min, lon_max, lat_max] (same order as the STAC BBOX)."""
+    lat = np.asarray(df['LAT'])
+    lon = np.asarray(df['LON'])
+    return (lat >= bbox[1]) & (lat <= bbox[3]) & (lon >= bbox[0]) & (lon <= bbox[2])
+
+
+def time_mask(df, start=None, end=None):
+    """Inclusive [start, end] window on BaseDateTime. Either bound may be None."""
+    t = df['BaseDateTime']
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (t >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (t <= pd.Timestamp(end)).to_numpy()
+    return mask
+
+
+def _skip_row(row):
+    # Malformed line (wrong field count): drop it, as the per-row scanners did
+    return 'skip'
+
+
+def _coerce_column(col, typ):
+    """
+    Text column -> typ. The plain Arrow cast handles clean blocks; a block with
+    an unparseable value falls back to element-wise coercion (bad value -> null).
+    """
+    if typ == pa.string():
+        return col.fill_null('')
+    try:
+        return pc.cast(col, typ)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        pass
+    if pa.types.is_timestamp(typ):
+        return pc.strptime(col, format=DATE_FORMAT, unit='s', error_is_null=True)
+    values = pd.to_numeric(col.to_pandas(), errors='coerce')
+    if pa.types.is_integer(typ):
+        info = np.iinfo(typ.to_pandas_dtype())
+        ok = (values % 1 == 0) & (values >= info.min) & (values <= info.max)
+        values = values.where(ok).astype('Int64')
+    return pa.array(values, type=typ, from_pandas=True)
+
+
+def _typed_batch(batch):
+    """
+    Casts a text record batch to AIS_SCHEMA and drops rows without MMSI, time or
+    position. Columns outside AIS_SCHEMA keep their inferred type, as when typed.
+    """
+    cols = [_coerce_column(batch.column(i), AIS_SCHEMA[name]) if name in AIS_SCHEMA else batch.column(i)
+            for i, name in enumerate(batch.schema.names)]
+    batch = pa.RecordBatch.from_arrays(cols, names=batch.schema.names)
+    required = [batch.column(n) for n in REQUIRED_COLUMNS if n in batch.schema.names]
+    if any(c.null_count for c in required):
+        keep = required[0].is_valid()
+        for c in required[1:]:
+            keep = pc.and_(keep, c.is_valid())
+        batch = batch.filter(keep)
+    return batch
+
+
+def to_frame(record_batch):
+    return record_batch.to_pandas(types_mapper=_PANDAS_TYPES.get)
+
+
+class AISReader:
+    """
+    Chunked reader for one daily AIS zip.
+    rows_scanned counts rows read so far, for progress reporting.
+    source is 'archive' when a converted partition is used, otherwise 'zip'.
+    Pass store_dir=None to force decoding the zip.
+    """
+
+    def __init__(self, zip_path, chunk_bytes=CHUNK_BYTES, usecols=None, store_dir=STORE_DIR):
+        self.zip_path = zip_path
+        self.chunk_bytes = chunk_bytes
+        self.usecols = usecols
+        self.rows_scanned = 0
+
+        self.archive = AISArchive(store_dir) if store_dir else None
+        self.archive_entry = self.archive.lookup(zip_path) if self.archive else None
+        self.source = 'archive' if self.archive_entry else 'zip'
+
+    def record_batches(self):
+        """
+        Decodes the zip into typed Arrow record batches (no filtering).
+        Corrupt lines do not abort the day: rows with the wrong number of
+        fields are skipped, and if a block holds an unparseable value the
+        decode restarts in a tolerant text mode from that block (bad values
+        become null; rows left without MMSI, time or position are dropped).
+        """
+        done = 0
+        try:
+            for batch in self._decode(typed=True):
+                yield batch
+                done += 1
+        except pa.ArrowInvalid as e:
+            print(f"[!] {self.zip_path}: {e}; re-reading from block {done} in tolerant mode")
+            # Blocks are cut from the raw bytes, so both modes see the same block boundaries
+            for i, batch in enumerate(self._decode(typed=False)):
+                if i >= done:
+                    yield _typed_batch(batch)
+
+    def _decode(self, typed):
+        read_opts = pacsv.ReadOptions(block_size=self.chunk_bytes)
+        parse_opts = pacsv.ParseOptions(invalid_row_handler=_skip_row)
+        if typed:
+            convert_opts = pacsv.ConvertOptions(
+                column_types=AIS_SCHEMA,
+                include_columns=self.usecols,
+                strings_can_be_null=False,
+            )
+        else:
+            # Everything as text (blank -> null), typed per block by _typed_batch
+            convert_opts = pacsv.ConvertOptions(
+                column_types={name: pa.string() for name in AIS_SCHEMA},
+                include_columns=self.usecols,
+                null_values=[''],
+                strings_can_be_null=True,
+            )
+        with zipfile.ZipFile(self.zip_path, 'r') as z:
+            with z.open(_csv_member(z)) as f:
+                yield from pacsv.open_csv(f, read_options=read_opts, parse_options=parse_opts,
+                                          convert_options=convert_opts)
+
+    def _archive_batches(self, bbox, start, end, tiles):
+        # Skip the whole day, then every row group, that cannot match
+        entry = self.archive_entry
+        if not self.archive.partition_may_match(entry, bbox, start, end):
+            return
+        pf = self.archive.open_partition(entry)
+        row_groups = self.archive.row_groups(pf, bbox, start, end)
+        if not row_groups:
+            return
+
+        # Then read only the row ranges of the tiles the query touches
+        index = self.archive.tile_index(entry)
+        if index is not None and tiles is None and bbox is not None:
+            tiles = tiles_for_bbox(bbox, index.tile_deg)
+        if index is not None and tiles is not None:
+            starts, stops = index.ranges(tiles)
+            if len(starts):
+                yield from self.archive.read_ranges(pf, starts, stops, row_groups,
+                                                    batch_rows=CHUNK_ROWS, columns=self.usecols)
+            return
+
+        yield from pf.iter_batches(batch_size=CHUNK_ROWS, row_groups=row_groups, columns=self.usecols)
+
+    def batches(self, bbox=None, start=None, end=None, tiles=None):
+        """
+        Yields typed DataFrame batches (one per chunk, possibly empty).
+        The spatial mask runs on the Arrow columns, so only surviving rows
+        are ever materialised as pandas objects.
+        tiles: optional tile keys (tile_index.tiles_for_geometry) limiting which
+        rows are read from a converted partition, e.g. for a pipeline corridor.
+        The zip path ignores it, so callers still apply their exact mask.
+        """
+        if self.archive_entry:
+            source = self._archive_batches(bbox, start, end, tiles)
+        else:
+            source = self.record_batches()
+
+        for batch in source:
+            self.rows_scanned += batch.num_rows
+
+            if bbox is not None:
+                cols = {'LAT': batch.column('LAT').to_numpy(), 'LON': batch.column('LON').to_numpy()}
+                batch = batch.filter(pa.array(bbox_mask(cols, bbox)))
+
+            df = to_frame(batch)
+            if start is not None or end is not None:
+                df = df[time_mask(df, start, end)].reset_index(drop=True)
+            yield df
+
+    def scan(self, bbox=None, start=None, end=None, tiles=None, progress=True):
+        """Collects every matching batch into one DataFrame."""
+        hits = []
+        for batch in self.batches(bbox=bbox, start=start, end=end, tiles=tiles):
+            hits.append(batch)
+            if progress:
+                print(f"    ...scanned {self.rows_scanned:,} rows")
+        return pd.concat(hits, ignore_index=True) if hits else pd.DataFrame()
+
+
+def read_head(zip_path, n=1):
+    """Returns (csv_name, first n rows as raw strings) without decoding the whole day."""
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        csv_name = _csv_member(z)
+        with z.open(csv_name) as f:
+            return csv_name, pd.read_csv(f, nrows=n, dtype=str, keep_default_na=False)
+
+
+def write_csv(df, path):
+    """Writes a hit table with BaseDateTime in the raw AIS format."""
+    df.to_csv(path, index=False, date_format=DATE_FORMAT)
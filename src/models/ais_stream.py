@@ -0,0 +1,316 @@
+"""
+Live AIS message sources and line parsing for the streaming monitor.
+Sources are async generators that yield (recv_t, lines): a block of text
+lines read together and the time.perf_counter() at which they arrived, so
+end-to-end latency can be measured from the moment a message reaches us.
+
+    socket_source  - TCP feed (AIS-catcher / gpsd / aggregator style)
+    tail_source    - a file another process keeps appending to
+    replay_source  - a CSV/NMEA file or a daily AIS zip, paced by timestamp
+
+Lines can be MarineCadastre CSV rows (header optional) or raw !AIVDM/!AIVDO
+sentences; LineParser tells them apart per line. NMEA position reports
+(types 1-3, 18, 19) and the static reports carrying the ship type (5, 19,
+24B) are decoded; everything else is skipped.
+"""
+import asyncio
+import csv
+import os
+import time
+import zipfile
+from datetime import datetime, timezone
+from functools import reduce
+from operator import xor
+import numpy as np
+from .ais_reader import AISReader, DATE_FORMAT
+from .tracks import epoch_seconds
+
+READ_BYTES = 1 << 16      # Socket / file read size
+TAIL_POLL_S = 0.2         # File tail poll interval when there is no new data
+FLUSH_LINES = 5_000       # Largest block a replay yields at once
+MAX_SLEEP_S = 1.0         # Replay pacing never sleeps longer than this between checks
+MAX_FRAGMENTS = 1_000     # Incomplete multi-sentence NMEA messages kept waiting
+CSV_COLUMNS = ['MMSI', 'BaseDateTime', 'LAT', 'LON', 'SOG', 'COG', 'Heading', 'VesselName',
+               'IMO', 'CallSign', 'VesselType', 'Status', 'Length', 'Width', 'Draft',
+               'Cargo', 'TransceiverClass']
+# Columns sent by ais_replay (a feed carries positions, not the full registry record)
+REPLAY_COLUMNS = ['MMSI', 'BaseDateTime', 'LAT', 'LON', 'SOG', 'COG', 'Heading',
+                  'VesselName', 'VesselType', 'Status', 'TransceiverClass']
+
+# NMEA "not available" values after scaling (position: lat 91 / lon 181)
+SOG_NA = 102.3
+COG_NA = 360.0
+HEADING_NA = 511
+
+_SIXBIT = {chr(c): (c - 48 if c - 48 < 40 else c - 56) for c in range(48, 120)}
+
+
+def _u(bits, n, start, length):
+    return (bits >> (n - start - length)) & ((1 << length) - 1)
+
+
+def _s(bits, n, start, length):
+    v = _u(bits, n, start, length)
+    return v - (1 << length) if v >> (length - 1) else v
+
+
+def _payload_bits(payload, fill):
+    bits = 0
+    for c in payload:
+        bits = (bits << 6) | _SIXBIT[c]
+    return bits >> fill, 6 * len(payload) - fill
+
+
+def _checksum_ok(body, checksum):
+    try:
+        return reduce(xor, body.encode('ascii'), 0) == int(checksum, 16)
+    except ValueError:
+        return False
+
+
+def _position(bits, n, sog_at, lon_at, lat_at, cog_at, hdg_at):
+    sog = _u(bits, n, sog_at, 10) / 10.0
+    lon = _s(bits, n, lon_at, 28) / 600000.0
+    lat = _s(bits, n, lat_at, 27) / 600000.0
+    cog = _u(bits, n, cog_at, 12) / 10.0
+    heading = _u(bits, n, hdg_at, 9)
+    return (lat, lon, np.nan if sog >= SOG_NA else sog, np.nan if cog >= COG_NA else cog,
+            np.nan if heading == HEADING_NA else float(heading))
+
+
+def decode_payload(payload, fill=0):
+    """
+    Decodes one (reassembled) AIVDM payload.
+    Returns (mmsi, lat, lon, sog, cog, heading, vessel_type): position fields
+    are None for static reports, vessel_type is None when the message has none.
+    Unsupported message types return None.
+    """
+    bits, n = _payload_bits(payload, fill)
+    msg_type = _u(bits, n, 0, 6)
+    mmsi = _u(bits, n, 8, 30)
+    if msg_type in (1, 2, 3) and n >= 137:
+        return (mmsi,) + _position(bits, n, 50, 61, 89, 116, 128) + (None,)
+    if msg_type == 18 and n >= 133:
+        return (mmsi,) + _position(bits, n, 46, 57, 85, 112, 124) + (None,)
+    if msg_type == 19 and n >= 271:
+        return (mmsi,) + _position(bits, n, 46, 57, 85, 112, 124) + (_u(bits, n, 263, 8),)
+    if msg_type == 5 and n >= 240:
+        return (mmsi, None, None, None, None, None, _u(bits, n, 232, 8))
+    if msg_type == 24 and n >= 48 and _u(bits, n, 38, 2) == 1:
+        return (mmsi, None, None, None, None, None, _u(bits, n, 40, 8))
+    return None
+
+
+def _iso_epoch(s):
+    return datetime.fromisoformat(s).replace(tzinfo=timezone.utc).timestamp()
+
+
+class LineParser:
+    """
+    Turns feed lines into message tuples
+        (mmsi, t, lat, lon, sog, cog, heading, vessel_type)
+    with t in epoch seconds. Static-only messages have lat None.
+    CSV rows follow the last header line seen (MarineCadastre order until then).
+    NMEA sentences take t from a \\c: tag block, else the wall clock on arrival;
+    multi-sentence messages are reassembled per (sequence id, channel).
+    """
+
+    def __init__(self):
+        self.columns = {name: i for i, name in enumerate(CSV_COLUMNS)}
+        self.fragments = {}
+        self.bad_lines = 0
+        self._last_iso = (None, None)
+
+    def parse(self, line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            if line[0] in '!\\$':
+                return self._nmea(line)
+            return self._csv(line)
+        except (ValueError, IndexError, KeyError):
+            self.bad_lines += 1
+            return None
+
+    def _csv(self, line):
+        fields = next(csv.reader([line])) if '"' in line else line.split(',')
+        if fields[0] == 'MMSI':
+            self.columns = {name: i for i, name in enumerate(fields)}
+            return None
+        col = self.columns
+        iso = fields[col['BaseDateTime']]
+        if iso != self._last_iso[0]:
+            # Feed rows arrive roughly in time order, so most share the previous second
+            self._last_iso = (iso, _iso_epoch(iso))
+        vtype = fields[col['VesselType']] if 'VesselType' in col else ''
+        sog = fields[col['SOG']]
+        cog = fields[col['COG']] if 'COG' in col else ''
+        heading = fields[col['Heading']] if 'Heading' in col else ''
+        return (int(fields[col['MMSI']]), self._last_iso[1], float(fields[col['LAT']]), float(fields[col['LON']]),
+                float(sog) if sog else np.nan, float(cog) if cog else np.nan,
+                float(heading) if heading else np.nan, int(vtype) if vtype else None)
+
+    def _nmea(self, line):
+        t = None
+        if line[0] == '\\':
+            # NMEA 4.0 tag block, e.g. \s:rORBCOMM,c:1706000000*5A\!AIVDM,...
+            tag, line = line[1:].split('\\', 1)
+            for item in tag.split('*')[0].split(','):
+                if item.startswith('c:'):
+                    t = float(item[2:])
+                    if t > 1e11:
+                        t /= 1000.0  # Some receivers stamp milliseconds
+        body, _, checksum = line[1:].partition('*')
+        if not body.startswith(('AIVDM', 'AIVDO')) or not _checksum_ok(body, checksum[:2]):
+            self.bad_lines += 1
+            return None
+        _, count, num, seq, channel, payload, fill = body.split(',')
+        count, num = int(count), int(num)
+        if count > 1:
+            key = (seq, channel)
+            parts = self.fragments.setdefault(key, [])
+            if num != len(parts) + 1:
+                # Lost or out-of-order fragment: start over from this one
+                parts.clear()
+                if num != 1:
+                    del self.fragments[key]
+                    return None
+            parts.append(payload)
+            if num < count:
+                if len(self.fragments) > MAX_FRAGMENTS:
+                    del self.fragments[next(iter(self.fragments))]
+                return None
+            payload = ''.join(self.fragments.pop(key))
+
+        msg = decode_payload(payload, int(fill or 0))
+        if msg is None:
+            return None
+        mmsi, lat, lon, sog, cog, heading, vtype = msg
+        if lat is not None and (abs(lat) > 90 or abs(lon) > 180):
+            return None  # Position not available (91 / 181)
+        return (mmsi, t if t is not None else time.time(), lat, lon, sog, cog, heading, vtype)
+
+
+def _split_block(buffer, data):
+    # Complete lines from buffer + data, and the unfinished remainder
+    text = buffer + data.decode('latin-1')
+    lines = text.split('\n')
+    return lines[:-1], lines[-1]
+
+
+async def socket_source(host, port):
+    """Lines from a TCP feed until the peer closes the connection."""
+    reader, writer = await asyncio.open_connection(host, port, limit=READ_BYTES)
+    buffer = ''
+    try:
+        while True:
+            data = await reader.read(READ_BYTES)
+            if not data:
+                break
+            lines, buffer = _split_block(buffer, data)
+            if lines:
+                yield time.perf_counter(), lines
+    finally:
+        writer.close()
+
+
+async def tail_source(path, from_start=False, poll_s=TAIL_POLL_S):
+    """Lines appended to `path` (tail -F): follows truncation and replacement of the file."""
+    while not os.path.exists(path):
+        await asyncio.sleep(poll_s)
+    f = open(path, 'rb')
+    if not from_start:
+        f.seek(0, os.SEEK_END)
+    buffer = ''
+    try:
+        while True:
+            data = f.read(READ_BYTES)
+            if data:
+                lines, buffer = _split_block(buffer, data)
+                if lines:
+                    yield time.perf_counter(), lines
+                continue
+            await asyncio.sleep(poll_s)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if st.st_ino != os.fstat(f.fileno()).st_ino or st.st_size < f.tell():
+                # Rotated or truncated: read the new file from its start
+                f.close()
+                f = open(path, 'rb')
+                buffer = ''
+    finally:
+        f.close()
+
+
+def zip_blocks(zip_path, bbox=None, columns=REPLAY_COLUMNS, block_rows=FLUSH_LINES):
+    """
+    A daily AIS zip as time-ordered CSV text: yields (t, lines) blocks, t being
+    each line's epoch seconds. The first block is the header line alone.
+    """
+    day = AISReader(zip_path, usecols=columns).scan(bbox=bbox, progress=False)
+    if day.empty:
+        return
+    day = day[columns]
+    t = epoch_seconds(day['BaseDateTime'])
+    order = np.argsort(t, kind='stable')
+    day, t = day.iloc[order], t[order]
+    yield t[:1], [','.join(columns)]
+    for i in range(0, len(day), block_rows):
+        text = day.iloc[i:i + block_rows].to_csv(header=False, index=False, date_format=DATE_FORMAT)
+        yield t[i:i + block_rows], text.splitlines()
+
+
+def text_blocks(path, block_rows=FLUSH_LINES):
+    """A CSV/NMEA text file as (t, lines) blocks; lines without a time reuse the previous one."""
+    parser = LineParser()
+    last_t = 0.0
+    with open(path, 'r', encoding='latin-1') as f:
+        while True:
+            lines = [line.rstrip('\n') for _, line in zip(range(block_rows), f)]
+            if not lines:
+                return
+            t = np.empty(len(lines))
+            for i, line in enumerate(lines):
+                msg = parser.parse(line) if line[:1] not in '!\\' else None
+                last_t = msg[1] if msg else last_t
+                t[i] = last_t
+            yield t, lines
+
+
+async def paced(blocks, speed):
+    """
+    Re-times (t, lines) blocks to `speed` x real time, yielding lists of lines
+    as they fall due. speed <= 0 replays as fast as the consumer takes them.
+    """
+    loop = asyncio.get_running_loop()
+    t0 = wall0 = None
+    for t, lines in blocks:
+        if t0 is None and len(t):
+            t0, wall0 = t[0], loop.time()
+        i, n = 0, len(lines)
+        while i < n:
+            if speed <= 0:
+                j = min(i + FLUSH_LINES, n)
+            else:
+                due = t0 + (loop.time() - wall0) * speed
+                j = min(int(np.searchsorted(t, due, side='right')), i + FLUSH_LINES)
+                if j <= i:
+                    await asyncio.sleep(min((t[i] - due) / speed, MAX_SLEEP_S))
+                    continue
+            yield lines[i:j]
+            i = j
+            await asyncio.sleep(0)
+
+
+def replay_blocks(path, bbox=None):
+    """(t, lines) blocks for a daily zip or a CSV/NMEA text file."""
+    return zip_blocks(path, bbox) if zipfile.is_zipfile(path) else text_blocks(path)
+
+
+async def replay_source(path, speed=0.0, bbox=None):
+    """A recorded feed (daily zip or CSV/NMEA file) replayed at `speed` x real time."""
+    async for lines in paced(replay_blocks(path, bbox), speed):
+        yield time.perf_counter(), lines
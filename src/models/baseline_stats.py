@@ -0,0 +1,99 @@
+"""
+Mergeable online speed statistics for V_dev baselines.
+Per-key count / mean / M2 (sum of squared deviations), updated chunk by chunk
+and combined with the parallel Welford formula (Chan et al.), so baselines can
+be built over months of AIS, persisted, and merged across days or workers
+without ever holding the raw speeds in memory.
+"""
+import json
+import numpy as np
+import pandas as pd
+
+_COLUMNS = ['count', 'mean', 'm2']
+
+
+def _combine(a, b):
+    """Chan et al. merge of two count/mean/m2 frames aligned on the same index."""
+    n = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    safe_n = n.where(n > 0, 1)
+    return pd.DataFrame({
+        'count': n,
+        'mean': a['mean'] + delta * b['count'] / safe_n,
+        'm2': a['m2'] + b['m2'] + delta ** 2 * a['count'] * b['count'] / safe_n,
+    })
+
+
+class SpeedAccumulator:
+    """
+    Running SOG statistics keyed by peer group (e.g. VesselType).
+    stdev is the sample standard deviation, matching statistics.stdev; a group
+    with a single ping gets stdev 0, as in the original V_dev engine.
+    """
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else pd.DataFrame(columns=_COLUMNS, dtype=float)
+
+    def update(self, keys, values):
+        """Folds one chunk of (key, SOG) pairs into the running statistics."""
+        chunk = pd.DataFrame({'key': np.asarray(keys), 'v': np.asarray(values, dtype=float)}).dropna()
+        if chunk.empty:
+            return self
+        g = chunk.groupby('key')['v']
+        part = pd.DataFrame({'count': g.count().astype(float), 'mean': g.mean()})
+        # Within-chunk M2 = sum((v - chunk_mean)^2)
+        dev = chunk['v'] - chunk['key'].map(part['mean'])
+        part['m2'] = (dev ** 2).groupby(chunk['key']).sum()
+        self.table = self._merge_tables(self.table, part)
+        return self
+
+    def merge(self, other):
+        """Combines another accumulator (another day, another worker) into this one."""
+        self.table = self._merge_tables(self.table, other.table)
+        return self
+
+    def remove(self, other):
+        """
+        Takes a previously merged accumulator back out (the Chan merge solved
+        for the other part), e.g. a day being replaced by a corrected file.
+        """
+        if other.table.empty or self.table.empty:
+            return self
+        b = other.table.reindex(self.table.index).fillna({'count': 0.0, 'mean': 0.0, 'm2': 0.0})
+        t = self.table
+        n_a = t['count'] - b['count']
+        safe_a = n_a.where(n_a > 0, 1)
+        mean_a = (t['count'] * t['mean'] - b['count'] * b['mean']) / safe_a
+        m2_a = t['m2'] - b['m2'] - (b['mean'] - mean_a) ** 2 * n_a * b['count'] / t['count']
+        table = pd.DataFrame({'count': n_a, 'mean': mean_a, 'm2': m2_a.clip(lower=0)})
+        self.table = table[table['count'] > 0]
+        return self
+
+    @staticmethod
+    def _merge_tables(a, b):
+        if a.empty:
+            return b.copy()
+        if b.empty:
+            return a.copy()
+        idx = a.index.union(b.index)
+        zero = {'count': 0.0, 'mean': 0.0, 'm2': 0.0}
+        return _combine(a.reindex(idx).fillna(zero), b.reindex(idx).fillna(zero))
+
+    def stats(self):
+        """DataFrame indexed by key with count, mean and stdev."""
+        t = self.table
+        stdev = np.sqrt(t['m2'] / (t['count'] - 1).where(t['count'] > 1, np.nan)).fillna(0.0)
+        return pd.DataFrame({'count': t['count'].astype(int), 'mean': t['mean'], 'stdev': stdev})
+
+    def save(self, path):
+        payload = {str(k): [r['count'], r['mean'], r['m2']] for k, r in self.table.iterrows()}
+        with open(path, 'w') as f:
+            json.dump(payload, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Keys come back as strings (JSON object keys)."""
+        with open(path) as f:
+            payload = json.load(f)
+        table = pd.DataFrame.from_dict(payload, orient='index', columns=_COLUMNS, dtype=float)
+        return cls(table)
@@ -0,0 +1,137 @@
+"""
+Persisted fleet speed baselines keyed by VesselType x spatial tile x month.
+Built offline from historical AIS (src/build_baselines.py) with the mergeable
+SpeedAccumulator, stored as a compact .npz, and loaded once by the monitor.
+Lookups are hash-based (O(1) per ping) and fall back from the fine peer group
+to coarser ones when a cell has too few pings to be trusted:
+
+    (type, tile, month) -> (type, month) -> (type)
+"""
+import os
+import numpy as np
+import pandas as pd
+from .baseline_stats import SpeedAccumulator
+from .tile_index import tile_keys
+
+BASELINE_STORE_PATH = 'data/fleet_baseline.npz'
+BASELINE_TILE_DEG = 1.0  # Peer-group tiles are coarse: ~111km cells keep counts meaningful
+MIN_COUNT = 30           # Pings a peer group needs before its stats are used
+SOG_NOT_AVAILABLE = 102.3
+
+_ALL_TILES = (1 << 32) - 1
+_ALL_MONTHS = 0
+
+
+def baseline_keys(vessel_type, tile, month):
+    """Packs (type, tile, month) into one int64: type<<36 | month<<32 | tile."""
+    vt = np.asarray(pd.Series(vessel_type).fillna(0), dtype=np.int64) & 0xFFFF
+    return (vt << 36) | (np.asarray(month, dtype=np.int64) << 32) | np.asarray(tile, dtype=np.int64)
+
+
+class FleetBaselineStore:
+    def __init__(self, accumulator=None, days=None, tile_deg=BASELINE_TILE_DEG):
+        self.acc = accumulator if accumulator is not None else SpeedAccumulator()
+        self.days = set(days or [])  # Partitions already folded in (incremental rebuilds)
+        self.tile_deg = tile_deg
+        self._index = None
+        self._dict = None
+
+    def _level_keys(self, vessel_type, lat, lon, month):
+        tiles = tile_keys(lon, lat, self.tile_deg)
+        n = len(tiles)
+        return (baseline_keys(vessel_type, tiles, month),
+                baseline_keys(vessel_type, np.full(n, _ALL_TILES), month),
+                baseline_keys(vessel_type, np.full(n, _ALL_TILES), np.full(n, _ALL_MONTHS)))
+
+    def update(self, batch):
+        """Folds an AIS batch (VesselType, LAT, LON, SOG, BaseDateTime) into every level."""
+        batch = batch[batch['SOG'] < SOG_NOT_AVAILABLE]
+        if batch.empty:
+            return self
+        keys = self._level_keys(batch['VesselType'], batch['LAT'].to_numpy(), batch['LON'].to_numpy(),
+                                batch['BaseDateTime'].dt.month.to_numpy())
+        sog = batch['SOG'].to_numpy()
+        for k in keys:
+            self.acc.update(k, sog)
+        self._index = self._dict = None
+        return self
+
+    def merge(self, other):
+        self.acc.merge(other.acc)
+        self.days |= other.days
+        self._index = self._dict = None
+        return self
+
+    def remove(self, other):
+        """Takes a merged store (e.g. one day's contribution) back out."""
+        self.acc.remove(other.acc)
+        self.days -= other.days
+        self._index = self._dict = None
+        return self
+
+    def _lookup_table(self):
+        # Built lazily once: hash index over keys + aligned mean/stdev/count arrays
+        if self._index is None:
+            stats = self.acc.stats()
+            self._index = (pd.Index(stats.index.astype(np.int64)), stats['mean'].to_numpy(),
+                           stats['stdev'].to_numpy(), stats['count'].to_numpy())
+        return self._index
+
+    def lookup_batch(self, vessel_type, lat, lon, month, min_count=MIN_COUNT):
+        """
+        Baseline mean/stdev per ping, using the finest peer group with at least
+        min_count pings. Returns a DataFrame with type_avg_speed, type_std_dev,
+        baseline_count and baseline_level (0 = type/tile/month, 1 = type/month,
+        2 = type, -1 = none).
+        """
+        index, mean, stdev, count = self._lookup_table()
+        n = len(np.atleast_1d(lat))
+        out_mean = np.full(n, np.nan)
+        out_std = np.full(n, np.nan)
+        out_count = np.zeros(n, dtype=np.int64)
+        level = np.full(n, -1)
+
+        if len(index):
+            keys = self._level_keys(vessel_type, np.atleast_1d(lat), np.atleast_1d(lon),
+                                    np.broadcast_to(month, (n,)))
+            for lvl, k in enumerate(keys):
+                pos = index.get_indexer(k)
+                ok = (level < 0) & (pos >= 0)
+                ok[ok] = count[pos[ok]] >= min_count
+                out_mean[ok] = mean[pos[ok]]
+                out_std[ok] = stdev[pos[ok]]
+                out_count[ok] = count[pos[ok]]
+                level[ok] = lvl
+
+        return pd.DataFrame({'type_avg_speed': out_mean, 'type_std_dev': out_std,
+                             'baseline_count': out_count, 'baseline_level': level})
+
+    def lookup(self, vessel_type, lat, lon, month, min_count=MIN_COUNT):
+        """Single-ping lookup: (mean, stdev) or (None, None) when no peer group qualifies."""
+        if self._dict is None:
+            index, mean, stdev, count = self._lookup_table()
+            self._dict = dict(zip(index.tolist(), zip(mean.tolist(), stdev.tolist(), count.tolist())))
+        vt = 0 if pd.isna(vessel_type) else int(vessel_type) & 0xFFFF
+        tile = int(tile_keys(lon, lat, self.tile_deg))
+        month = int(month)
+        for key in ((vt << 36) | (month << 32) | tile, (vt << 36) | (month << 32) | _ALL_TILES, (vt << 36) | _ALL_TILES):
+            hit = self._dict.get(key)
+            if hit is not None and hit[2] >= min_count:
+                return hit[0], hit[1]
+        return None, None
+
+    def save(self, path=BASELINE_STORE_PATH):
+        t = self.acc.table
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, key=t.index.to_numpy(dtype=np.int64), count=t['count'].to_numpy(),
+                     mean=t['mean'].to_numpy(), m2=t['m2'].to_numpy(),
+                     days=np.array(sorted(self.days), dtype=str), tile_deg=self.tile_deg)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=BASELINE_STORE_PATH):
+        with np.load(path) as z:
+            table = pd.DataFrame({'count': z['count'], 'mean': z['mean'], 'm2': z['m2']},
+                                 index=pd.Index(z['key']))
+            return cls(SpeedAccumulator(table), days=z['days'].tolist(), tile_deg=float(z['tile_deg']))
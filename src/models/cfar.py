@@ -0,0 +1,146 @@
+"""
+Two-parameter CFAR ship detector for Sentinel-1 VV chips.
+The clutter mean and standard deviation around every pixel are taken from a
+training ring (outer window minus guard window) using integral images, so the
+whole chip is thresholded in a handful of array passes. Pixels above
+mean + k * std are grouped into targets with scipy.ndimage.label, given
+geo-coordinates from the chip bbox, and matched to AIS positions at the pass
+time: a bright target with no AIS within max_dist_m is a dark-ship candidate.
+"""
+import numpy as np
+import pandas as pd
+from PIL import Image
+from scipy import ndimage
+from scipy.spatial import cKDTree
+
+GUARD_PX = 6        # Half-width of the guard window (keeps the ship out of its own clutter estimate)
+TRAIN_PX = 24       # Half-width of the outer training window
+K_SIGMA = 5.0       # Threshold: mean + K_SIGMA * std of the training ring
+MIN_PIXELS = 4      # Smaller blobs are speckle
+MAX_PIXELS = 5_000  # Larger blobs are land, platforms or breakwaters
+MATCH_DIST_M = 500
+M_PER_DEG_LAT = 110_540.0
+M_PER_DEG_LON = 111_320.0
+
+DETECTION_COLUMNS = ['DET_ID', 'LAT', 'LON', 'N_PIXELS', 'LENGTH_M', 'PEAK', 'CONTRAST']
+
+
+def png_to_db(img):
+    """Inverse of the evalscript's (db + 20) / 25 scaling of an 8-bit chip."""
+    arr = np.asarray(img, dtype=np.float32)
+    if arr.ndim == 3:
+        arr = arr[..., 0]
+    return arr / 255.0 * 25.0 - 20.0
+
+
+def load_chip(path):
+    """VV backscatter in linear power from a cached evidence chip PNG."""
+    with Image.open(path) as img:
+        return 10.0 ** (png_to_db(img) / 10.0)
+
+
+def _integral(a):
+    """Zero-padded 2-D cumulative sum: box sums become four lookups."""
+    s = np.zeros((a.shape[0] + 1, a.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(a, axis=0, dtype=np.float64), axis=1, out=s[1:, 1:])
+    return s
+
+
+def box_sum(integral, r):
+    """Sum over the (2r+1)^2 window centred on each pixel, clipped at the chip edge."""
+    h, w = integral.shape[0] - 1, integral.shape[1] - 1
+    # Edge-padding the integral image clamps the window to the chip: plain slices, no gathers
+    p = np.pad(integral, r, mode='edge')
+    lo, hi = slice(0, h), slice(2 * r + 1, 2 * r + 1 + h)
+    cl, ch = slice(0, w), slice(2 * r + 1, 2 * r + 1 + w)
+    return p[hi, ch] - p[lo, ch] - p[hi, cl] + p[lo, cl]
+
+
+def cfar_mask(intensity, guard=GUARD_PX, train=TRAIN_PX, k=K_SIGMA):
+    """
+    Boolean detection mask plus the clutter mean/std per pixel.
+    NaN pixels (no data, masked land) neither detect nor count as clutter.
+    """
+    x = np.asarray(intensity, dtype=np.float64)
+    valid = np.isfinite(x)
+    x0 = np.where(valid, x, 0.0)
+
+    s1, s2, n = _integral(x0), _integral(x0 * x0), _integral(valid.astype(np.float64))
+    ring_n = box_sum(n, train) - box_sum(n, guard)
+    ring_s1 = box_sum(s1, train) - box_sum(s1, guard)
+    ring_s2 = box_sum(s2, train) - box_sum(s2, guard)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = ring_s1 / ring_n
+        std = np.sqrt(np.maximum(ring_s2 / ring_n - mean * mean, 0.0))
+    mask = valid & (ring_n > 0) & (x0 > mean + k * std)
+    return mask, mean, std
+
+
+def detect_targets(intensity, bbox, guard=GUARD_PX, train=TRAIN_PX, k=K_SIGMA,
+                   min_pixels=MIN_PIXELS, max_pixels=MAX_PIXELS):
+    """
+    CFAR targets in a chip covering bbox [lon_min, lat_min, lon_max, lat_max]
+    (row 0 = north edge). Returns a DataFrame with DET_ID, LAT, LON, N_PIXELS,
+    LENGTH_M (rough, from blob area), PEAK and CONTRAST (peak in clutter sigmas).
+    """
+    x = np.asarray(intensity, dtype=np.float64)
+    mask, mean, std = cfar_mask(x, guard, train, k)
+    labels, n = ndimage.label(mask, structure=np.ones((3, 3)))
+    if n == 0:
+        return pd.DataFrame(columns=DETECTION_COLUMNS)
+
+    # 1. Per-target size and centroid; speckle and land blobs are dropped before peak search
+    flat = labels.ravel()
+    on = flat > 0
+    lab = flat[on]
+    rows, cols = np.divmod(np.flatnonzero(on), x.shape[1])
+    npix = np.bincount(lab, minlength=n + 1)[1:]
+    idx = np.flatnonzero((npix >= min_pixels) & (npix <= max_pixels)) + 1
+    if len(idx) == 0:
+        return pd.DataFrame(columns=DETECTION_COLUMNS)
+    npix = npix[idx - 1]
+    row_c = np.bincount(lab, weights=rows, minlength=n + 1)[idx] / npix
+    col_c = np.bincount(lab, weights=cols, minlength=n + 1)[idx] / npix
+    peak = ndimage.maximum(x, labels, idx)
+    peak_at = np.array(ndimage.maximum_position(x, labels, idx)).reshape(-1, 2)
+    contrast = (peak - mean[peak_at[:, 0], peak_at[:, 1]]) / np.maximum(std[peak_at[:, 0], peak_at[:, 1]], 1e-12)
+
+    # 2. Pixel -> geographic coordinates (pixel centres)
+    h, w = x.shape
+    lon = bbox[0] + (col_c + 0.5) / w * (bbox[2] - bbox[0])
+    lat = bbox[3] - (row_c + 0.5) / h * (bbox[3] - bbox[1])
+    px_m = np.sqrt((bbox[2] - bbox[0]) / w * M_PER_DEG_LON * np.cos(np.deg2rad(lat))
+                   * (bbox[3] - bbox[1]) / h * M_PER_DEG_LAT)
+
+    det = pd.DataFrame({'DET_ID': idx, 'LAT': lat, 'LON': lon, 'N_PIXELS': npix,
+                        'LENGTH_M': np.sqrt(npix) * px_m, 'PEAK': peak, 'CONTRAST': contrast})
+    return det.round({'LAT': 6, 'LON': 6, 'LENGTH_M': 1, 'PEAK': 5, 'CONTRAST': 2})
+
+
+def _local_xy(lat, lon, lat0):
+    return np.column_stack([np.asarray(lon) * M_PER_DEG_LON * np.cos(np.deg2rad(lat0)),
+                            np.asarray(lat) * M_PER_DEG_LAT])
+
+
+def match_ais(detections, ais, max_dist_m=MATCH_DIST_M):
+    """
+    Nearest AIS position (MMSI, LAT, LON - ideally each vessel's fix at the
+    pass time) for every detection. Adds MATCH_MMSI, MATCH_DIST_M and DARK
+    (no AIS within max_dist_m).
+    """
+    det = detections.copy()
+    det['MATCH_MMSI'] = pd.array([pd.NA] * len(det), dtype='Int64')
+    det['MATCH_DIST_M'] = np.nan
+    det['DARK'] = True
+    if det.empty or ais is None or len(ais) == 0:
+        return det
+
+    lat0 = float(det['LAT'].mean())
+    tree = cKDTree(_local_xy(ais['LAT'].to_numpy(dtype=float), ais['LON'].to_numpy(dtype=float), lat0))
+    dist, i = tree.query(_local_xy(det['LAT'], det['LON'], lat0), distance_upper_bound=max_dist_m)
+    hit = np.isfinite(dist)
+    det.loc[hit, 'MATCH_MMSI'] = ais['MMSI'].to_numpy()[i[hit]]
+    det.loc[hit, 'MATCH_DIST_M'] = np.round(dist[hit], 1)
+    det['DARK'] = ~hit
+    return det
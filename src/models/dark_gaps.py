@@ -0,0 +1,77 @@
+"""
+AIS dark-gap detector.
+Finds transmission gaps longer than min_gap_s whose last fix before the gap
+and first fix after it bracket a pipeline/cable corridor: the straight path
+between the two fixes passes within corridor_m of infrastructure. Runs over
+a whole day's VesselTimeline in one vectorized pass, and carries each
+vessel's last fix forward so gaps spanning midnight are found by the next
+night's run.
+"""
+import os
+import numpy as np
+import pandas as pd
+from .timeline import save_carry, load_carry
+from .distance import geodesic_m
+
+DARK_GAP_S = 2 * 3600    # Silences shorter than this are normal AIS reporting jitter
+CORRIDOR_M = 5_000       # Gap path must pass this close to infrastructure
+DARK_STATE_PATH = 'data/dark_gap_state.npz'
+KNOTS_PER_MPS = 1.9438445
+
+
+class DarkGapDetector:
+    def __init__(self, infrastructure, min_gap_s=DARK_GAP_S, corridor_m=CORRIDOR_M):
+        """infrastructure: a (Zoned)ProximityEngine over the pipe and/or cable layers."""
+        self.infra = infrastructure
+        self.min_gap_s = min_gap_s
+        self.corridor_m = corridor_m
+        self.carry = None  # Last fix per MMSI from the previous day (DataFrame)
+        self.days = set()
+
+    def process(self, timeline):
+        """
+        Dark gaps in one day's timeline (plus the carried-over last fixes).
+        Returns a DataFrame with one row per gap that brackets the corridor.
+        """
+        timeline = timeline.extended(self.carry)
+        if len(timeline):
+            self.carry = timeline.carry()
+
+        # 1. Consecutive fixes of the same vessel separated by a long silence
+        i = timeline.consecutive()
+        i = i[(timeline.t[i + 1] - timeline.t[i]) > self.min_gap_s]
+        if len(i) == 0:
+            return pd.DataFrame()
+        j = i + 1
+
+        # 2. Does the path across the gap come within the corridor?
+        dist, infra_id = self.infra.nearest_to_segments(
+            timeline.lon[i], timeline.lat[i], timeline.lon[j], timeline.lat[j], max_distance=self.corridor_m)
+        hit = np.isfinite(dist) & (dist <= self.corridor_m)
+        i, j, dist, infra_id = i[hit], j[hit], dist[hit], infra_id[hit]
+
+        # 3. Geodesic distance across the gap and the speed it implies
+        gap_m = geodesic_m(timeline.lon[i], timeline.lat[i], timeline.lon[j], timeline.lat[j])
+        gap_s = timeline.t[j] - timeline.t[i]
+
+        return pd.DataFrame({
+            'MMSI': timeline.mmsi[i],
+            'GAP_START': pd.to_datetime(timeline.t[i], unit='s'),
+            'GAP_END': pd.to_datetime(timeline.t[j], unit='s'),
+            'GAP_HOURS': np.round(gap_s / 3600.0, 2),
+            'LAT_BEFORE': timeline.lat[i], 'LON_BEFORE': timeline.lon[i],
+            'LAT_AFTER': timeline.lat[j], 'LON_AFTER': timeline.lon[j],
+            'SOG_BEFORE': timeline.sog[i], 'SOG_AFTER': timeline.sog[j],
+            'GAP_KM': np.round(gap_m / 1000.0, 2),
+            'IMPLIED_KNOTS': np.round(gap_m / gap_s * KNOTS_PER_MPS, 2),
+            'DIST_TO_INFRA_M': np.round(dist, 1),
+            'INFRA_ID': infra_id,
+        })
+
+    def save_state(self, path=DARK_STATE_PATH):
+        save_carry(path, self.days, self.carry)
+
+    def load_state(self, path=DARK_STATE_PATH):
+        if os.path.exists(path):
+            self.days, self.carry = load_carry(path)
+        return self
@@ -0,0 +1,105 @@
+"""
+Metric distances that are correct worldwide.
+Degrees are not a distance (0.1 deg of longitude is ~11km at the equator but
+~2km at Svalbard), and EPSG:3857 overstates lengths by 1/cos(lat). Instead,
+every point is measured in its own UTM zone (UPS beyond 84N / 80S, with the
+Norway/Svalbard zone exceptions), or with vectorized geodesic distance on the
+WGS84 ellipsoid. Transformers are built once per CRS pair and reused.
+"""
+from functools import lru_cache
+import numpy as np
+import pyproj
+import shapely
+
+WGS84 = 4326
+_GEOD = pyproj.Geod(ellps='WGS84')
+
+
+def utm_epsg(lon, lat):
+    """EPSG code of the UTM/UPS zone containing each point (vectorized)."""
+    lon = (np.asarray(lon, dtype=float) + 180.0) % 360.0 - 180.0
+    lat = np.asarray(lat, dtype=float)
+    zone = np.clip(np.floor((lon + 180.0) / 6.0).astype(int) + 1, 1, 60)
+
+    # Irregular zones: 32V is widened over south-west Norway, and Svalbard uses 31X/33X/35X/37X
+    zone = np.where((lat >= 56) & (lat < 64) & (lon >= 3) & (lon < 12), 32, zone)
+    x_band = (lat >= 72) & (lat < 84)
+    for z, lo, hi in ((31, 0, 9), (33, 9, 21), (35, 21, 33), (37, 33, 42)):
+        zone = np.where(x_band & (lon >= lo) & (lon < hi), z, zone)
+
+    epsg = np.where(lat >= 0, 32600, 32700) + zone
+    epsg = np.where(lat >= 84, 32661, epsg)   # UPS North
+    return np.where(lat < -80, 32761, epsg)   # UPS South
+
+
+@lru_cache(maxsize=256)
+def transformer(src, dst):
+    """Cached lon/lat-ordered transformer between two CRSs (EPSG ints or pyproj CRS)."""
+    return pyproj.Transformer.from_crs(src, dst, always_xy=True)
+
+
+def to_metric(lon, lat, epsg):
+    return transformer(WGS84, int(epsg)).transform(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+
+
+def to_lonlat(x, y, epsg):
+    return transformer(int(epsg), WGS84).transform(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+
+def project_geometry(geom, epsg):
+    """WGS84 shapely geometry (or array of them) -> the given metric CRS."""
+    fwd = transformer(WGS84, int(epsg))
+    return shapely.transform(geom, lambda xy: np.column_stack(fwd.transform(xy[:, 0], xy[:, 1])))
+
+
+def geodesic_m(lon1, lat1, lon2, lat2):
+    """Ellipsoidal distance in metres between paired points (vectorized)."""
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (lon1, lat1, lon2, lat2)))
+    _, _, dist = _GEOD.inv(lon1, lat1, lon2, lat2)
+    return dist
+
+
+def local_distance_m(lon1, lat1, lon2, lat2):
+    """
+    Short-range (a few km) distance in metres on the WGS84 tangent plane at
+    the pair's mean latitude: meridian and prime-vertical radii of curvature,
+    no pyproj call. Within millimetres of geodesic_m at encounter ranges.
+    """
+    lat = np.radians((np.asarray(lat1, dtype=float) + lat2) / 2)
+    w = 1.0 - _GEOD.es * np.sin(lat) ** 2
+    n = _GEOD.a / np.sqrt(w)
+    m = n * (1.0 - _GEOD.es) / w
+    dlon = (np.asarray(lon2, dtype=float) - lon1 + 180.0) % 360.0 - 180.0
+    return np.hypot(np.radians(dlon) * n * np.cos(lat), np.radians(np.asarray(lat2, dtype=float) - lat1) * m)
+
+
+def geodesic_inv(lon1, lat1, lon2, lat2):
+    """Forward azimuth (degrees from north) and ellipsoidal distance (metres), paired points."""
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (lon1, lat1, lon2, lat2)))
+    az, _, dist = _GEOD.inv(lon1, lat1, lon2, lat2)
+    return az, dist
+
+
+def geodesic_fwd(lon, lat, az, dist):
+    """Point reached from (lon, lat) after dist metres on azimuth az (degrees), vectorized."""
+    lon, lat, az, dist = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (lon, lat, az, dist)))
+    lon2, lat2, _ = _GEOD.fwd(lon, lat, az, dist)
+    return lon2, lat2
+
+
+def nearest_point_m(lon, lat, metric_geom, epsg):
+    """
+    Distance in metres from one WGS84 point to a geometry already projected to
+    `epsg`, plus the lon/lat of the closest point on that geometry.
+    """
+    x, y = to_metric(lon, lat, epsg)
+    line = shapely.shortest_line(shapely.points(x, y), metric_geom)
+    (x0, y0), (x1, y1) = shapely.get_coordinates(line)
+    lon_p, lat_p = to_lonlat(x1, y1, epsg)
+    return float(np.hypot(x1 - x0, y1 - y0)), float(lon_p), float(lat_p)
+
+
+def distance_m(lon, lat, geom):
+    """Metres from one WGS84 point to a WGS84 geometry, measured in the point's UTM zone."""
+    epsg = int(utm_epsg(lon, lat))
+    return nearest_point_m(lon, lat, project_geometry(geom, epsg), epsg)[0]
@@ -0,0 +1,262 @@
+"""
+Ship-to-ship encounter (rendezvous) detector.
+Finds pairs of vessels that stay within encounter_m of each other for at
+least min_duration_s inside the pipeline/cable corridor, e.g. a tug or
+support vessel meeting the suspect ship. All-pairs comparison is quadratic
+in port traffic, so:
+
+    1. only pings within corridor_m of infrastructure are considered, and
+       each vessel is placed at common time slices (interpolated between
+       its fixes, so both vessels of a pair are compared at the same instant);
+    2. every slice position is hashed into a grid cell at least encounter_m
+       wide, and compared only with positions of the same slice in its own
+       and the 8 neighbouring cells (one searchsorted per neighbour);
+    3. close pairs are chained into episodes over consecutive slices.
+
+Episodes still open at the end of a day are carried, with each vessel's last
+fix, into the next day's run.
+"""
+import os
+import numpy as np
+import pandas as pd
+from .timeline import save_carry, load_carry
+from .tracks import segment_tracks, run_starts
+from .interpolate import positions_at, INTERP, FIX
+from .distance import local_distance_m
+from .dark_gaps import CORRIDOR_M
+
+ENCOUNTER_M = 500             # Vessels closer than this are "together"
+MIN_ENCOUNTER_S = 20 * 60     # Shorter contacts are passing traffic
+SLICE_S = 60                  # Time step at which vessels are compared
+MAX_GAP_S = 10 * 60           # Fixes further apart are not interpolated between
+MAX_MISS_S = 5 * 60           # Contact lost for longer than this ends an episode
+SUPPORT_TYPES = (31, 32, 52)  # Towing, towing (large), tug
+CHUNK_POSITIONS = 500_000     # Slice positions hashed at once (bounds memory in dense ports)
+ENCOUNTER_STATE_PATH = 'data/encounter_state.npz'
+ENCOUNTER_COLUMNS = ['MMSI_A', 'MMSI_B', 'START', 'END', 'DURATION_MIN', 'MIN_DIST_M', 'MEAN_DIST_M',
+                     'LAT', 'LON', 'SOG_A', 'SOG_B', 'INFRA_ID', 'DIST_TO_INFRA_M',
+                     'TYPE_A', 'TYPE_B', 'SUPPORT_VESSEL']
+
+_M_PER_DEG = 110_574.0  # Shortest degree of latitude (at the equator): cells err on the large side
+_CONTACT_COLUMNS = ['a', 'b', 't', 'dist', 'lat', 'lon', 'sog_a', 'sog_b']
+
+
+def _expand(lo, hi):
+    """Concatenated aranges [lo[i], hi[i]) plus the owning i for each element."""
+    n = np.maximum(hi - lo, 0)
+    owner = np.repeat(np.arange(len(lo)), n)
+    return owner, lo[owner] + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+
+
+class GridHash:
+    """
+    Grid of cells at least cell_m wide, in lon/lat. Rows are cell_m tall; each
+    row's longitude step is sized at its poleward edge, so two points closer
+    than cell_m always lie in adjacent columns when the column of the more
+    equatorward point is recomputed in the more poleward point's row step.
+    """
+
+    def __init__(self, cell_m):
+        self.dlat = cell_m / _M_PER_DEG
+
+    def row(self, lat):
+        return np.floor(lat / self.dlat).astype(np.int64)
+
+    @staticmethod
+    def edge(row):
+        # Poleward edge of a row, in rows from the equator (rows -1 and 0 share a step)
+        return np.maximum(np.abs(row), np.abs(row + 1))
+
+    def col(self, lon, row):
+        lat_edge = np.minimum(self.edge(row) * self.dlat, 89.9)
+        return np.floor(lon * np.cos(np.radians(lat_edge)) / self.dlat).astype(np.int64)
+
+    @staticmethod
+    def key(slot, row, col):
+        # Slot (time slice) in the high bits; row and col offset to be non-negative
+        return (slot << 42) | ((row + (1 << 20)) << 21) | ((col + (1 << 20)) & 0x1FFFFF)
+
+    def pairs(self, slot, lat, lon):
+        """
+        Index pairs (i, j) of points in the same slot and adjacent cells, each
+        pair once: found from the point whose neighbour row is at least as
+        poleward as its own (ties, i.e. rows sharing a step, by index).
+        """
+        row = self.row(lat)
+        keys = self.key(slot, row, self.col(lon, row))
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        out_i, out_j = [], []
+        for dy in (-1, 0, 1):
+            col = self.col(lon, row + dy)
+            poleward = np.sign(self.edge(row + dy) - self.edge(row))
+            for dx in (-1, 0, 1):
+                k = self.key(slot, row + dy, col + dx)
+                i, pos = _expand(np.searchsorted(sorted_keys, k, 'left'),
+                                 np.searchsorted(sorted_keys, k, 'right'))
+                j = order[pos]
+                keep = (poleward[i] > 0) | ((poleward[i] == 0) & (i < j))
+                out_i.append(i[keep])
+                out_j.append(j[keep])
+        return np.concatenate(out_i), np.concatenate(out_j)
+
+
+class EncounterDetector:
+    def __init__(self, infrastructure, encounter_m=ENCOUNTER_M, min_duration_s=MIN_ENCOUNTER_S,
+                 corridor_m=CORRIDOR_M, slice_s=SLICE_S, max_gap_s=MAX_GAP_S, max_miss_s=MAX_MISS_S):
+        """infrastructure: a (Zoned)ProximityEngine over the pipe and/or cable layers."""
+        self.infra = infrastructure
+        self.encounter_m = encounter_m
+        self.min_duration_s = min_duration_s
+        self.corridor_m = corridor_m
+        self.slice_s = slice_s
+        self.max_gap_s = max_gap_s
+        self.max_miss_s = max_miss_s
+        self.grid = GridHash(encounter_m)
+        self.carry = None       # Last fix per MMSI from the previous day
+        self.open = None        # Contacts of episodes still running at the end of the last day
+        self.vessel_types = {}  # MMSI -> last known AIS ship type
+        self.days = set()
+        self.stats = {}
+
+    def slice_positions(self, timeline):
+        """
+        Every vessel at each slice time while it is inside the corridor (between
+        corridor fixes no more than max_gap_s apart), in one batch interpolation.
+        """
+        dist, _ = self.infra.nearest(timeline.lon, timeline.lat, max_distance=self.corridor_m)
+        idx = np.flatnonzero(dist <= self.corridor_m)
+        m, t = timeline.mmsi[idx], timeline.t[idx]
+
+        # Runs of corridor fixes, split where a vessel changes or falls silent
+        starts = run_starts(segment_tracks(m, t, self.max_gap_s)) if len(idx) else idx
+        ends = np.append(starts[1:], len(idx)) - 1
+        s = self.slice_s
+        run, k = _expand(-(-t[starts] // s), t[ends] // s + 1)
+        pos = positions_at(timeline, m[starts][run], (k * s).astype('datetime64[s]'),
+                           max_gap_s=self.max_gap_s, max_extrapolate_s=0)
+        pos = pos[pos['METHOD'].isin([INTERP, FIX])]
+        self.stats['corridor_fixes'] = len(idx)
+        return pos
+
+    def contacts(self, pos):
+        """Vessel pairs within encounter_m at the same slice (spatial hash, whole slices per chunk)."""
+        slot = pos['TIME'].to_numpy(dtype='datetime64[s]').astype(np.int64) // self.slice_s
+        order = np.argsort(slot, kind='stable')
+        slot = slot[order]
+        lat, lon = pos['LAT'].to_numpy()[order], pos['LON'].to_numpy()[order]
+        mmsi, sog = pos['MMSI'].to_numpy()[order], pos['SOG'].to_numpy()[order]
+
+        bounds = np.searchsorted(slot, slot[::CHUNK_POSITIONS], 'left') if len(slot) else slot
+        bounds = np.unique(np.append(bounds, len(slot)))
+        found_i, found_j, found_d = [], [], []
+        self.stats['candidates'] = 0
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            i, j = self.grid.pairs(slot[lo:hi] - slot[lo], lat[lo:hi], lon[lo:hi])
+            i, j = i + lo, j + lo
+            dist = local_distance_m(lon[i], lat[i], lon[j], lat[j])
+            close = dist <= self.encounter_m
+            found_i.append(i[close])
+            found_j.append(j[close])
+            found_d.append(dist[close])
+            self.stats['candidates'] += len(i)
+        i, j = (np.concatenate(c) if c else np.zeros(0, dtype=np.int64) for c in (found_i, found_j))
+        dist = np.concatenate(found_d) if found_d else np.zeros(0)
+
+        # Pair as (smaller MMSI, larger MMSI)
+        swap = mmsi[i] > mmsi[j]
+        a, b = np.where(swap, j, i), np.where(swap, i, j)
+        return pd.DataFrame({
+            'a': mmsi[a], 'b': mmsi[b], 't': slot[i] * self.slice_s, 'dist': dist,
+            'lat': (lat[i] + lat[j]) / 2, 'lon': (lon[i] + lon[j]) / 2, 'sog_a': sog[a], 'sog_b': sog[b],
+        })
+
+    def process(self, timeline, vessel_types=None):
+        """
+        Encounters completed in one day's timeline (plus the carried-over state).
+        vessel_types: optional {MMSI: AIS ship type} for the day, used to flag
+        tugs / towing vessels (SUPPORT_VESSEL).
+        Returns one row per encounter episode (ENCOUNTER_COLUMNS).
+        """
+        if vessel_types:
+            self.vessel_types.update(vessel_types)
+        timeline = timeline.extended(self.carry)
+        if len(timeline):
+            self.carry = timeline.carry()
+
+        contacts = self.contacts(self.slice_positions(timeline))
+        if self.open is not None and len(self.open):
+            # Slices between a carried fix and the day's first fix may already be in the open contacts
+            contacts = pd.concat([self.open, contacts], ignore_index=True).drop_duplicates(['a', 'b', 't'])
+        contacts = contacts.sort_values(['a', 'b', 't'], kind='stable')
+        contacts['episode'] = self._episode_ids(contacts)
+        self.stats['contacts'] = len(contacts)
+
+        # Still running at the end of the data: held back for the next day
+        end = int(timeline.t.max()) if len(timeline) else 0
+        last_t = contacts.groupby('episode')['t'].transform('max')
+        running = (last_t >= end - self.max_miss_s).to_numpy()
+        self.open = contacts.loc[running, _CONTACT_COLUMNS].reset_index(drop=True)
+        return self._episodes(contacts[~running])
+
+    def flush(self):
+        """Episodes still open at the end of the data set."""
+        contacts, self.open = self.open, None
+        if contacts is None:
+            return pd.DataFrame(columns=ENCOUNTER_COLUMNS)
+        return self._episodes(contacts.assign(episode=self._episode_ids(contacts)))
+
+    def _episode_ids(self, contacts):
+        # Consecutive contacts of a pair (sorted by a, b, t) no more than max_miss_s apart
+        pair = (contacts['a'].to_numpy(dtype=np.int64) << 30) | contacts['b'].to_numpy(dtype=np.int64)
+        return segment_tracks(pair, contacts['t'].to_numpy(), self.max_miss_s)
+
+    def _episodes(self, contacts):
+        if not len(contacts):
+            return pd.DataFrame(columns=ENCOUNTER_COLUMNS)
+        g = contacts.groupby('episode', sort=False)
+        closest = contacts.loc[g['dist'].idxmin()].set_index('episode')
+        ep = g.agg(MMSI_A=('a', 'first'), MMSI_B=('b', 'first'), start=('t', 'min'), end=('t', 'max'),
+                   MEAN_DIST_M=('dist', 'mean'), SOG_A=('sog_a', 'mean'), SOG_B=('sog_b', 'mean'))
+        ep = ep[ep['end'] - ep['start'] >= self.min_duration_s]
+        closest = closest.loc[ep.index]
+        # Infrastructure nearest to the closest approach
+        infra_dist, infra_id = self.infra.nearest(closest['lon'].to_numpy(), closest['lat'].to_numpy(),
+                                                  max_distance=self.corridor_m)
+
+        type_a = ep['MMSI_A'].map(self.vessel_types).astype('Int16')
+        type_b = ep['MMSI_B'].map(self.vessel_types).astype('Int16')
+        out = pd.DataFrame({
+            'MMSI_A': ep['MMSI_A'], 'MMSI_B': ep['MMSI_B'],
+            'START': pd.to_datetime(ep['start'], unit='s'), 'END': pd.to_datetime(ep['end'], unit='s'),
+            'DURATION_MIN': ((ep['end'] - ep['start']) / 60).round(1),
+            'MIN_DIST_M': closest['dist'].round(1), 'MEAN_DIST_M': ep['MEAN_DIST_M'].round(1),
+            # Position and infrastructure at the closest approach
+            'LAT': closest['lat'].round(6), 'LON': closest['lon'].round(6),
+            'SOG_A': ep['SOG_A'].round(2), 'SOG_B': ep['SOG_B'].round(2),
+            'INFRA_ID': infra_id, 'DIST_TO_INFRA_M': np.round(infra_dist, 1),
+            'TYPE_A': type_a, 'TYPE_B': type_b,
+            'SUPPORT_VESSEL': type_a.isin(SUPPORT_TYPES) | type_b.isin(SUPPORT_TYPES),
+        })
+        return out.sort_values('START', kind='stable').reset_index(drop=True)
+
+    def save_state(self, path=ENCOUNTER_STATE_PATH):
+        # Contacts of open episodes, and the ship types of their vessels, are stored alongside the carried fixes
+        contacts = self.open if self.open is not None else pd.DataFrame(columns=_CONTACT_COLUMNS)
+        mmsi = np.unique(np.concatenate([contacts['a'].to_numpy(dtype=np.int64),
+                                         contacts['b'].to_numpy(dtype=np.int64)]))
+        mmsi = np.array([m for m in mmsi.tolist() if pd.notna(self.vessel_types.get(m))], dtype=np.int64)
+        save_carry(path, self.days, self.carry,
+                   types_mmsi=mmsi, types_value=np.array([self.vessel_types[m] for m in mmsi.tolist()], dtype=np.int64),
+                   **{'open_' + c: contacts[c].to_numpy(dtype=float) for c in _CONTACT_COLUMNS})
+
+    def load_state(self, path=ENCOUNTER_STATE_PATH):
+        if os.path.exists(path):
+            self.days, self.carry = load_carry(path)
+            with np.load(path) as z:
+                if 'open_t' in z:
+                    self.open = pd.DataFrame({c: z['open_' + c] for c in _CONTACT_COLUMNS})
+                    self.open[['a', 'b', 't']] = self.open[['a', 'b', 't']].astype(np.int64)
+                if 'types_mmsi' in z:
+                    self.vessel_types.update(zip(z['types_mmsi'].tolist(), z['types_value'].tolist()))
+        return self
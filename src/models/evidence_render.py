@@ -0,0 +1,183 @@
+"""
+Headless evidence-figure rendering.
+Uses the non-interactive Agg backend, loads the infrastructure layers once
+per process (as the pool initializer, not once per figure), closes every
+figure after saving, and renders many events across a process pool. Output
+resolution is a parameter instead of a hardcoded 300 dpi.
+
+Jobs are plain dicts so they pickle cheaply to the workers:
+    forensic: chip_path, bbox, lat, lon, out_path [, vessel, sar_time]
+    fused:    chip_path, lat, lon, ping_lats, ping_lons, vessel, out_path [, offset]
+"""
+import os
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.patches as patches
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .infrastructure import get_registry, PIPE_ZIP
+from .distance import utm_epsg, nearest_point_m
+
+DPI = 300
+FUSED_OFFSET_DEG = 0.015
+
+_LAYERS = {}
+
+
+def load_layers(pipe_zip=None):
+    """Fetches the static layers from the registry cache once per process (pool initializer)."""
+    if _LAYERS and pipe_zip in (None, _LAYERS['source']):
+        return _LAYERS
+    pipe_zip = pipe_zip or PIPE_ZIP
+    registry = get_registry(pipe_zip=pipe_zip)
+    _LAYERS.update(source=pipe_zip, registry=registry, pipes=registry.layer('pipe'))
+    return _LAYERS
+
+
+def _save(fig, path, dpi, **kwargs):
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fig.savefig(path, dpi=dpi, **kwargs)
+    finally:
+        plt.close(fig)
+    return path
+
+
+def pipe_standoff(lat, lon):
+    """Nearest pipeline point to the ship and the standoff distance (metres, ship's UTM zone)."""
+    epsg = int(utm_epsg(lon, lat))
+    dist, lon_p, lat_p = nearest_point_m(lon, lat, load_layers()['registry'].union('pipe', epsg), epsg)
+    return lat_p, lon_p, dist
+
+
+def render_forensic(job, dpi=DPI):
+    """SAR chip + pipeline + standoff vector + attribution legend (forensic_fusion_v4 layout)."""
+    layers = load_layers()
+    bbox = job['bbox']
+    lat_s, lon_s = job['lat'], job['lon']
+    vessel = job.get('vessel', 'MSC DANIT (9618288)')
+    lat_p, lon_p, dist_meters = pipe_standoff(lat_s, lon_s)
+    with Image.open(job['chip_path']) as img:
+        sar_img = img.copy()
+
+    fig, ax = plt.subplots(figsize=(14, 14), facecolor='black')
+
+    # Layer 1: SAR Image
+    ax.imshow(sar_img, cmap='magma', extent=[bbox[0], bbox[2], bbox[1], bbox[3]],
+              origin='upper', zorder=1)
+
+    # Layer 2: Pipeline (Red Line)
+    layers['pipes'].plot(ax=ax, color='#FF3B30', linewidth=4, alpha=0.9, label='San Pedro Pipeline Corridor', zorder=2)
+
+    # Layer 3: Standoff vector from the ship to the nearest pipe point
+    ax.plot([lon_s, lon_p], [lat_s, lat_p], color='yellow', linestyle='--', linewidth=3,
+            marker='o', markersize=6, label='Forensic Standoff Vector', zorder=6)
+    ax.text((lon_s + lon_p)/2, (lat_s + lat_p)/2 + 0.001, f"{dist_meters:.1f}m",
+            color='yellow', fontweight='bold', ha='center', fontsize=12,
+            bbox=dict(facecolor='black', alpha=0.7, edgecolor='none'))
+
+    # Layer 4: AIS position
+    ax.scatter(lon_s, lat_s, color='#00FFFF', s=300, edgecolors='white', marker='P',
+               label=f"{vessel.split(' (')[0]} (AIS)", zorder=7)
+
+    ax.tick_params(axis='both', colors='white', labelsize=10)
+    ax.set_xlabel("Longitude", color='white')
+    ax.set_ylabel("Latitude", color='white')
+    for spine in ax.spines.values():
+        spine.set_edgecolor('#444444')
+
+    position = f"{lat_s:.5f}, {lon_s:.5f}"
+    if 'radius_m' in job:
+        # Placed at the acquisition time by interpolation / dead reckoning
+        position += f" +/- {job['radius_m']:.0f}m ({job.get('method', 'interp')})"
+    tech_legend = (
+        f"--- FORENSIC ATTRIBUTION DATA ---\n"
+        f"SAR ACQUISITION: {job.get('sar_time', '2021-01-25 14:10 UTC')}\n"
+        f"VESSEL: {vessel}\n"
+        f"SHIP POSITION: {position}\n"
+        f"NEAREST PIPE INTERCEPT: {lat_p:.5f}, {lon_p:.5f}\n"
+        f"CALCULATED DISTANCE: {dist_meters:.2f} meters\n"
+        f"PROXIMITY STATUS: CRITICAL THREAT"
+    )
+    ax.text(0.02, 0.02, tech_legend, transform=ax.transAxes, color='white', fontsize=12,
+            family='monospace', bbox=dict(facecolor='black', alpha=0.8, edgecolor='#00FFFF'))
+
+    ax.set_xlim(bbox[0], bbox[2])
+    ax.set_ylim(bbox[1], bbox[3])
+    ax.legend(loc='upper right', facecolor='black', labelcolor='white', fontsize=11)
+
+    _save(fig, job['out_path'], dpi, facecolor='black', bbox_inches='tight')
+    return job['out_path'], dist_meters
+
+
+def render_fused(job, dpi=DPI):
+    """SAR chip + pipeline + AIS telemetry + target box (sar_downloader layout)."""
+    layers = load_layers()
+    vessel = job['vessel']
+    lat_c, lon_c = job['lat'], job['lon']
+    offset = job.get('offset', FUSED_OFFSET_DEG)
+    # [Left, Right, Bottom, Top]
+    extent = [lon_c - offset, lon_c + offset, lat_c - offset, lat_c + offset]
+    with Image.open(job['chip_path']) as img:
+        sar_img = img.copy()
+
+    fig, ax = plt.subplots(figsize=(12, 12))
+    ax.imshow(sar_img, cmap='gray', extent=extent, zorder=1)
+    layers['pipes'].plot(ax=ax, color='#FF3B30', linewidth=3, alpha=0.8, label='Subsea Pipeline', zorder=2)
+    ax.scatter(job['ping_lons'], job['ping_lats'], color='#00FFFF', s=30,
+               edgecolors='white', linewidth=0.5, label='AIS Telemetry', zorder=3)
+
+    # Target box around the closest approach (~300 m)
+    box_width = 0.003
+    rect = patches.Rectangle((lon_c - box_width/2, lat_c - box_width/2),
+                             box_width, box_width, linewidth=2,
+                             edgecolor='#FFD60A', facecolor='none',
+                             label=f'Target ID: {vessel}', zorder=4)
+    ax.add_patch(rect)
+
+    ax.set_title(f"SATELLITE SENSOR FUSION: {vessel}\nSentinel-1 SAR + AIS + Infrastructure Overlay",
+                 fontsize=14, fontweight='bold', pad=20)
+    ax.set_xlabel("Longitude (WGS84)")
+    ax.set_ylabel("Latitude (WGS84)")
+    ax.set_xlim(extent[0] + 0.005, extent[1] - 0.005)
+    ax.set_ylim(extent[2] + 0.005, extent[3] - 0.005)
+    ax.legend(loc='upper right', facecolor='white', framealpha=0.9)
+    ax.grid(True, linestyle='--', alpha=0.3)
+
+    _save(fig, job['out_path'], dpi, bbox_inches='tight')
+    return job['out_path'], None
+
+
+RENDERERS = {'forensic': render_forensic, 'fused': render_fused}
+
+
+def render_job(kind, job, dpi=DPI):
+    return RENDERERS[kind](job, dpi)
+
+
+def render_batch(kind, jobs, workers=os.cpu_count(), dpi=DPI, pipe_zip=PIPE_ZIP):
+    """
+    Renders every job; each worker process loads the layers once.
+    Returns a list of (out_path, distance_m) in job order (None for failures).
+    """
+    results = [None] * len(jobs)
+    if workers is None or workers <= 1:
+        # In-process: same layer cache, no pool start-up cost
+        load_layers(pipe_zip)
+        for i, job in enumerate(jobs):
+            try:
+                results[i] = render_job(kind, job, dpi)
+            except Exception as e:
+                print(f"[-] Render failed for {job.get('out_path')}: {e}")
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_layers, initargs=(pipe_zip,)) as pool:
+        futures = {pool.submit(render_job, kind, job, dpi): i for i, job in enumerate(jobs)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                results[i] = fut.result()
+            except Exception as e:
+                print(f"[-] Render failed for {jobs[i].get('out_path')}: {e}")
+    return results
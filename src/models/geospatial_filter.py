@@ -1,23 +1,67 @@
-from shapely.geometry import Point, LineString
+from functools import lru_cache
+from shapely.geometry import LineString
+import pandas as pd
 import geopandas as gpd
+if __package__:
+    from .proximity import ProximityEngine, ZonedProximityEngine
+    from .distance import distance_m
+else:
+    # Run directly (python src/models/geospatial_filter.py): import through the models package
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from models.proximity import ProximityEngine, ZonedProximityEngine
+    from models.distance import distance_m
 
-def is_near_infrastructure(vessel_lat, vessel_lon, cable_coords, buffer_distance=0.1):
+HOT_ZONE_M = 10_000  # Critical buffer around a cable, in metres
+
+def is_near_infrastructure(vessel_lat, vessel_lon, cable_coords, buffer_distance=HOT_ZONE_M):
     """
     Stage 3: Determines if a vessel is within the 'Hot Zone'.
-    buffer_distance: 0.1 decimal degrees is roughly 10-11km.
+    buffer_distance: metres. The distance is measured in the vessel's local UTM
+    zone, so the buffer means the same thing at 78N as at the equator.
     """
     # 1. Create the Cable line
     cable_line = LineString(cable_coords)
     
-    # 2. Create the Vessel point
-    vessel_point = Point(vessel_lon, vessel_lat)
-    
-    # 3. Calculate distance
-    distance = vessel_point.distance(cable_line)
+    # 2. Calculate distance (metres, local UTM zone of the vessel)
+    distance = distance_m(vessel_lon, vessel_lat, cable_line)
     
     is_threat = distance <= buffer_distance
     return is_threat, distance
 
+def _cables_key(cables):
+    # dict {name: [(lon, lat), ...]} or a list of coordinate lists -> hashable key
+    items = cables.items() if isinstance(cables, dict) else enumerate(cables)
+    return tuple((name, tuple(map(tuple, coords))) for name, coords in items)
+
+@lru_cache(maxsize=32)
+def _prepared_cables(cables_key):
+    names = [name for name, _ in cables_key]
+    lines = [LineString(coords) for _, coords in cables_key]
+    gdf = gpd.GeoDataFrame({'name': names}, geometry=lines, crs=4326)
+    # Each vessel is measured in its own UTM zone, so distances come out in metres anywhere
+    return ZonedProximityEngine(gdf, id_column='name')
+
+def prepare_cables(cables):
+    """Builds (or fetches from cache) the spatial index for a set of cables."""
+    return _prepared_cables(_cables_key(cables))
+
+def near_infrastructure_batch(vessel_lats, vessel_lons, cables, buffer_m=HOT_ZONE_M):
+    """
+    Stage 3 (batch): distance in metres from every vessel to the nearest of several cables.
+    cables: {name: [(lon, lat), ...]}, a list of coordinate lists, or a ready
+    ProximityEngine (e.g. InfrastructureRegistry.engine('cable')).
+    Returns a DataFrame with in_hot_zone, distance_m and nearest_cable per vessel.
+    """
+    engine = cables if isinstance(cables, (ProximityEngine, ZonedProximityEngine)) else prepare_cables(cables)
+    distance, nearest = engine.nearest(vessel_lons, vessel_lats)
+    return pd.DataFrame({
+        'in_hot_zone': distance <= buffer_m,
+        'distance_m': distance,
+        'nearest_cable': nearest,
+    })
+
 if __name__ == "__main__":
     # Real-world target: Svalbard Undersea Cable (Approx coordinates)
     # Line from Longyearbyen towards mainland Norway
@@ -30,6 +74,6 @@ if __name__ == "__main__":
     
     print(f"\n--- GEOSPATIAL ANALYSIS ---")
     print(f"Vessel Location: {ship_lat}, {ship_lon}")
-    print(f"Distance to Cable: {dist:.4f} degrees")
-    print(f"In 'Hot Zone' (Buffer 0.1): {in_zone}")
-    print("="*27 + "\n")
\ No newline at end of file
+    print(f"Distance to Cable: {dist:.1f} m")
+    print(f"In 'Hot Zone' (Buffer {HOT_ZONE_M / 1000:g} km): {in_zone}")
+    print("="*27 + "\n")
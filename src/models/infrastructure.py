@@ -0,0 +1,123 @@
+"""
+Infrastructure layer registry.
+Pipeline and cable shapefiles are parsed once; every (layer, CRS, simplify
+tolerance) view is cached as GeoParquet under data/infrastructure/cache,
+keyed by the source zip's size and mtime so an updated shapefile invalidates
+its views automatically. Within a process, layers and their ProximityEngine
+(STRtree) views are memoized, so tools share one copy per CRS instead of
+each calling gpd.read_file(...).to_crs(...) on startup.
+"""
+import os
+import hashlib
+from functools import lru_cache
+import pandas as pd
+import geopandas as gpd
+import pyproj
+import shapely
+from .proximity import ProximityEngine, ZonedProximityEngine
+
+PIPE_ZIP = 'data/infrastructure/pc_pipe.zip'
+CABLE_ZIP = 'data/infrastructure/SubmarineCable.zip'
+INFRA_CACHE_DIR = 'data/infrastructure/cache'
+WGS84 = 4326
+
+
+def source_signature(path):
+    """Changes whenever the source file is replaced or edited (same test as the AIS archive)."""
+    st = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()[:12]
+
+
+def _crs_tag(crs):
+    epsg = crs.to_epsg()
+    return f"epsg{epsg}" if epsg else hashlib.sha1(crs.to_wkt().encode()).hexdigest()[:10]
+
+
+class InfrastructureRegistry:
+    def __init__(self, pipe_zip=PIPE_ZIP, cable_zip=CABLE_ZIP, cache_dir=INFRA_CACHE_DIR):
+        self.sources = {'pipe': pipe_zip, 'cable': cable_zip}
+        self.cache_dir = cache_dir
+        self._layers = {}
+        self._engines = {}
+        self._unions = {}
+
+    def layer(self, name, crs=WGS84, simplify=0.0):
+        """
+        GeoDataFrame for layer `name` ('pipe' or 'cable') in `crs`, optionally
+        simplified (tolerance in CRS units). Rows keep the shapefile order, and
+        INFRA_ID is '<name>:<row>'.
+        """
+        crs = pyproj.CRS.from_user_input(crs)
+        key = (name, _crs_tag(crs), float(simplify))
+        if key in self._layers:
+            return self._layers[key]
+
+        source = self.sources[name]
+        sig = source_signature(source)
+        path = os.path.join(self.cache_dir, f"{name}-{sig}-{key[1]}-{key[2]:g}.parquet")
+        if os.path.exists(path):
+            gdf = gpd.read_parquet(path)
+        else:
+            gdf = self._build(name, source, crs, simplify)
+            self._write(gdf, path, prefix=f"{name}-")
+        self._layers[key] = gdf
+        return gdf
+
+    def _build(self, name, source, crs, simplify):
+        if pyproj.CRS.from_user_input(WGS84) == crs and not simplify:
+            # The only view parsed from the shapefile; all others derive from it
+            gdf = gpd.read_file(f"zip://{source}").to_crs(crs)
+            gdf.insert(0, 'INFRA_ID', [f"{name}:{i}" for i in range(len(gdf))])
+            return gdf
+        gdf = self.layer(name, WGS84).to_crs(crs)
+        if simplify:
+            gdf['geometry'] = gdf.geometry.simplify(simplify, preserve_topology=True)
+        return gdf
+
+    def _write(self, gdf, path, prefix):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = path + '.tmp'
+        gdf.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        # Views of an older version of this shapefile can never be hit again
+        sig = os.path.basename(path)[len(prefix):].split('-')[0]
+        for old in os.listdir(self.cache_dir):
+            if old.startswith(prefix) and not old.startswith(prefix + sig) and old.endswith('.parquet'):
+                os.remove(os.path.join(self.cache_dir, old))
+
+    def combined(self, names=('pipe', 'cable'), crs=WGS84, simplify=0.0):
+        """Several layers in one GeoDataFrame (INFRA_ID, geometry)."""
+        parts = [self.layer(n, crs, simplify)[['INFRA_ID', 'geometry']] for n in names]
+        return gpd.GeoDataFrame(pd.concat(parts, ignore_index=True), crs=parts[0].crs)
+
+    def engine(self, names=('pipe', 'cable'), crs=None, simplify=0.0, id_column='INFRA_ID'):
+        """
+        Spatial-indexed proximity engine over one or more layers. With a metric
+        `crs` this is a ProximityEngine in that CRS; by default it is a
+        ZonedProximityEngine that measures each ping in its own UTM zone.
+        Built once per process and key.
+        """
+        names = (names,) if isinstance(names, str) else tuple(names)
+        crs = pyproj.CRS.from_user_input(crs) if crs is not None else None
+        key = (names, _crs_tag(crs) if crs else 'utm', float(simplify), id_column)
+        if key not in self._engines:
+            gdf_crs = crs or WGS84
+            gdf = self.combined(names, gdf_crs, simplify) if len(names) > 1 else self.layer(names[0], gdf_crs, simplify)
+            self._engines[key] = ProximityEngine(gdf, crs=crs, id_column=id_column) if crs \
+                else ZonedProximityEngine(gdf, id_column=id_column)
+        return self._engines[key]
+
+    def union(self, name, crs=WGS84):
+        """Prepared union of a layer's geometries (for nearest-point / containment tests)."""
+        key = (name, _crs_tag(pyproj.CRS.from_user_input(crs)))
+        if key not in self._unions:
+            geom = self.layer(name, crs).union_all()
+            shapely.prepare(geom)
+            self._unions[key] = geom
+        return self._unions[key]
+
+
+@lru_cache(maxsize=8)
+def get_registry(pipe_zip=PIPE_ZIP, cable_zip=CABLE_ZIP, cache_dir=INFRA_CACHE_DIR):
+    """Process-wide registry for a given pair of source shapefiles."""
+    return InfrastructureRegistry(pipe_zip, cable_zip, cache_dir)
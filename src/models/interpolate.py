@@ -0,0 +1,122 @@
+"""
+Vessel positions at arbitrary times.
+Puts every vessel of a VesselTimeline onto query times (e.g. a SAR scene's
+acquisition time) in one call: one searchsorted finds the fixes around each
+(MMSI, time) query, then
+
+    - between two fixes at most max_gap_s apart the position is interpolated
+      along the geodesic joining them;
+    - otherwise it is dead-reckoned on SOG/COG from the nearer fix, if that
+      fix is within max_extrapolate_s (backwards from the first fix of a
+      track); a fix without usable SOG/COG holds its position.
+
+Each position carries an uncertainty radius that grows with the time to the
+fix it was derived from.
+"""
+import numpy as np
+import pandas as pd
+from .distance import geodesic_inv, geodesic_fwd
+from .dark_gaps import KNOTS_PER_MPS
+from .tracks import COG_NOT_AVAILABLE
+
+MAX_GAP_S = 30 * 60            # Fixes further apart are not interpolated between
+MAX_EXTRAPOLATE_S = 10 * 60    # Dead reckoning horizon from the nearest fix
+FIX_ERROR_M = 10.0             # Position error of a reported fix
+DRIFT_MPS = 0.5                # Unmodelled manoeuvre / current, about 1 kn
+DR_ERROR = 0.1                 # Dead-reckoning error per metre run on SOG/COG
+UNKNOWN_SPEED_KN = 10.0        # Assumed speed when a held fix reports no SOG
+SOG_NOT_AVAILABLE = 102.3
+
+# METHOD values
+FIX, INTERP, DEAD_RECKON, HOLD, NONE = 'fix', 'interp', 'dead_reckon', 'hold', 'none'
+
+POSITION_COLUMNS = ['MMSI', 'TIME', 'LAT', 'LON', 'SOG', 'COG', 'RADIUS_M', 'METHOD', 'FIX_DT_S']
+
+
+def positions_at(timeline, mmsi, times, max_gap_s=MAX_GAP_S, max_extrapolate_s=MAX_EXTRAPOLATE_S):
+    """
+    Position of each (mmsi[i], times[i]) query; times may be a scalar.
+    Returns a DataFrame in query order with POSITION_COLUMNS: RADIUS_M is the
+    uncertainty radius, FIX_DT_S the seconds to the nearest fix used, and
+    METHOD one of fix / interp / dead_reckon / hold / none (NaN position).
+    """
+    mmsi = np.asarray(mmsi, dtype=np.int64)
+    times = pd.to_datetime(pd.Series(np.broadcast_to(np.asarray(times), mmsi.shape)))
+    t = times.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    n = len(mmsi)
+    lat, lon, sog, cog = (np.full(n, np.nan) for _ in range(4))
+    radius, fix_dt = np.full(n, np.nan), np.full(n, np.nan)
+    method = np.full(n, NONE, dtype=object)
+
+    # 1. Fixes around every query (one searchsorted)
+    before, after = timeline.bracket(mmsi, t)
+    has_b, has_a = before >= 0, after >= 0
+    b, a = np.maximum(before, 0), np.maximum(after, 0)
+    dt_b = np.where(has_b, t - timeline.t[b], np.iinfo(np.int64).max)
+    dt_a = np.where(has_a, timeline.t[a] - t, np.iinfo(np.int64).max)
+
+    # 2. Exactly on a fix
+    on = has_b & (dt_b == 0)
+    _take(timeline, b[on], on, lat, lon, sog, cog)
+    radius[on], fix_dt[on], method[on] = FIX_ERROR_M, 0, FIX
+
+    # 3. Between two close fixes: along the geodesic joining them
+    mid = ~on & has_b & has_a & (dt_b + dt_a <= max_gap_s)
+    if mid.any():
+        bi, ai = b[mid], a[mid]
+        f = dt_b[mid] / (dt_b[mid] + dt_a[mid])
+        az, dist = geodesic_inv(timeline.lon[bi], timeline.lat[bi], timeline.lon[ai], timeline.lat[ai])
+        lon[mid], lat[mid] = geodesic_fwd(timeline.lon[bi], timeline.lat[bi], az, dist * f)
+        sog_b, sog_a = _valid_sog(timeline.sog[bi]), _valid_sog(timeline.sog[ai])
+        track_kn = dist / (dt_b[mid] + dt_a[mid]) * KNOTS_PER_MPS
+        sog[mid] = np.where(np.isnan(sog_b) | np.isnan(sog_a), track_kn, sog_b + f * (sog_a - sog_b))
+        cog[mid] = np.where(dist > 0, az % 360.0, _valid_cog(timeline.cog[bi]))
+        near = np.minimum(dt_b[mid], dt_a[mid])
+        radius[mid] = FIX_ERROR_M + near * DRIFT_MPS
+        fix_dt[mid], method[mid] = near, INTERP
+
+    # 4. Otherwise dead-reckon from the nearer fix, backwards when it is after the query
+    rest = ~on & ~mid & (np.minimum(dt_b, dt_a) <= max_extrapolate_s)
+    if rest.any():
+        use_after = dt_a[rest] < dt_b[rest]
+        src = np.where(use_after, a[rest], b[rest])
+        dt = np.where(use_after, dt_a[rest], dt_b[rest]).astype(float)
+        s, c = _valid_sog(timeline.sog[src]), _valid_cog(timeline.cog[src])
+        moving = ~np.isnan(s) & ~np.isnan(c)
+        run_m = np.where(moving, s, 0.0) / KNOTS_PER_MPS * dt
+        heading = np.where(use_after, c + 180.0, c)
+        x, y = geodesic_fwd(timeline.lon[src], timeline.lat[src], np.nan_to_num(heading), run_m)
+        lon[rest], lat[rest] = x, y
+        sog[rest], cog[rest] = s, c
+        # A held fix could have moved anywhere within its speed times the elapsed time
+        speed_mps = np.where(np.isnan(s), UNKNOWN_SPEED_KN, s) / KNOTS_PER_MPS
+        growth = np.where(moving, DRIFT_MPS + DR_ERROR * speed_mps, DRIFT_MPS + speed_mps)
+        radius[rest] = FIX_ERROR_M + dt * growth
+        fix_dt[rest] = dt
+        method[rest] = np.where(moving, DEAD_RECKON, HOLD)
+
+    return pd.DataFrame({
+        'MMSI': mmsi, 'TIME': times.to_numpy(dtype='datetime64[ns]'),
+        'LAT': np.round(lat, 6), 'LON': np.round(lon, 6),
+        'SOG': np.round(sog, 2), 'COG': np.round(cog, 1),
+        'RADIUS_M': np.round(radius, 1), 'METHOD': method, 'FIX_DT_S': fix_dt,
+    })
+
+
+def vessels_at(timeline, when, **kwargs):
+    """Every vessel of the timeline placed at one time (e.g. a SAR acquisition); unplaceable ones dropped."""
+    out = positions_at(timeline, timeline.vessels, when, **kwargs)
+    return out[out['METHOD'] != NONE].reset_index(drop=True)
+
+
+def _take(timeline, rows, mask, lat, lon, sog, cog):
+    lat[mask], lon[mask] = timeline.lat[rows], timeline.lon[rows]
+    sog[mask], cog[mask] = _valid_sog(timeline.sog[rows]), _valid_cog(timeline.cog[rows])
+
+
+def _valid_sog(sog):
+    return np.where((sog >= 0) & (sog < SOG_NOT_AVAILABLE), sog, np.nan)
+
+
+def _valid_cog(cog):
+    return np.where((cog >= 0) & (cog < COG_NOT_AVAILABLE), cog, np.nan)
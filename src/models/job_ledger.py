@@ -0,0 +1,209 @@
+"""
+Job ledger and chunk checkpoints for resumable, incremental AIS runs.
+A JobLedger (one JSON file per job) records every input file that finished:
+its size, mtime and SHA-256, the output row counts and the output files it
+produced, plus a fingerprint of the job configuration. On the next run only
+new or changed inputs are processed:
+
+    size + mtime unchanged          -> current, skipped without reading it;
+    size / mtime changed, same hash -> current (e.g. re-downloaded), re-stamped;
+    otherwise, or config changed    -> processed again.
+
+Scanners that append to one CSV across days record where each input's rows
+start (row_start, rows_out), so a corrected input's rows can be replaced
+instead of duplicated (drop_rows).
+
+Inside a file, a ChunkCheckpoint writes each finished chunk's output to its
+own Parquet part (atomically) and then bumps a progress counter, so a run
+that dies at row 4.9M resumes after the last completed chunk instead of
+starting the day over.
+"""
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+
+HASH_BLOCK = 8 << 20  # Bytes per read when hashing an input file
+
+
+def file_signature(path):
+    """Cheap change check: size and mtime (whole seconds)."""
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime': int(st.st_mtime)}
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def config_fingerprint(*parts):
+    """Stable hash of the job configuration (JSON-serializable parts, file contents, ...)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def state_ledger_path(state_path):
+    """Ledger kept next to a daily detector's state file (data/x_state.npz -> data/x_state_ledger.json)."""
+    return os.path.splitext(state_path)[0] + '_ledger.json'
+
+
+def csv_rows(path):
+    """Data rows of a CSV output (0 when it does not exist yet)."""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def _write_json(path, payload):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class JobLedger:
+    def __init__(self, path, config=None):
+        """
+        path: ledger JSON file; config: fingerprint of everything besides the
+        inputs that shapes the output (a change invalidates every entry).
+        """
+        self.path = path
+        self.config = config
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                payload = json.load(f)
+            if payload.get('config') == config:
+                self.files = payload['files']
+            else:
+                print(f"[!] Job configuration changed since the last run; {path} starts over.")
+
+    @staticmethod
+    def key(input_path):
+        """Inputs are keyed by file name (AIS_2024_01_19.zip -> AIS_2024_01_19)."""
+        return os.path.splitext(os.path.basename(input_path))[0]
+
+    def entry(self, input_path):
+        return self.files.get(self.key(input_path))
+
+    def is_current(self, input_path):
+        """True when the input finished with this exact content and its outputs still exist."""
+        entry = self.entry(input_path)
+        if entry is None or not all(os.path.exists(p) for p in entry['outputs']):
+            return False
+        sig = file_signature(input_path)
+        if sig['size'] == entry['size'] and sig['mtime'] == entry['mtime']:
+            return True
+        # Touched or re-downloaded: only the content hash decides
+        if sig['size'] != entry['size'] or file_sha256(input_path) != entry['sha256']:
+            return False
+        entry.update(sig)
+        self.save()
+        return True
+
+    def pending(self, input_paths):
+        """The inputs that are new, changed, or never finished."""
+        return [p for p in input_paths if not self.is_current(p)]
+
+    def complete(self, input_path, outputs=(), **counts):
+        """Records a finished input with its output files and row counts (rows_out, rows_scanned, ...)."""
+        self.files[self.key(input_path)] = {
+            **file_signature(input_path),
+            'sha256': file_sha256(input_path),
+            'outputs': list(outputs),
+            'completed': pd.Timestamp.now(tz='UTC').isoformat(timespec='seconds'),
+            **counts,
+        }
+        self.save()
+
+    def drop_rows(self, input_path, output_path):
+        """
+        Removes the rows an input appended to a CSV output (its row_start /
+        rows_out) and shifts the entries appended after it. Returns the number
+        of rows removed, or None when the entry does not record its rows.
+        """
+        entry = self.entry(input_path)
+        if entry is None or entry.get('row_start') is None:
+            return None
+        start, n = entry['row_start'], entry.get('rows_out', 0)
+        if n and os.path.exists(output_path):
+            df = pd.read_csv(output_path, dtype=str, keep_default_na=False)
+            tmp = output_path + '.tmp'
+            df.drop(df.index[start:start + n]).to_csv(tmp, index=False)
+            os.replace(tmp, output_path)
+            for other in self.files.values():
+                if other.get('row_start') is not None and other['row_start'] > start:
+                    other['row_start'] -= n
+        entry['row_start'], entry['rows_out'] = None, 0
+        self.save()
+        return n
+
+    def forget(self, input_path):
+        self.files.pop(self.key(input_path), None)
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        _write_json(self.path, {'config': self.config, 'files': self.files})
+
+
+class ChunkCheckpoint:
+    """
+    Per-input chunk progress under part_dir: one Parquet part per finished
+    chunk plus progress.json. Progress only counts if it was made on the same
+    input (signature) with the same reader source and configuration (tag), so
+    chunk boundaries line up on resume.
+    """
+
+    def __init__(self, part_dir, input_path, tag=None):
+        self.part_dir = part_dir
+        self.progress_path = os.path.join(part_dir, 'progress.json')
+        self.stamp = {**file_signature(input_path), 'tag': tag}
+        self.done = 0
+        self.parts = []
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path) as f:
+                progress = json.load(f)
+            if progress['stamp'] == self.stamp:
+                self.done, self.parts = progress['done'], progress['parts']
+            else:
+                self.clear()
+
+    def resume(self, batches):
+        """Yields (chunk number, batch) for the chunks not yet done; earlier ones are read and dropped."""
+        for i, batch in enumerate(batches):
+            if i >= self.done:
+                yield i, batch
+
+    def save(self, i, df, **extra):
+        """
+        Marks chunk i done, storing its output and any extra named frames
+        (e.g. stats=...). Empty frames write no part.
+        """
+        if i != self.done:
+            raise ValueError(f"Chunk {i} finished out of order (expected {self.done})")
+        os.makedirs(self.part_dir, exist_ok=True)
+        for kind, frame in {'': df, **extra}.items():
+            if len(frame):
+                name = f"{i:06d}.{kind + '.' if kind else ''}parquet"
+                tmp = os.path.join(self.part_dir, name + '.tmp')
+                frame.to_parquet(tmp)
+                os.replace(tmp, os.path.join(self.part_dir, name))
+                self.parts.append(name)
+        self.done = i + 1
+        _write_json(self.progress_path, {'stamp': self.stamp, 'done': self.done, 'parts': self.parts})
+
+    def frames(self, kind=''):
+        """The stored chunk outputs (or extra frames of one kind), in chunk order, index as written."""
+        for name in self.parts:
+            if name.split('.')[1:-1] == ([kind] if kind else []):
+                yield pd.read_parquet(os.path.join(self.part_dir, name))
+
+    def clear(self):
+        shutil.rmtree(self.part_dir, ignore_errors=True)
+        self.done, self.parts = 0, []
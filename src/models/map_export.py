@@ -0,0 +1,419 @@
+"""
+Streaming map export for large anomaly sets.
+Placemarks / features are written to disk as they are produced (no document
+string held in memory), names and descriptions are XML-escaped, and the file
+only replaces the previous export once it is complete. Besides one point per
+flagged ping, pings can be collapsed into one LineString per vessel track,
+clustered on a screen-space grid, or cut into z/x/y GeoJSON tiles for web
+maps (clusters at low zooms, raw points and clipped tracks above).
+"""
+import os
+import json
+import math
+from xml.sax.saxutils import escape
+import numpy as np
+import pandas as pd
+import shapely
+from .tracks import epoch_seconds, sort_order
+
+CHUNK_ROWS = 100_000      # Rows per streamed CSV chunk
+TRACK_GAP_S = 3600        # A silence this long starts a new track segment
+CLUSTER_PX = 60           # Cluster cell size in screen pixels (256 px tiles)
+TILE_PX = 256
+MAX_MERCATOR_LAT = 85.05112878
+COORD_DECIMALS = 6        # ~0.1 m, plenty for AIS
+DESCRIPTION_FIELDS = (('MMSI', 'MMSI'), ('Z_Score', 'Z-Score'), ('Status', 'Status'))
+PROPERTY_COLUMNS = ('MMSI', 'VesselName', 'BaseDateTime', 'SOG', 'VesselType', 'Status', 'Z_Score')
+# Nullable ints so blank VesselType/Status export as null, not 31.0
+CSV_DTYPES = {'MMSI': 'int64', 'VesselType': 'Int16', 'Status': 'Int16', 'VesselName': str, 'BaseDateTime': str}
+
+_KML_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+<Document>
+    <name>{name}</name>
+    <description>{description}</description>
+    <Style id="track"><LineStyle><color>ff3b30ff</color><width>2</width></LineStyle></Style>
+    <Style id="cluster"><IconStyle><scale>1.4</scale></IconStyle></Style>
+"""
+_KML_FOOTER = """</Document>
+</kml>
+"""
+
+
+def kml_escape(text):
+    """XML-escapes a value for element text (vessel names contain &, < and quotes)."""
+    return escape(str(text), {'"': '&quot;', "'": '&apos;'})
+
+
+def _json_value(v):
+    if isinstance(v, (np.integer,)):
+        return int(v)
+    if isinstance(v, (np.floating, float)):
+        return None if math.isnan(v) else float(v)
+    if isinstance(v, pd.Timestamp):
+        return v.strftime('%Y-%m-%dT%H:%M:%S')
+    if v is None or v is pd.NA or v is pd.NaT:
+        return None
+    return v
+
+
+class _AtomicWriter:
+    """Writes to <path>.tmp and moves it over <path> only when closed without error."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.f = open(path + '.tmp', 'w', encoding='utf-8')
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.close()
+            os.remove(self.path + '.tmp')
+
+    def _finish(self):
+        pass
+
+    def close(self):
+        self._finish()
+        self.f.close()
+        os.replace(self.path + '.tmp', self.path)
+
+
+class KMLWriter(_AtomicWriter):
+    def __init__(self, path, name, description=''):
+        super().__init__(path)
+        self.f.write(_KML_HEADER.format(name=kml_escape(name), description=kml_escape(description)))
+
+    def points(self, names, descriptions, lons, lats):
+        """Appends one Placemark per point (names/descriptions are escaped here)."""
+        self.f.writelines(
+            f"""    <Placemark>
+        <name>{kml_escape(n)}</name>
+        <description>{kml_escape(d)}</description>
+        <Point><coordinates>{x},{y},0</coordinates></Point>
+    </Placemark>
+""" for n, d, x, y in zip(names, descriptions, lons, lats))
+        self.count += len(names)
+
+    def line(self, name, description, coords, style='track'):
+        text = ' '.join(f"{x:.{COORD_DECIMALS}f},{y:.{COORD_DECIMALS}f},0" for x, y in coords)
+        self.f.write(f"""    <Placemark>
+        <name>{kml_escape(name)}</name>
+        <description>{kml_escape(description)}</description>
+        <styleUrl>#{style}</styleUrl>
+        <LineString><tessellate>1</tessellate><coordinates>{text}</coordinates></LineString>
+    </Placemark>
+""")
+        self.count += 1
+
+    def _finish(self):
+        self.f.write(_KML_FOOTER)
+
+
+class GeoJSONWriter(_AtomicWriter):
+    """FeatureCollection written one Feature at a time."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.f.write('{"type": "FeatureCollection", "features": [\n')
+
+    def feature(self, geometry, properties):
+        if self.count:
+            self.f.write(',\n')
+        self.f.write(json.dumps({'type': 'Feature', 'geometry': geometry,
+                                 'properties': {k: _json_value(v) for k, v in properties.items()}}))
+        self.count += 1
+
+    def encoded(self, features):
+        """Appends already-encoded Feature JSON strings (see point_features)."""
+        if not features:
+            return
+        if self.count:
+            self.f.write(',\n')
+        self.f.write(',\n'.join(features))
+        self.count += len(features)
+
+    def _finish(self):
+        self.f.write('\n]}\n')
+
+
+def read_table(path, chunk_rows=None, verbatim=False):
+    """
+    The anomaly CSV, whole or in chunks. verbatim=True keeps every value as
+    the exact text written (for KML); otherwise AIS columns get stable dtypes.
+    """
+    if verbatim:
+        return pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+    return pd.read_csv(path, chunksize=chunk_rows, dtype=CSV_DTYPES)
+
+
+def properties_json(df, columns=PROPERTY_COLUMNS):
+    """Each row's properties as a JSON object string (pandas' C encoder; NaN/NA -> null)."""
+    cols = [c for c in columns if c in df]
+    if df.empty:
+        return []
+    return df[cols].to_json(orient='records', lines=True, date_format='iso', date_unit='s').splitlines()
+
+
+def point_features(lons, lats, props_json):
+    """Encoded Point Features for aligned coordinate arrays and property strings."""
+    return [f'{{"type": "Feature", "geometry": {{"type": "Point", "coordinates": [{x}, {y}]}}, '
+            f'"properties": {p}}}'
+            for x, y, p in zip(np.round(np.asarray(lons, dtype=float), COORD_DECIMALS).tolist(),
+                               np.round(np.asarray(lats, dtype=float), COORD_DECIMALS).tolist(), props_json)]
+
+
+def descriptions(df, fields=DESCRIPTION_FIELDS):
+    """'MMSI: ... | Z-Score: ... | Status: ...' per row, from the columns present."""
+    parts = [label + ': ' + df[col].astype(str) for col, label in fields if col in df]
+    if not parts:
+        return pd.Series('', index=df.index)
+    out = parts[0]
+    for p in parts[1:]:
+        out = out + ' | ' + p
+    return out
+
+
+def _names(df):
+    # Blank or missing names fall back to the MMSI
+    mmsi = df['MMSI'].astype(str)
+    if 'VesselName' not in df:
+        return mmsi
+    names = df['VesselName'].astype('string').str.strip()
+    return names.mask(names.isna() | (names == ''), mmsi).astype(object)
+
+
+def track_segments(df, gap_s=TRACK_GAP_S):
+    """
+    Collapses pings (MMSI, BaseDateTime, LAT, LON) into per-vessel track segments,
+    split wherever a vessel is silent for more than gap_s.
+    Returns a DataFrame with MMSI, start, end, n_pings and a shapely geometry
+    (LineString, or Point for a lone ping), plus VesselName / max |Z_Score| when present.
+    """
+    if len(df) == 0:
+        extra = [col for col, src in (('VesselName', 'VesselName'), ('max_abs_z', 'Z_Score')) if src in df]
+        return pd.DataFrame(columns=['MMSI', 'start', 'end', 'n_pings'] + extra + ['geometry'])
+    mmsi = df['MMSI'].to_numpy(dtype=np.int64)
+    t = epoch_seconds(df['BaseDateTime'])
+    order = sort_order(mmsi, t)
+    mmsi, t = mmsi[order], t[order]
+    lon = df['LON'].to_numpy(dtype=float)[order]
+    lat = df['LAT'].to_numpy(dtype=float)[order]
+
+    new = np.r_[True, (mmsi[1:] != mmsi[:-1]) | (np.diff(t) > gap_s)]
+    seg = np.cumsum(new) - 1
+    starts = np.flatnonzero(new)
+    counts = np.diff(np.r_[starts, len(seg)])
+
+    coords = np.column_stack([lon, lat])
+    multi = np.repeat(counts > 1, counts)
+    geoms = np.empty(len(starts), dtype=object)
+    if multi.any():
+        # One LineString per multi-ping segment, in segment order
+        geoms[counts > 1] = shapely.linestrings(coords[multi], indices=np.unique(seg[multi], return_inverse=True)[1])
+    geoms[counts == 1] = shapely.points(coords[starts[counts == 1]])
+
+    ends = starts + counts - 1
+    out = pd.DataFrame({
+        'MMSI': mmsi[starts],
+        'start': pd.to_datetime(t[starts], unit='s'),
+        'end': pd.to_datetime(t[ends], unit='s'),
+        'n_pings': counts,
+    })
+    if 'VesselName' in df:
+        out['VesselName'] = df['VesselName'].to_numpy()[order][starts]
+    if 'Z_Score' in df and len(starts):
+        z = np.abs(df['Z_Score'].to_numpy(dtype=float)[order])
+        out['max_abs_z'] = np.fmax.reduceat(z, starts)
+    out['geometry'] = geoms
+    return out
+
+
+def _pixels(lon, lat, zoom):
+    """Web-Mercator global pixel coordinates at a zoom level (vectorized)."""
+    size = TILE_PX * (1 << zoom)
+    lat = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    px = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * size
+    py = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * size
+    return np.clip(px, 0, size - 1e-9), np.clip(py, 0, size - 1e-9)
+
+
+def tile_xy(lon, lat, zoom):
+    """Slippy-map tile x/y of each point."""
+    px, py = _pixels(lon, lat, zoom)
+    return (px // TILE_PX).astype(np.int64), (py // TILE_PX).astype(np.int64)
+
+
+def tile_bounds(x, y, zoom):
+    """(lon_min, lat_min, lon_max, lat_max) of a tile."""
+    n = 1 << zoom
+    lon0, lon1 = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+    lat1 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    lat0 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return lon0, lat0, lon1, lat1
+
+
+def grid_clusters(df, zoom, cell_px=CLUSTER_PX):
+    """
+    Server-side clustering: pings sharing a cell_px screen cell at `zoom` are
+    merged into one feature at their centroid with count / n_vessels.
+    Returns LON, LAT, count, n_vessels and `first`, the row of a member ping.
+    """
+    px, py = _pixels(df['LON'].to_numpy(), df['LAT'].to_numpy(), zoom)
+    cell = pd.DataFrame({'cx': (px // cell_px).astype(np.int64), 'cy': (py // cell_px).astype(np.int64),
+                         'LON': df['LON'].to_numpy(dtype=float), 'LAT': df['LAT'].to_numpy(dtype=float),
+                         'MMSI': df['MMSI'].to_numpy(), 'row': np.arange(len(df))})
+    g = cell.groupby(['cx', 'cy'], sort=False)
+    return pd.DataFrame({'LON': g['LON'].mean(), 'LAT': g['LAT'].mean(), 'count': g.size(),
+                         'n_vessels': g['MMSI'].nunique(), 'first': g['row'].first()}).reset_index(drop=True)
+
+
+def _cluster_props(cl):
+    return [f'{{"cluster": true, "count": {c}, "n_vessels": {v}}}'
+            for c, v in zip(cl['count'].tolist(), cl['n_vessels'].tolist())]
+
+
+def _cluster_name(count):
+    return f"{count:,} pings"
+
+
+def export_points_kml(src_path, out_path, name, description='', chunk_rows=CHUNK_ROWS):
+    """One Placemark per flagged ping, streamed chunk by chunk (values written verbatim)."""
+    with KMLWriter(out_path, name, description) as kml:
+        for chunk in read_table(src_path, chunk_rows, verbatim=True):
+            kml.points(_names(chunk).tolist(), descriptions(chunk).tolist(),
+                       chunk['LON'].tolist(), chunk['LAT'].tolist())
+        return kml.count
+
+
+def export_points_geojson(src_path, out_path, chunk_rows=CHUNK_ROWS):
+    """One Point feature per flagged ping, streamed chunk by chunk."""
+    with GeoJSONWriter(out_path) as gj:
+        for chunk in read_table(src_path, chunk_rows):
+            gj.encoded(point_features(chunk['LON'], chunk['LAT'], properties_json(chunk)))
+        return gj.count
+
+
+def _track_props(row):
+    props = {'MMSI': row.MMSI, 'start': row.start, 'end': row.end, 'n_pings': row.n_pings}
+    for col in ('VesselName', 'max_abs_z'):
+        if hasattr(row, col):
+            props[col] = getattr(row, col)
+    return props
+
+
+def _track_description(row):
+    text = f"MMSI: {row.MMSI} | {row.n_pings} pings | {row.start:%Y-%m-%d %H:%M} - {row.end:%H:%M}"
+    if hasattr(row, 'max_abs_z'):
+        text += f" | max |Z|: {row.max_abs_z:.2f}"
+    return text
+
+
+def export_kml(df, out_path, name, description='', tracks=False, cluster_zoom=None, gap_s=TRACK_GAP_S):
+    """
+    KML from an in-memory anomaly table: per-track LineStrings (tracks=True),
+    screen-grid clusters at cluster_zoom, or both (clusters first).
+    """
+    with KMLWriter(out_path, name, description) as kml:
+        if cluster_zoom is not None:
+            cl = grid_clusters(df, cluster_zoom)
+            kml.points([_cluster_name(c) for c in cl['count']],
+                       [f"{v} vessel(s)" for v in cl['n_vessels']],
+                       cl['LON'].round(COORD_DECIMALS).tolist(), cl['LAT'].round(COORD_DECIMALS).tolist())
+        if tracks:
+            segs = track_segments(df, gap_s)
+            for label, row in zip(_names(segs), segs.itertuples(index=False)):
+                if row.n_pings > 1:
+                    kml.line(label, _track_description(row), shapely.get_coordinates(row.geometry))
+                else:
+                    kml.points([label], [_track_description(row)], [row.geometry.x], [row.geometry.y])
+        return kml.count
+
+
+def export_geojson(df, out_path, tracks=False, cluster_zoom=None, gap_s=TRACK_GAP_S):
+    """GeoJSON counterpart of export_kml."""
+    with GeoJSONWriter(out_path) as gj:
+        if cluster_zoom is not None:
+            cl = grid_clusters(df, cluster_zoom)
+            gj.encoded(point_features(cl['LON'], cl['LAT'], _cluster_props(cl)))
+        if tracks:
+            segs = track_segments(df, gap_s)
+            gj.encoded([_track_feature(geom, row) for row, geom in zip(segs.itertuples(index=False), segs['geometry'])])
+        return gj.count
+
+
+def _track_feature(geom, row):
+    geom = shapely.set_precision(geom, 10 ** -COORD_DECIMALS)
+    props = {k: _json_value(v) for k, v in _track_props(row).items()}
+    return f'{{"type": "Feature", "geometry": {shapely.to_geojson(geom)}, "properties": {json.dumps(props)}}}'
+
+
+def export_tiles(df, out_dir, min_zoom=0, max_zoom=12, cluster_below=10, tracks=False, gap_s=TRACK_GAP_S):
+    """
+    Pre-tiled GeoJSON under out_dir/{z}/{x}/{y}.geojson plus out_dir/tiles.json.
+    Zooms below cluster_below hold grid clusters (count, n_vessels; a lone
+    ping keeps its own properties); from cluster_below up, the raw pings and,
+    with tracks=True, track LineStrings clipped to each tile.
+    Returns the number of tiles written.
+    """
+    lon = df['LON'].to_numpy(dtype=float)
+    lat = df['LAT'].to_numpy(dtype=float)
+    props = np.array(properties_json(df), dtype=object)
+    segs = track_segments(df, gap_s) if tracks else None
+    n_tiles = 0
+
+    for z in range(min_zoom, max_zoom + 1):
+        if z < cluster_below:
+            cl = grid_clusters(df, z)
+            fx, fy = cl['LON'].to_numpy(), cl['LAT'].to_numpy()
+            fprops = np.where(cl['count'].to_numpy() > 1, np.array(_cluster_props(cl), dtype=object),
+                              props[cl['first'].to_numpy()])
+        else:
+            fx, fy, fprops = lon, lat, props
+        features = np.array(point_features(fx, fy, fprops), dtype=object)
+
+        # Group features by tile with one sort instead of a dict append per ping
+        tx, ty = tile_xy(fx, fy, z)
+        order = np.lexsort((ty, tx))
+        tx, ty, features = tx[order], ty[order], features[order]
+        cut = np.flatnonzero(np.r_[True, (tx[1:] != tx[:-1]) | (ty[1:] != ty[:-1])]) if len(tx) else tx
+        tiles = {(int(tx[i]), int(ty[i])): list(part) for i, part in zip(cut, np.split(features, cut[1:]))}
+
+        if segs is not None and len(segs) and z >= cluster_below:
+            # Track pieces: every tile a segment's bbox touches, clipped to the tile
+            lon0, lat0, lon1, lat1 = shapely.bounds(segs['geometry'].to_numpy()).T
+            x0, y1 = tile_xy(lon0, lat0, z)
+            x1, y0 = tile_xy(lon1, lat1, z)
+            for k, row in enumerate(segs.itertuples(index=False)):
+                if row.n_pings < 2:
+                    continue
+                for x in range(x0[k], x1[k] + 1):
+                    for y in range(y0[k], y1[k] + 1):
+                        piece = shapely.clip_by_rect(row.geometry, *tile_bounds(x, y, z))
+                        if not piece.is_empty:
+                            tiles.setdefault((x, y), []).append(_track_feature(piece, row))
+
+        for (x, y), encoded in tiles.items():
+            with GeoJSONWriter(os.path.join(out_dir, str(z), str(x), f"{y}.geojson")) as gj:
+                gj.encoded(encoded)
+        n_tiles += len(tiles)
+
+    meta = {
+        'format': 'geojson',
+        'tiles': '{z}/{x}/{y}.geojson',
+        'minzoom': min_zoom, 'maxzoom': max_zoom, 'cluster_below': cluster_below,
+        'bounds': [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())] if len(lon) else None,
+        'features': len(df),
+    }
+    tmp = os.path.join(out_dir, 'tiles.json.tmp')
+    os.makedirs(out_dir, exist_ok=True)
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, 'tiles.json'))
+    return n_tiles
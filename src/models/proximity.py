@@ -0,0 +1,154 @@
+"""
+Vectorized proximity engine for pipelines and cables.
+Infrastructure lines are split into two-point segments once and loaded into
+an STRtree. A batch of pings is projected with a single pyproj call and
+answered with one query_nearest call, so the cost is ~log(segments) per
+ping instead of pings x segments.
+"""
+import numpy as np
+import pyproj
+import shapely
+from shapely.geometry import box, MultiPolygon
+from .distance import transformer, utm_epsg, WGS84
+
+ZONE_MARGIN_DEG = 20.0  # Longitude kept either side of a UTM zone's central meridian
+
+
+def explode_segments(geoms):
+    """
+    Splits (multi)linestrings into two-point segments.
+    Returns (segments, parent) where parent[i] is the index of the input geometry.
+    """
+    parts, parent_of_part = shapely.get_parts(geoms, return_index=True)
+    coords, part_idx = shapely.get_coordinates(parts, return_index=True)
+
+    same_part = part_idx[1:] == part_idx[:-1]
+    start = coords[:-1][same_part]
+    end = coords[1:][same_part]
+    segments = shapely.linestrings(np.stack([start, end], axis=1))
+    return segments, parent_of_part[part_idx[:-1][same_part]]
+
+
+class ProximityEngine:
+    """
+    Nearest-infrastructure queries in a metric CRS.
+    gdf: GeoDataFrame of lines (any CRS); it is projected to `crs` once here.
+    id_column: attribute returned as the segment ID (defaults to the row index).
+    """
+
+    def __init__(self, gdf, crs, id_column=None):
+        self.crs = pyproj.CRS.from_user_input(crs)
+        projected = gdf.to_crs(self.crs)
+
+        self.ids = (projected[id_column] if id_column else projected.index).to_numpy()
+        self.segments, self.parent = explode_segments(projected.geometry.to_numpy())
+        self.tree = shapely.STRtree(self.segments)
+        self._to_metric = transformer(WGS84, self.crs)
+
+    def project(self, lon, lat):
+        """WGS84 lon/lat arrays -> projected x/y arrays (one pyproj call)."""
+        return self._to_metric.transform(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+
+    def nearest(self, lon, lat, max_distance=None):
+        """
+        Distance (metres) and ID of the nearest infrastructure feature for each ping.
+        With max_distance, pings with nothing in range get NaN / None and the
+        tree search is bounded, which is much faster for sparse hits.
+        """
+        x, y = self.project(lon, lat)
+        points = shapely.points(x, y)
+
+        dist = np.full(len(points), np.nan)
+        nearest_id = np.full(len(points), None, dtype=object)
+        if len(points) == 0 or len(self.segments) == 0:
+            return dist, nearest_id
+
+        (pt_idx, seg_idx), d = self.tree.query_nearest(
+            points, max_distance=max_distance, return_distance=True, all_matches=False)
+        dist[pt_idx] = d
+        nearest_id[pt_idx] = self.ids[self.parent[seg_idx]]
+        return dist, nearest_id
+
+    def nearest_to_segments(self, lon0, lat0, lon1, lat1, max_distance=None):
+        """
+        Like nearest(), but for straight movement segments (lon0, lat0) -> (lon1, lat1):
+        the closest approach of each segment to any infrastructure feature.
+        """
+        x0, y0 = self.project(lon0, lat0)
+        x1, y1 = self.project(lon1, lat1)
+        lines = shapely.linestrings(np.stack([np.stack([x0, y0], axis=1), np.stack([x1, y1], axis=1)], axis=1))
+
+        dist = np.full(len(lines), np.nan)
+        nearest_id = np.full(len(lines), None, dtype=object)
+        if len(lines) == 0 or len(self.segments) == 0:
+            return dist, nearest_id
+
+        (ln_idx, seg_idx), d = self.tree.query_nearest(
+            lines, max_distance=max_distance, return_distance=True, all_matches=False)
+        dist[ln_idx] = d
+        nearest_id[ln_idx] = self.ids[self.parent[seg_idx]]
+        return dist, nearest_id
+
+
+def zone_window(cm, margin=ZONE_MARGIN_DEG):
+    """
+    Lon/lat window of +-margin around a central meridian, wrapped at +-180 (a
+    window past the antimeridian becomes two boxes, one on each side).
+    """
+    lo, hi = cm - margin, cm + margin
+    parts = [box(max(lo, -180), -80, min(hi, 180), 84)]
+    if lo < -180:
+        parts.append(box(lo + 360, -80, 180, 84))
+    if hi > 180:
+        parts.append(box(-180, -80, hi - 360, 84))
+    return MultiPolygon(parts) if len(parts) > 1 else parts[0]
+
+
+class ZonedProximityEngine:
+    """
+    ProximityEngine that measures every ping in its own UTM zone, so metric
+    thresholds hold anywhere (a single projected CRS distorts far from its
+    zone). Per-zone engines are built on first use and kept, each over the
+    layer clipped to a window around the zone (a global cable layer cannot be
+    projected into one transverse Mercator zone).
+    gdf: GeoDataFrame of lines in any CRS.
+    """
+
+    def __init__(self, gdf, id_column=None):
+        self.gdf = gdf.to_crs(WGS84)
+        self.id_column = id_column
+        self._engines = {}
+
+    def engine(self, epsg):
+        epsg = int(epsg)
+        if epsg not in self._engines:
+            if epsg in (32661, 32761):
+                window = box(-180, 60, 180, 90) if epsg == 32661 else box(-180, -90, 180, -60)
+            else:
+                cm = (epsg % 100) * 6 - 183  # Zone central meridian
+                window = zone_window(cm)
+            local = self.gdf.clip(window)
+            self._engines[epsg] = ProximityEngine(local, crs=epsg, id_column=self.id_column)
+        return self._engines[epsg]
+
+    def _by_zone(self, lon, lat, query):
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        dist = np.full(len(lon), np.nan)
+        nearest_id = np.full(len(lon), None, dtype=object)
+        zones = utm_epsg(lon, lat)
+        for epsg in np.unique(zones):
+            m = zones == epsg
+            dist[m], nearest_id[m] = query(self.engine(epsg), m)
+        return dist, nearest_id
+
+    def nearest(self, lon, lat, max_distance=None):
+        """Same contract as ProximityEngine.nearest (metres, IDs)."""
+        lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        return self._by_zone(lon, lat, lambda e, m: e.nearest(lon[m], lat[m], max_distance))
+
+    def nearest_to_segments(self, lon0, lat0, lon1, lat1, max_distance=None):
+        """Same contract as ProximityEngine.nearest_to_segments; zone taken from the segment start."""
+        lon0, lat0, lon1, lat1 = (np.asarray(v, dtype=float) for v in (lon0, lat0, lon1, lat1))
+        return self._by_zone(lon0, lat0, lambda e, m: e.nearest_to_segments(
+            lon0[m], lat0[m], lon1[m], lat1[m], max_distance))
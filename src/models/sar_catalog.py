@@ -0,0 +1,226 @@
+"""
+Local Sentinel-1 scene catalogue.
+Queries the CDSE STAC search API with full pagination, issuing concurrent
+requests for many bbox/time tiles, and persists every scene footprint and
+acquisition time in SQLite with an R-tree over (lon, lat, time). Fusion code
+asks "which passes cover this event?" against the local index in
+milliseconds. Request tiles sit on a fixed lon/lat/time grid, so overlapping
+runs share them, and a tile is only re-queried once its TTL has expired.
+
+The STAC URL is a constructor argument, so the catalogue can be pointed at a
+local mock server.
+"""
+import json
+import math
+import time
+import sqlite3
+import requests
+import pandas as pd
+import shapely
+from shapely.geometry import shape, Point
+from concurrent.futures import ThreadPoolExecutor
+
+STAC_URL = "https://stac.dataspace.copernicus.eu/v1/search"
+COLLECTION = "SENTINEL-1-GRD"
+CATALOG_PATH = 'data/sar_catalog.sqlite'
+PAGE_LIMIT = 100
+TTL_HOURS = 24
+TILE_DEG = 2.0
+TILE_DAYS = 7
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT UNIQUE,
+    collection TEXT,
+    start_time REAL,
+    end_time REAL,
+    datetime TEXT,
+    geometry TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS scene_rtree USING rtree(
+    rowid, min_lon, max_lon, min_lat, max_lat, min_t, max_t
+);
+CREATE TABLE IF NOT EXISTS queries (
+    tile_key TEXT PRIMARY KEY,
+    fetched_at REAL,
+    n_scenes INTEGER
+);
+"""
+
+
+def _utc(ts):
+    """Timestamp in naive UTC (AIS timestamps are naive UTC, STAC ones carry 'Z')."""
+    ts = pd.Timestamp(ts)
+    return ts.tz_convert('UTC').tz_localize(None) if ts.tzinfo is not None else ts
+
+
+def _epoch(ts):
+    return (_utc(ts) - pd.Timestamp(0)).total_seconds()
+
+
+def _iso(ts):
+    return _utc(ts).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def search_tiles(bbox, start, end, tile_deg=TILE_DEG, tile_days=TILE_DAYS):
+    """
+    (bbox, start, end) request tiles covering a bbox/time range. Tiles sit on a
+    fixed grid (tile_deg cells from 0/0, tile_days blocks from the Unix epoch)
+    and are not clipped to the query, so overlapping queries share tiles.
+    """
+    start, end = _utc(start), _utc(end)
+    block = pd.Timedelta(days=tile_days)
+    k_lo = math.floor((start - pd.Timestamp(0)) / block)
+    k_hi = max(math.ceil((end - pd.Timestamp(0)) / block) - 1, k_lo)
+    tiles = []
+    for i in _cells(bbox[0], bbox[2], tile_deg):
+        for j in _cells(bbox[1], bbox[3], tile_deg):
+            tile_bbox = [max(i * tile_deg, -180), max(j * tile_deg, -90),
+                         min((i + 1) * tile_deg, 180), min((j + 1) * tile_deg, 90)]
+            for k in range(k_lo, k_hi + 1):
+                tiles.append((tile_bbox, pd.Timestamp(0) + k * block, pd.Timestamp(0) + (k + 1) * block))
+    return tiles
+
+
+def _cells(lo, hi, size):
+    """Grid cell numbers covering [lo, hi] (at least one, even for a point)."""
+    first = math.floor(lo / size)
+    return range(first, max(math.ceil(hi / size), first + 1))
+
+
+class SARCatalog:
+    def __init__(self, db_path=CATALOG_PATH, url=STAC_URL, collection=COLLECTION,
+                 ttl_hours=TTL_HOURS, max_workers=8, session=None):
+        self.url = url
+        self.collection = collection
+        self.ttl_s = ttl_hours * 3600
+        self.max_workers = max_workers
+        self.session = session or requests.Session()
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # --- Remote search -------------------------------------------------
+
+    def search(self, bbox, start, end, limit=PAGE_LIMIT):
+        """All STAC features for one bbox/time window, following every 'next' link."""
+        payload = {"collections": [self.collection], "bbox": list(bbox),
+                   "datetime": f"{_iso(start)}/{_iso(end)}", "limit": limit}
+        features = []
+        method, url, body = 'POST', self.url, payload
+        while url:
+            if method == 'POST':
+                resp = self.session.post(url, json=body, timeout=30)
+            else:
+                resp = self.session.get(url, timeout=30)
+            resp.raise_for_status()
+            page = resp.json()
+            features.extend(page.get('features', []))
+
+            nxt = next((l for l in page.get('links', []) if l.get('rel') == 'next'), None)
+            if nxt is None or not page.get('features'):
+                break
+            method = nxt.get('method', 'GET').upper()
+            url = nxt['href']
+            if method == 'POST':
+                # STAC paging: either a full replacement body or one merged into the previous
+                body = {**body, **nxt.get('body', {})} if nxt.get('merge') or 'body' not in nxt \
+                    else nxt['body']
+        return features
+
+    def refresh(self, bbox, start, end, force=False):
+        """
+        Fills the local index for bbox/[start, end]. The range is split into tiles
+        that are fetched concurrently; tiles fetched within the TTL are skipped.
+        Returns the number of tiles actually queried.
+        """
+        now = time.time()
+        todo = []
+        for tile in search_tiles(bbox, start, end):
+            key = self._tile_key(*tile)
+            row = self.db.execute("SELECT fetched_at FROM queries WHERE tile_key = ?", (key,)).fetchone()
+            if force or row is None or now - row[0] > self.ttl_s:
+                todo.append((key, tile))
+        if not todo:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(lambda kt: (kt[0], self._safe_search(*kt[1])), todo))
+
+        # SQLite writes stay on this thread
+        for key, features in results:
+            if features is None:
+                continue
+            self._store(features)
+            self.db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?, ?)", (key, now, len(features)))
+        self.db.commit()
+        return len(todo)
+
+    def _safe_search(self, bbox, start, end):
+        try:
+            return self.search(bbox, start, end)
+        except Exception as e:
+            print(f"[!] STAC search failed for {bbox} {start}..{end}: {e}")
+            return None
+
+    def _tile_key(self, bbox, start, end):
+        return f"{self.collection}|{','.join(f'{v:.4f}' for v in bbox)}|{_iso(start)}|{_iso(end)}"
+
+    def _store(self, features):
+        for feat in features:
+            props = feat.get('properties', {})
+            dt = props.get('datetime') or props.get('start_datetime')
+            t0 = _epoch(props.get('start_datetime') or dt)
+            t1 = _epoch(props.get('end_datetime') or dt)
+            geom = shape(feat['geometry'])
+            min_lon, min_lat, max_lon, max_lat = feat.get('bbox') or geom.bounds
+
+            # Scenes seen by several overlapping tiles keep one row (and one R-tree entry)
+            row = self.db.execute("SELECT rowid FROM scenes WHERE id = ?", (feat['id'],)).fetchone()
+            values = (feat.get('collection', self.collection), t0, t1, dt, json.dumps(feat['geometry']))
+            if row is None:
+                rowid = self.db.execute(
+                    "INSERT INTO scenes (id, collection, start_time, end_time, datetime, geometry) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (feat['id'],) + values).lastrowid
+            else:
+                rowid = row[0]
+                self.db.execute("UPDATE scenes SET collection = ?, start_time = ?, end_time = ?, datetime = ?, "
+                                "geometry = ? WHERE rowid = ?", values + (rowid,))
+            self.db.execute("INSERT OR REPLACE INTO scene_rtree VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (rowid, min_lon, max_lon, min_lat, max_lat, t0, t1))
+
+    # --- Local queries -------------------------------------------------
+
+    def scenes(self, bbox=None, start=None, end=None):
+        """
+        Scenes whose footprint box and acquisition interval overlap the query.
+        The R-tree stores float32 bounds (times rounded by up to ~2 min), so the
+        interval is checked again on the exact columns.
+        """
+        bbox = bbox or [-180, -90, 180, 90]
+        t0 = _epoch(start) if start is not None else -1e12
+        t1 = _epoch(end) if end is not None else 1e12
+        rows = self.db.execute(
+            "SELECT s.id, s.datetime, s.start_time, s.end_time, s.geometry FROM scene_rtree r "
+            "JOIN scenes s ON s.rowid = r.rowid "
+            "WHERE r.max_lon >= ? AND r.min_lon <= ? AND r.max_lat >= ? AND r.min_lat <= ? "
+            "AND r.max_t >= ? AND r.min_t <= ? AND s.end_time >= ? AND s.start_time <= ? "
+            "ORDER BY s.start_time",
+            (bbox[0], bbox[2], bbox[1], bbox[3], t0, t1, t0, t1)).fetchall()
+        df = pd.DataFrame(rows, columns=['scene_id', 'datetime', 'start_time', 'end_time', 'geometry'])
+        df['start_time'] = pd.to_datetime(df['start_time'], unit='s')
+        df['end_time'] = pd.to_datetime(df['end_time'], unit='s')
+        df['geometry'] = [shape(json.loads(g)) for g in df['geometry']]
+        return df
+
+    def covering_passes(self, lon, lat, when, window=pd.Timedelta(hours=12)):
+        """Sentinel-1 passes whose footprint contains (lon, lat) within `window` of `when`."""
+        when = _utc(when)
+        cands = self.scenes([lon, lat, lon, lat], when - window, when + window)
+        if cands.empty:
+            return cands
+        inside = shapely.contains(cands['geometry'].to_numpy(), Point(lon, lat))
+        return cands[inside].reset_index(drop=True)
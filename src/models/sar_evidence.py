@@ -0,0 +1,193 @@
+"""
+Batch Sentinel-1 evidence chips from the CDSE Process API.
+One OAuth token is reused until shortly before it expires, all requests go
+through one pooled requests.Session with retry/backoff, a bounded thread pool
+caps concurrency, and rendered chips are cached on disk keyed by a hash of
+bbox, time range, size and evalscript - so re-running evidence generation for
+hundreds of flagged events only downloads chips that are not already on disk.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+
+TOKEN_URL = "https://identity.dataspace.copernicus.eu/auth/realms/CDSE/protocol/openid-connect/token"
+PROCESS_URL = "https://sh.dataspace.copernicus.eu/api/v1/process"
+CHIP_CACHE_DIR = 'data/sar_chips'
+CHIP_PX = 1024
+CHIP_OFFSET_DEG = 0.025      # Half-width of the chip around the event
+EVENT_WINDOW = pd.Timedelta(days=1)
+MAX_WORKERS = 4
+TOKEN_MARGIN_S = 60          # Refresh this long before the token actually expires
+
+VV_DB_EVALSCRIPT = """
+//VERSION=3
+function setup() { return { input: ["VV"], output: { bands: 1, sampleType: "AUTO" } }; }
+function evaluatePixel(sample) {
+  let db = 10 * Math.log10(Math.max(0.0001, sample.VV));
+  return [(db + 20) / 25];
+}
+"""
+
+
+def make_session(pool_size=MAX_WORKERS, retries=4, backoff=1.0):
+    """Pooled session; retries 429/5xx (honouring Retry-After) with exponential backoff."""
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(['GET', 'POST']), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _iso(ts):
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def chip_key(bbox, t_from, t_to, evalscript=VV_DB_EVALSCRIPT, size=CHIP_PX):
+    """Cache key: identical request parameters always map to the same chip file."""
+    spec = json.dumps({'bbox': [round(v, 6) for v in bbox], 'from': _iso(t_from), 'to': _iso(t_to),
+                       'size': size, 'evalscript': hashlib.sha256(evalscript.encode()).hexdigest()},
+                      sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()[:32]
+
+
+def process_payload(bbox, t_from, t_to, evalscript=VV_DB_EVALSCRIPT, size=CHIP_PX):
+    return {
+        "input": {
+            "bounds": {"bbox": list(bbox), "properties": {"crs": "http://www.opengis.net/def/crs/OGC/1.3/CRS84"}},
+            "data": [{"type": "S1GRD", "dataFilter": {
+                "timeRange": {"from": _iso(t_from), "to": _iso(t_to)},
+                "mosaickingOrder": "mostRecent"
+            }}]
+        },
+        "output": {"width": size, "height": size, "responses": [{"identifier": "default", "format": {"type": "image/png"}}]},
+        "evalscript": evalscript
+    }
+
+
+class TokenManager:
+    """Client-credentials token shared by all worker threads, fetched again only on expiry."""
+
+    def __init__(self, client_id, client_secret, token_url=TOKEN_URL, session=None, margin_s=TOKEN_MARGIN_S):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.session = session or requests.Session()
+        self.margin_s = margin_s
+        self.requests_made = 0
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def token(self):
+        with self._lock:
+            if self._token is None or time.time() >= self._expires_at:
+                resp = self.session.post(self.token_url, data={
+                    "grant_type": "client_credentials", "client_id": self.client_id,
+                    "client_secret": self.client_secret}, timeout=30)
+                resp.raise_for_status()
+                body = resp.json()
+                self._token = body["access_token"]
+                self._expires_at = time.time() + float(body.get("expires_in", 600)) - self.margin_s
+                self.requests_made += 1
+            return self._token
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+
+
+class SAREvidenceFetcher:
+    def __init__(self, client_id, client_secret, cache_dir=CHIP_CACHE_DIR, max_workers=MAX_WORKERS,
+                 process_url=PROCESS_URL, token_url=TOKEN_URL, evalscript=VV_DB_EVALSCRIPT, size=CHIP_PX):
+        self.session = make_session(pool_size=max_workers)
+        self.tokens = TokenManager(client_id, client_secret, token_url, session=self.session)
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.process_url = process_url
+        self.evalscript = evalscript
+        self.size = size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def chip_path(self, bbox, t_from, t_to):
+        return os.path.join(self.cache_dir, chip_key(bbox, t_from, t_to, self.evalscript, self.size) + '.png')
+
+    def fetch(self, bbox, t_from, t_to):
+        """
+        PNG chip for bbox/[t_from, t_to]. Returns (path, cache_hit).
+        Raises requests.HTTPError if the Process API rejects the request.
+        """
+        path = self.chip_path(bbox, t_from, t_to)
+        if os.path.exists(path):
+            return path, True
+
+        payload = process_payload(bbox, t_from, t_to, self.evalscript, self.size)
+        for attempt in range(2):
+            resp = self.session.post(self.process_url, json=payload, timeout=120,
+                                     headers={"Authorization": f"Bearer {self.tokens.token()}"})
+            if resp.status_code == 401 and attempt == 0:
+                self.tokens.invalidate()  # Revoked early: fetch a fresh token once
+                continue
+            break
+        resp.raise_for_status()
+
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(resp.content)
+        os.replace(tmp, path)
+        return path, False
+
+    def fetch_events(self, events, offset=CHIP_OFFSET_DEG, window=EVENT_WINDOW):
+        """
+        Chips for a table of events (LAT, LON plus either SAR_START/SAR_END or a
+        TIMESTAMP/START/BaseDateTime column, widened by +/- window).
+        Identical requests are downloaded once. Returns a copy of events with
+        CHIP_PATH (None on failure) and CHIP_CACHED columns.
+        """
+        events = events.reset_index(drop=True)
+        if 'SAR_START' in events and 'SAR_END' in events:
+            t_from, t_to = pd.to_datetime(events['SAR_START']), pd.to_datetime(events['SAR_END'])
+        else:
+            tcol = next(c for c in ('TIMESTAMP', 'START', 'BaseDateTime') if c in events)
+            t = pd.to_datetime(events[tcol])
+            t_from, t_to = t - window, t + window
+
+        requests_ = {}
+        keys = []
+        for lat, lon, a, b in zip(events['LAT'], events['LON'], t_from, t_to):
+            bbox = (lon - offset, lat - offset, lon + offset, lat + offset)
+            key = chip_key(bbox, a, b, self.evalscript, self.size)
+            requests_.setdefault(key, (bbox, a, b))
+            keys.append(key)
+
+        def work(item):
+            key, (bbox, a, b) = item
+            try:
+                return key, self.fetch(bbox, a, b)
+            except requests.RequestException as e:
+                print(f"[-] Chip failed for {bbox} {a}..{b}: {e}")
+                return key, (None, False)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = dict(pool.map(work, requests_.items()))
+
+        out = events.copy()
+        out['CHIP_PATH'] = [results[k][0] for k in keys]
+        out['CHIP_CACHED'] = [results[k][1] for k in keys]
+        hits = sum(cached for _, cached in results.values())
+        failed = sum(path is None for path, _ in results.values())
+        print(f"[+] {len(events)} events -> {len(requests_)} unique chips ({hits} cached, "
+              f"{len(requests_) - hits - failed} downloaded, {failed} failed, "
+              f"{self.tokens.requests_made} token requests)")
+        return out
@@ -0,0 +1,97 @@
+"""
+AIS event -> Sentinel-1 pass join.
+Attaches every SAR pass whose acquisition interval falls within +/- window of
+an event and whose footprint contains the event position. Passes are sorted
+by start time once and events are taken in time blocks one window wide: a
+block's candidate passes are one searchsorted range, and an STRtree over
+those passes' footprints pairs each event only with the passes whose
+bounding box holds it. Neither a long catalog nor many overlapping passes
+blow up the pairs; the exact footprint test is one vectorized shapely call
+over the pairs left. The output carries SAR_START/SAR_END, so it can be
+handed straight to SAREvidenceFetcher.fetch_events().
+"""
+import numpy as np
+import pandas as pd
+import shapely
+
+PASS_WINDOW = pd.Timedelta(hours=6)
+CHIP_TIME_PAD = pd.Timedelta(minutes=1)  # Process API time range around the pass itself
+EVENT_TIME_COLUMNS = ('TIMESTAMP', 'BaseDateTime', 'START', 'GAP_START')
+
+
+def event_times(events):
+    """
+    Event timestamp per row (kinetic sync list, flagged anomalies, loiter or gap
+    events). Mixed tables are coalesced in EVENT_TIME_COLUMNS order.
+    """
+    cols = [c for c in EVENT_TIME_COLUMNS if c in events]
+    if not cols:
+        raise ValueError(f"Event table needs one of {EVENT_TIME_COLUMNS}")
+    t = pd.to_datetime(events[cols[0]])
+    for c in cols[1:]:
+        t = t.fillna(pd.to_datetime(events[c]))
+    return t
+
+
+def join_events_to_passes(events, scenes, window=PASS_WINDOW):
+    """
+    events: DataFrame with LAT, LON and a timestamp column (see EVENT_TIME_COLUMNS).
+    scenes: SARCatalog.scenes() output (scene_id, datetime, start_time, end_time, geometry).
+    Returns one row per (event, covering pass): the event columns plus SCENE_ID,
+    SAR_TIME, SAR_OFFSET_MIN (pass minus event), SAR_START and SAR_END.
+    Events without a covering pass are dropped.
+    """
+    events = events.reset_index(drop=True)
+    if events.empty or scenes.empty:
+        return events.iloc[:0].assign(SCENE_ID=pd.Series(dtype=object))
+
+    # 1. Passes sorted by start; an interval can only overlap [t - w, t + w]
+    #    if its start lies in [t - w - longest_pass, t + w]
+    scenes = scenes.sort_values('start_time', ignore_index=True)
+    s0 = scenes['start_time'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    s1 = scenes['end_time'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    longest = int((s1 - s0).max())
+    geoms = scenes['geometry'].to_numpy()
+
+    times = event_times(events)
+    t = times.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    w = int(window.total_seconds())
+    lon = events['LON'].to_numpy(dtype=float)
+    lat = events['LAT'].to_numpy(dtype=float)
+    points = shapely.points(lon, lat)
+
+    # 2. Events in time blocks; each block queries an STRtree of the footprints
+    #    of its candidate passes, then the exact interval test per pair
+    timed = np.flatnonzero(times.notna().to_numpy())
+    timed = timed[np.argsort(t[timed], kind='stable')]
+    block = (t[timed] - t[timed[0]]) // max(w, 1) if len(timed) else timed
+    starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]]) if len(timed) else timed
+    ev, sc = [], []
+    for a, b in zip(starts, np.r_[starts[1:], len(timed)]):
+        idx = timed[a:b]
+        lo = np.searchsorted(s0, t[idx[0]] - w - longest, side='left')
+        hi = np.searchsorted(s0, t[idx[-1]] + w, side='right')
+        if lo == hi:
+            continue
+        pi, si = shapely.STRtree(geoms[lo:hi]).query(points[idx])
+        e, p = idx[pi], lo + si
+        keep = (s0[p] <= t[e] + w) & (s1[p] >= t[e] - w)
+        ev.append(e[keep])
+        sc.append(p[keep])
+    ev = np.concatenate(ev) if ev else np.zeros(0, dtype=np.int64)
+    sc = np.concatenate(sc) if sc else np.zeros(0, dtype=np.int64)
+    order = np.lexsort((sc, ev))  # Event order, then pass start order
+    ev, sc = ev[order], sc[order]
+
+    # 3. Footprint must contain the event position
+    inside = shapely.contains_xy(geoms[sc], lon[ev], lat[ev])
+    ev, sc = ev[inside], sc[inside]
+
+    out = events.iloc[ev].reset_index(drop=True)
+    mid = (s0[sc] + s1[sc]) // 2
+    out['SCENE_ID'] = scenes['scene_id'].to_numpy()[sc]
+    out['SAR_TIME'] = scenes['datetime'].to_numpy()[sc]
+    out['SAR_OFFSET_MIN'] = np.round((mid - t[ev]) / 60.0, 1)
+    out['SAR_START'] = scenes['start_time'].to_numpy()[sc] - CHIP_TIME_PAD
+    out['SAR_END'] = scenes['end_time'].to_numpy()[sc] + CHIP_TIME_PAD
+    return out
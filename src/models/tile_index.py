@@ -0,0 +1,113 @@
+"""
+Spatial tile index over AIS pings.
+Pings are bucketed into TILE_DEG x TILE_DEG lat/lon tiles and each tile gets a
+Morton (Z-order) key, so neighbouring tiles sort next to each other on disk.
+At import every chunk is sorted by tile key and the index records, per tile,
+the row ranges holding its pings. A zone or corridor query then decodes only
+those ranges instead of the whole day.
+"""
+import numpy as np
+import shapely
+
+TILE_DEG = 0.05  # ~5.5km in latitude; a cable landing box is a handful of tiles
+
+
+def _spread_bits(v):
+    # Interleave zeros between the low 16 bits of v (the classic Morton "part1by1")
+    v = v.astype(np.uint64) & np.uint64(0x0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x33333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x55555555)
+    return v
+
+
+def tile_xy(lon, lat, tile_deg=TILE_DEG):
+    """Integer tile column/row for each position (clipped to the valid globe)."""
+    lon = np.clip(np.asarray(lon, dtype=float), -180.0, 180.0)
+    lat = np.clip(np.asarray(lat, dtype=float), -90.0, 90.0)
+    ix = np.floor((lon + 180.0) / tile_deg).astype(np.int64)
+    iy = np.floor((lat + 90.0) / tile_deg).astype(np.int64)
+    return ix, iy
+
+
+def morton_key(ix, iy):
+    return (_spread_bits(np.asarray(ix)) | (_spread_bits(np.asarray(iy)) << np.uint64(1))).astype(np.int64)
+
+
+def tile_keys(lon, lat, tile_deg=TILE_DEG):
+    """Vectorized lon/lat -> Morton tile key."""
+    return morton_key(*tile_xy(lon, lat, tile_deg))
+
+
+def tiles_for_bbox(bbox, tile_deg=TILE_DEG):
+    """All tile keys touching bbox = [lon_min, lat_min, lon_max, lat_max]."""
+    x0, y0 = tile_xy(bbox[0], bbox[1], tile_deg)
+    x1, y1 = tile_xy(bbox[2], bbox[3], tile_deg)
+    ix, iy = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+    return np.unique(morton_key(ix.ravel(), iy.ravel()))
+
+
+def tiles_for_geometry(geom, tile_deg=TILE_DEG):
+    """
+    Tile keys whose cell intersects a WGS84 geometry, e.g. a buffered pipeline
+    corridor. Only cells inside the geometry's bounds are tested.
+    """
+    x0, y0 = tile_xy(*geom.bounds[:2], tile_deg)
+    x1, y1 = tile_xy(*geom.bounds[2:], tile_deg)
+    ix, iy = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+    ix, iy = ix.ravel(), iy.ravel()
+
+    cells = shapely.box(ix * tile_deg - 180.0, iy * tile_deg - 90.0,
+                        (ix + 1) * tile_deg - 180.0, (iy + 1) * tile_deg - 90.0)
+    hit = shapely.intersects(cells, geom)
+    return np.unique(morton_key(ix[hit], iy[hit]))
+
+
+def run_lengths(sorted_keys, offset=0):
+    """Collapses a tile-sorted key array into (tile, start, stop) row ranges."""
+    if len(sorted_keys) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    tiles, first = np.unique(sorted_keys, return_index=True)
+    stops = np.append(first[1:], len(sorted_keys))
+    return tiles, first + offset, stops + offset
+
+
+def merge_ranges(starts, stops):
+    """Sorts and merges touching/overlapping [start, stop) row ranges."""
+    if len(starts) == 0:
+        return starts, stops
+    order = np.argsort(starts, kind='stable')
+    starts, stops = starts[order], stops[order]
+    running_stop = np.maximum.accumulate(stops)
+    new_run = np.ones(len(starts), dtype=bool)
+    new_run[1:] = starts[1:] > running_stop[:-1]
+    run_id = np.cumsum(new_run) - 1
+    merged_stops = np.zeros(run_id[-1] + 1, dtype=stops.dtype)
+    np.maximum.at(merged_stops, run_id, stops)
+    return starts[new_run], merged_stops
+
+
+class TileIndex:
+    """tile -> row ranges for one partition (persisted as a small .npz next to the Parquet file)."""
+
+    def __init__(self, tiles, starts, stops, tile_deg=TILE_DEG):
+        self.tiles = np.asarray(tiles, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype=np.int64)
+        self.tile_deg = tile_deg
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            return cls(z['tile'], z['start'], z['stop'], float(z['tile_deg']))
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, tile=self.tiles, start=self.starts, stop=self.stops, tile_deg=self.tile_deg)
+
+    def ranges(self, keys):
+        """Merged [start, stop) row ranges covering the requested tile keys."""
+        hit = np.isin(self.tiles, keys)
+        return merge_ranges(self.starts[hit], self.stops[hit])
@@ -0,0 +1,142 @@
+"""
+Per-MMSI time-sorted index over slim ping columns.
+All pings are held as flat NumPy arrays sorted by (MMSI, time), with one
+offset per vessel, so a vessel's timeline is a slice and "consecutive fixes"
+is a single vectorized comparison. Shared by the dark-gap detector and the
+position interpolator.
+"""
+import os
+import numpy as np
+import pandas as pd
+from .tracks import epoch_seconds, sort_order
+
+TIMELINE_COLUMNS = ['MMSI', 'BaseDateTime', 'LAT', 'LON', 'SOG', 'COG']
+CARRY_MAX_AGE_S = 7 * 86400  # Vessels silent for longer are dropped from the carried state
+
+_CARRY_DTYPES = {'MMSI': np.int64, 't': np.int64, 'LAT': float, 'LON': float, 'SOG': float, 'COG': float}
+
+
+class VesselTimeline:
+    def __init__(self, mmsi, t, lat, lon, sog=None, cog=None):
+        """t: int64 epoch seconds. Inputs need not be sorted."""
+        mmsi = np.asarray(mmsi, dtype=np.int64)
+        t = np.asarray(t, dtype=np.int64)
+        order = sort_order(mmsi, t)
+
+        self.mmsi = mmsi[order]
+        self.t = t[order]
+        self.lat = np.asarray(lat, dtype=float)[order]
+        self.lon = np.asarray(lon, dtype=float)[order]
+        n = len(order)
+        self.sog = np.asarray(sog, dtype=float)[order] if sog is not None else np.full(n, np.nan)
+        self.cog = np.asarray(cog, dtype=float)[order] if cog is not None else np.full(n, np.nan)
+
+        # vessels[i] owns rows offsets[i]:offsets[i + 1]
+        self.vessels, first = np.unique(self.mmsi, return_index=True)
+        self.offsets = np.append(first, n)
+        self._keys = None  # Built by bracket() on first use
+
+    @classmethod
+    def from_frame(cls, df):
+        """From an AIS DataFrame (MMSI, BaseDateTime, LAT, LON and optionally SOG/COG)."""
+        return cls(df['MMSI'].to_numpy(), epoch_seconds(df['BaseDateTime']),
+                   df['LAT'].to_numpy(), df['LON'].to_numpy(),
+                   df['SOG'].to_numpy(dtype=float) if 'SOG' in df else None,
+                   df['COG'].to_numpy(dtype=float) if 'COG' in df else None)
+
+    @classmethod
+    def from_batches(cls, batches):
+        """Builds one timeline from an iterator of AIS batches, keeping only the slim columns."""
+        parts = [b[[c for c in TIMELINE_COLUMNS if c in b]] for b in batches if len(b)]
+        if not parts:
+            return cls([], [], [], [])
+        return cls.from_frame(pd.concat(parts, ignore_index=True))
+
+    def __len__(self):
+        return len(self.t)
+
+    def track(self, mmsi):
+        """Row slice holding one vessel's fixes (empty slice if unknown)."""
+        i = np.searchsorted(self.vessels, mmsi)
+        if i >= len(self.vessels) or self.vessels[i] != mmsi:
+            return slice(0, 0)
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def vessel_index(self):
+        """Position of each row's MMSI within self.vessels."""
+        return np.repeat(np.arange(len(self.vessels)), np.diff(self.offsets))
+
+    def bracket(self, mmsi, t):
+        """
+        Batch lookup of the fixes around (mmsi, t) query pairs. Returns
+        (before, after) row indices: the vessel's last fix at or before t and its
+        first fix after t, -1 where there is none (or the MMSI is unknown).
+        """
+        mmsi = np.asarray(mmsi, dtype=np.int64)
+        t = np.asarray(t, dtype=np.int64)
+        vi = np.minimum(np.searchsorted(self.vessels, mmsi), max(len(self.vessels) - 1, 0))
+        known = (self.vessels[vi] == mmsi) if len(self.vessels) else np.zeros(len(mmsi), dtype=bool)
+
+        # One sorted (vessel, time) key: every query is a single searchsorted
+        if self._keys is None:
+            self._t0 = int(self.t.min()) if len(self) else 0
+            self._span = (int(self.t.max()) - self._t0 + 3) if len(self) else 3
+            self._keys = self.vessel_index() * self._span + (self.t - self._t0 + 1)
+        rel = np.clip(t - self._t0 + 1, 0, self._span - 1)
+        j = np.searchsorted(self._keys, vi * self._span + rel, side='right')
+
+        lo, hi = self.offsets[vi], self.offsets[np.minimum(vi + 1, len(self.offsets) - 1)]
+        before = np.where(known & (j > lo), j - 1, -1)
+        after = np.where(known & (j < hi), j, -1)
+        return before, after
+
+    def consecutive(self):
+        """Row indices i such that rows i and i + 1 are consecutive fixes of the same vessel."""
+        return np.flatnonzero(self.mmsi[1:] == self.mmsi[:-1])
+
+    def last_fixes(self):
+        """One row per vessel: its most recent fix (the state carried into the next day)."""
+        last = self.offsets[1:] - 1
+        return pd.DataFrame({'MMSI': self.mmsi[last], 't': self.t[last], 'LAT': self.lat[last],
+                             'LON': self.lon[last], 'SOG': self.sog[last], 'COG': self.cog[last]})
+
+    def extended(self, fixes):
+        """A new timeline with extra fixes (a last_fixes() frame) merged in."""
+        if fixes is None or not len(fixes):
+            return self
+        return VesselTimeline(
+            np.concatenate([fixes['MMSI'].to_numpy(), self.mmsi]),
+            np.concatenate([fixes['t'].to_numpy(), self.t]),
+            np.concatenate([fixes['LAT'].to_numpy(), self.lat]),
+            np.concatenate([fixes['LON'].to_numpy(), self.lon]),
+            np.concatenate([fixes['SOG'].to_numpy(), self.sog]),
+            np.concatenate([fixes['COG'].to_numpy(), self.cog]),
+        )
+
+    def carry(self, max_age_s=CARRY_MAX_AGE_S):
+        """Last fix of every vessel heard within max_age_s of the end of the timeline."""
+        if not len(self):
+            return None
+        last = self.last_fixes()
+        return last[last['t'] >= self.t.max() - max_age_s].reset_index(drop=True)
+
+
+def save_carry(path, days, carry, **extra):
+    """
+    Persists a day-by-day detector's state: days done and the carried last
+    fixes, plus any extra named arrays of the detector's own.
+    """
+    carry = carry if carry is not None else pd.DataFrame(columns=_CARRY_DTYPES)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, days=np.array(sorted(days), dtype=str),
+                 **{k: carry[k].to_numpy(dtype=d) for k, d in _CARRY_DTYPES.items()}, **extra)
+    os.replace(tmp, path)
+
+
+def load_carry(path):
+    """(days, carry) saved by save_carry, or (empty set, None) when there is no state yet."""
+    if not os.path.exists(path):
+        return set(), None
+    with np.load(path) as z:
+        return set(z['days'].tolist()), pd.DataFrame({k: z[k] for k in _CARRY_DTYPES})
@@ -0,0 +1,106 @@
+"""
+Per-vessel track segmentation and loitering episodes.
+Pings are sorted by (MMSI, time) once with NumPy, split into tracks at
+transmission gaps, and every per-track / per-episode statistic is computed
+with reduceat over the sorted arrays - no per-row dicts. One loitering ship
+becomes one event row instead of thousands of flagged pings.
+"""
+import numpy as np
+import pandas as pd
+
+TRACK_GAP_S = 30 * 60   # A silence longer than this starts a new track
+MIN_DWELL_S = 10 * 60   # Shorter episodes are treated as transits
+COG_NOT_AVAILABLE = 360.0
+
+
+def epoch_seconds(times):
+    """datetime-like array -> int64 seconds since epoch."""
+    return pd.to_datetime(times).to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+
+def sort_order(mmsi, t):
+    """Stable order that groups pings by MMSI, then time."""
+    return np.lexsort((np.asarray(t), np.asarray(mmsi)))
+
+
+def segment_tracks(mmsi, t, max_gap_s=TRACK_GAP_S):
+    """
+    Track id per ping for arrays already sorted by (MMSI, time).
+    A new track starts at every MMSI change and every gap > max_gap_s.
+    """
+    mmsi = np.asarray(mmsi)
+    t = np.asarray(t)
+    new = np.ones(len(mmsi), dtype=bool)
+    new[1:] = (mmsi[1:] != mmsi[:-1]) | (np.diff(t) > max_gap_s)
+    return np.cumsum(new) - 1
+
+
+def run_starts(*keys):
+    """Indices where any of the (sorted) key arrays changes value; always includes 0."""
+    n = len(keys[0])
+    change = np.zeros(n, dtype=bool)
+    if n:
+        change[0] = True
+        for k in keys:
+            k = np.asarray(k)
+            change[1:] |= k[1:] != k[:-1]
+    return np.flatnonzero(change)
+
+
+def circular_variance(cog_deg, starts):
+    """1 - mean resultant length per group (0 = steady course, 1 = spinning); NaN COGs ignored."""
+    valid = np.isfinite(cog_deg) & (cog_deg < COG_NOT_AVAILABLE)
+    rad = np.deg2rad(np.where(valid, cog_deg, 0.0))
+    n = np.add.reduceat(valid.astype(float), starts)
+    c = np.add.reduceat(np.where(valid, np.cos(rad), 0.0), starts)
+    s = np.add.reduceat(np.where(valid, np.sin(rad), 0.0), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, 1.0 - np.hypot(c, s) / n, np.nan)
+
+
+def loiter_events(pings, in_zone, max_gap_s=TRACK_GAP_S, min_dwell_s=MIN_DWELL_S):
+    """
+    One event per loiter episode.
+    pings: DataFrame with MMSI, BaseDateTime, LAT, LON, SOG, COG (optional VesselName, DIST_METERS).
+    in_zone: boolean per ping, e.g. (SOG <= speed_limit) & (distance <= buffer).
+    An episode is a maximal run of consecutive in_zone pings on one track
+    lasting at least min_dwell_s.
+    """
+    in_zone = np.asarray(in_zone, dtype=bool)
+    if len(pings) == 0 or not in_zone.any():
+        return pd.DataFrame()
+
+    t = epoch_seconds(pings['BaseDateTime'])
+    mmsi = pings['MMSI'].to_numpy()
+    order = sort_order(mmsi, t)
+    mmsi, t, in_zone = mmsi[order], t[order], in_zone[order]
+
+    track = segment_tracks(mmsi, t, max_gap_s)
+    starts = run_starts(track, in_zone)
+    keep = in_zone[starts]
+    ends = np.append(starts[1:], len(t)) - 1
+
+    def col(name):
+        return pings[name].to_numpy(dtype=float)[order]
+
+    n = np.diff(np.append(starts, len(t)))
+    dwell = t[ends] - t[starts]
+    events = pd.DataFrame({
+        'MMSI': mmsi[starts],
+        'TRACK_ID': track[starts],
+        'START': pd.to_datetime(t[starts], unit='s'),
+        'END': pd.to_datetime(t[ends], unit='s'),
+        'DWELL_MIN': dwell / 60.0,
+        'N_PINGS': n,
+        'MEAN_SOG': np.add.reduceat(col('SOG'), starts) / n,
+        'COG_VARIANCE': circular_variance(col('COG'), starts),
+        'LAT': np.add.reduceat(col('LAT'), starts) / n,
+        'LON': np.add.reduceat(col('LON'), starts) / n,
+    })
+    if 'DIST_METERS' in pings:
+        events['MIN_DIST_METERS'] = np.fmin.reduceat(col('DIST_METERS'), starts)
+    if 'VesselName' in pings:
+        events.insert(1, 'VESSEL_NAME', pings['VesselName'].to_numpy()[order][starts])
+
+    events = events[keep & (dwell >= min_dwell_s)].reset_index(drop=True)
+    return events.round({'DWELL_MIN': 1, 'MEAN_SOG': 2, 'COG_VARIANCE': 3, 'LAT': 5, 'LON': 5, 'MIN_DIST_METERS': 2})
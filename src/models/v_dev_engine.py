@@ -8,6 +8,16 @@ def calculate_v_dev(observed_sog, baseline_mu, baseline_sigma):
         return 0
     return abs(observed_sog - baseline_mu) / baseline_sigma
 
+def calculate_v_dev_batch(observed_sog, baseline_mu, baseline_sigma):
+    """
+    Vectorized Stage 2 over arrays of pings (0 where the baseline sigma is not positive).
+    """
+    observed_sog = np.asarray(observed_sog, dtype=float)
+    baseline_mu = np.asarray(baseline_mu, dtype=float)
+    baseline_sigma = np.asarray(baseline_sigma, dtype=float)
+    safe_sigma = np.where(baseline_sigma > 0, baseline_sigma, 1.0)
+    return np.where(baseline_sigma > 0, np.abs(observed_sog - baseline_mu) / safe_sigma, 0.0)
+
 # --- THIS IS THE PART THAT TRIGGER THE OUTPUT ---
 if __name__ == "__main__":
     # Test Data
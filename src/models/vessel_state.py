@@ -0,0 +1,245 @@
+"""
+Bounded per-vessel state for long-running monitoring.
+One fixed-width NumPy record per MMSI (last fix, ship type, zone/alert
+flags, hot-zone entry time) plus a ring buffer of its most recent fixes, in
+preallocated structured arrays that grow by doubling up to max_vessels. The
+only per-vessel Python objects are the MMSI -> slot dict entry. Updates are
+vectorized over a whole batch of messages (several fixes of one vessel in a
+batch are applied in time order). When the table is full the least recently
+heard vessels are evicted in bulk; evict_idle() drops vessels silent for
+longer than idle_s of feed time.
+"""
+import sys
+import numpy as np
+
+MAX_VESSELS = 500_000      # Hard cap on tracked MMSIs
+HISTORY = 8                # Recent fixes kept per vessel
+IDLE_S = 6 * 3600          # Feed-time silence after which a vessel is forgotten
+INITIAL_CAPACITY = 4096
+EVICT_FRACTION = 0.05      # Share of the table freed at once when it is full
+NO_TIME = np.iinfo(np.int64).min
+
+# Flag bits
+IN_ZONE = 1
+ALERTING = 2
+
+STATE_DTYPE = np.dtype([
+    ('mmsi', np.uint32),
+    ('t', np.int64),            # Epoch seconds of the last accepted fix
+    ('lat', np.float64),
+    ('lon', np.float64),
+    ('sog', np.float32),
+    ('cog', np.float32),
+    ('vessel_type', np.int16),  # -1 = unknown
+    ('flags', np.uint8),
+    ('n_fixes', np.uint32),
+    ('zone_since', np.int64),   # Hot-zone entry time, -1 when outside
+    ('seen', np.int64),         # Update tick of the last message (LRU order)
+])
+
+FIX_DTYPE = np.dtype([('t', np.int64), ('lat', np.float32), ('lon', np.float32), ('sog', np.float32)])
+
+
+class VesselStateTable:
+    def __init__(self, max_vessels=MAX_VESSELS, history=HISTORY, idle_s=IDLE_S, initial=INITIAL_CAPACITY):
+        self.max_vessels = max_vessels
+        self.history = history
+        self.idle_s = idle_s
+        self.index = {}  # MMSI -> slot
+        self.records = np.zeros(0, dtype=STATE_DTYPE)
+        self.fixes = np.zeros((0, history), dtype=FIX_DTYPE)
+        self._free = np.zeros(0, dtype=np.int64)
+        self.tick = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+        self._grow(min(initial, max_vessels))
+
+    def __len__(self):
+        return len(self.index)
+
+    def _grow(self, capacity):
+        old = len(self.records)
+        records = np.zeros(capacity, dtype=STATE_DTYPE)
+        fixes = np.zeros((capacity, self.history), dtype=FIX_DTYPE)
+        records[:old] = self.records
+        fixes[:old] = self.fixes
+        self.records, self.fixes = records, fixes
+        # Free slots are popped from the end: lowest first
+        self._free = np.concatenate([np.arange(capacity - 1, old - 1, -1), self._free])
+
+    def _release(self, slots):
+        # A zero MMSI marks a free slot
+        for m in self.records['mmsi'][slots].tolist():
+            del self.index[m]
+        self.records[slots] = 0
+        self._free = np.concatenate([self._free, slots])
+
+    def _allocate(self, mmsi):
+        need = len(mmsi)
+        while len(self._free) < need and len(self.records) < self.max_vessels:
+            self._grow(min(len(self.records) * 2, self.max_vessels))
+        if len(self._free) < need:
+            # Full: free the least recently heard vessels in one go (not one per message)
+            candidates = np.flatnonzero((self.records['mmsi'] > 0) & (self.records['seen'] < self.tick))
+            k = min(len(candidates), max(need - len(self._free), int(EVICT_FRACTION * self.max_vessels)))
+            victims = candidates[np.argpartition(self.records['seen'][candidates], k - 1)[:k]] if k else candidates[:0]
+            self._release(victims)
+            self.evicted_lru += len(victims)
+            if len(self._free) < need:
+                raise MemoryError(f"{need} new vessels in one batch exceed max_vessels={self.max_vessels}")
+
+        slots = self._free[-need:][::-1]
+        self._free = self._free[:-need]
+        rec = self.records
+        rec[slots] = 0
+        rec['mmsi'][slots] = mmsi
+        rec['t'][slots] = NO_TIME
+        rec['lat'][slots] = rec['lon'][slots] = np.nan
+        rec['sog'][slots] = rec['cog'][slots] = np.nan
+        rec['vessel_type'][slots] = -1
+        rec['zone_since'][slots] = -1
+        rec['seen'][slots] = self.tick
+        self.index.update(zip(mmsi.tolist(), slots.tolist()))
+        return slots
+
+    def slots(self, mmsi, create=True):
+        """Slot per MMSI (-1 if untracked and create is False); new vessels get a slot."""
+        mmsi = np.asarray(mmsi, dtype=np.int64)
+        uniq, inverse = np.unique(mmsi, return_inverse=True)
+        get = self.index.get
+        found = np.fromiter((get(m, -1) for m in uniq.tolist()), dtype=np.int64, count=len(uniq))
+        missing = found < 0
+        if create:
+            self.tick += 1
+            # Vessels in this batch are the most recently heard: never eviction victims
+            self.records['seen'][found[~missing]] = self.tick
+            if missing.any():
+                found[missing] = self._allocate(uniq[missing])
+        return found[inverse]
+
+    def vessel_types(self, mmsi):
+        """Last known ship type per MMSI (-1 when unknown or untracked)."""
+        slots = self.slots(mmsi, create=False)
+        return np.where(slots >= 0, self.records['vessel_type'][np.maximum(slots, 0)], -1)
+
+    def set_types(self, mmsi, vessel_type):
+        """Ship types from static reports (type 5 / 24B), remembered for later position reports."""
+        self.records['vessel_type'][self.slots(mmsi)] = vessel_type
+
+    def update(self, mmsi, t, lat, lon, sog, cog, vessel_type, in_zone, risk):
+        """
+        Applies a batch of position reports, each vessel's in time order.
+        vessel_type: -1 where the message does not carry one.
+        Returns (opened, zone_since): opened marks fixes that start a new alert
+        episode for their vessel (risk now, not at the previous fix), and
+        zone_since is the hot-zone entry time for each fix (-1 outside).
+        Fixes older than the vessel's stored last fix are ignored.
+        """
+        n = len(mmsi)
+        t = np.asarray(t, dtype=np.int64)
+        in_zone = np.asarray(in_zone, dtype=bool)
+        risk = np.asarray(risk, dtype=bool)
+        opened = np.zeros(n, dtype=bool)
+        zone_since = np.full(n, -1, dtype=np.int64)
+
+        slots = self.slots(mmsi)
+        rec = self.records
+        keep = np.flatnonzero(t >= rec['t'][slots])
+        if len(keep) == 0:
+            return opened, zone_since
+
+        # 1. Group the kept fixes by vessel, in time order (message order on ties)
+        order = keep[np.lexsort((t[keep], slots[keep]))]
+        s = slots[order]
+        m = len(order)
+        first = np.r_[True, s[1:] != s[:-1]]
+        last = np.r_[s[1:] != s[:-1], True]
+        pos = np.arange(m)
+        group_start = np.maximum.accumulate(np.where(first, pos, 0))
+        rank = pos - group_start
+
+        # 2. Previous fix's state: the stored flags for the first fix of a vessel
+        flags = rec['flags'][s]
+        risk_s, zone_s, t_s = risk[order], in_zone[order], t[order]
+        prev_risk = np.where(first, (flags & ALERTING) > 0, np.r_[False, risk_s[:-1]])
+        prev_zone = np.where(first, (flags & IN_ZONE) > 0, np.r_[False, zone_s[:-1]])
+        opened[order] = risk_s & ~prev_risk
+
+        # 3. Hot-zone entry time carried forward from the latest entry (or the stored one)
+        entering = zone_s & ~prev_zone
+        base = np.where(entering, t_s, np.where(first, rec['zone_since'][s], -1))
+        since = base[np.maximum.accumulate(np.where(entering | first, pos, 0))]
+        zone_since[order] = np.where(zone_s, since, -1)
+
+        # 4. Ring buffer: append each vessel's fixes (only the last `history` can survive)
+        group_size = np.diff(np.r_[np.flatnonzero(first), m])[np.cumsum(first) - 1]
+        ring = rank >= group_size - self.history
+        col = (rec['n_fixes'][s].astype(np.int64) + rank) % self.history
+        fix = self.fixes
+        fix['t'][s[ring], col[ring]] = t_s[ring]
+        fix['lat'][s[ring], col[ring]] = np.asarray(lat)[order][ring]
+        fix['lon'][s[ring], col[ring]] = np.asarray(lon)[order][ring]
+        fix['sog'][s[ring], col[ring]] = np.asarray(sog)[order][ring]
+
+        # 5. Last fix per vessel
+        j, sl = order[last], s[last]
+        # Latest ship type reported within the batch, else the stored one
+        vt_s = np.asarray(vessel_type)[order]
+        typed = np.maximum.accumulate(np.where(vt_s >= 0, pos, -1))[last]
+        has_type = typed >= group_start[last]
+        rec['t'][sl] = t[j]
+        rec['lat'][sl] = np.asarray(lat)[j]
+        rec['lon'][sl] = np.asarray(lon)[j]
+        rec['sog'][sl] = np.asarray(sog)[j]
+        rec['cog'][sl] = np.asarray(cog)[j]
+        rec['vessel_type'][sl] = np.where(has_type, vt_s[np.maximum(typed, 0)], rec['vessel_type'][sl])
+        rec['flags'][sl] = np.where(in_zone[j], IN_ZONE, 0) | np.where(risk[j], ALERTING, 0)
+        rec['zone_since'][sl] = zone_since[j]
+        rec['n_fixes'][sl] += group_size[last].astype(np.uint32)
+        return opened, zone_since
+
+    def get(self, mmsi):
+        """The vessel's record (a NumPy void), or None when untracked."""
+        slot = self.index.get(int(mmsi))
+        return None if slot is None else self.records[slot].copy()
+
+    def recent_fixes(self, mmsi):
+        """The vessel's last `history` fixes, oldest first (empty when untracked)."""
+        slot = self.index.get(int(mmsi))
+        if slot is None:
+            return np.zeros(0, dtype=FIX_DTYPE)
+        n = int(self.records['n_fixes'][slot])
+        k = min(n, self.history)
+        cols = (np.arange(n - k, n)) % self.history
+        return self.fixes[slot, cols].copy()
+
+    def evict_idle(self, now):
+        """Forgets vessels whose last fix is more than idle_s (feed time) before `now`."""
+        t = self.records['t']
+        # Vessels known only from a static report (no fix yet) are left to LRU eviction
+        idle = np.flatnonzero((self.records['mmsi'] > 0) & (t != NO_TIME) & (t < int(now) - self.idle_s))
+        if len(idle):
+            self._release(idle)
+            self.evicted_idle += len(idle)
+        return len(idle)
+
+    def memory_report(self):
+        """
+        Bytes held by the table: in total, per preallocated slot, and per
+        tracked vessel (None while no vessel is tracked).
+        """
+        n = len(self.index)
+        array_bytes = self.records.nbytes + self.fixes.nbytes + self._free.nbytes
+        # dict slot + boxed MMSI key + boxed slot value, per vessel
+        index_bytes = sys.getsizeof(self.index) + n * 2 * sys.getsizeof(1 << 40)
+        return {
+            'vessels': n,
+            'capacity': len(self.records),
+            'record_bytes': STATE_DTYPE.itemsize + FIX_DTYPE.itemsize * self.history,
+            'array_bytes': array_bytes,
+            'index_bytes': index_bytes,
+            'bytes_per_slot': array_bytes / max(len(self.records), 1),
+            'bytes_per_vessel': (array_bytes + index_bytes) / n if n else None,
+            'evicted_lru': self.evicted_lru,
+            'evicted_idle': self.evicted_idle,
+        }
@@ -0,0 +1,232 @@
+"""
+Declarative hot zones and alert rules, evaluated in one pass per AIS batch.
+Zones (boxes, polygons, or metric buffers around a landing point or cable
+route) and rules (SOG / V_dev thresholds, vessel types, time windows) are
+read from a JSON file and compiled once:
+
+    zones -> one STRtree over all zone polygons, plus the sorted tile keys
+             they cover (tile_index grid), so a batch is first cut to the
+             pings in any zone's tiles with a single searchsorted;
+    rules -> a boolean zone mask and a list of vectorized column predicates.
+
+A batch then costs one tree query for all zones and one array expression
+per rule, however many landing sites are monitored. Output rows are the
+matching pings tagged with ZONE and RULE (a ping in two zones, or matching
+two rules, appears once per pair). Example (config/zones.json):
+
+    {"zones": {"lynn_hibernia": {"bbox": [-71.0, 42.4, -70.8, 42.5]},
+               "svalbard_cable": {"line": [[15.0, 78.0], [16.0, 78.5]], "buffer_m": 5000}},
+     "rules": {"presence": {"zones": "*"},
+               "slow_tug": {"zones": ["lynn_hibernia"], "vessel_types": [31, 52], "sog_max": 5.0},
+               "night_loiter": {"zones": "*", "sog_max": 1.0, "hours": [22, 5]}}}
+
+Rules with v_dev_min need a fleet baseline (FleetBaselineStore); the scripts
+with a single hardcoded zone take its box or line from the same file
+(zone_bbox / load_zones).
+"""
+import json
+import numpy as np
+import pandas as pd
+import shapely
+from .distance import utm_epsg, project_geometry, to_lonlat
+from .tile_index import tiles_for_geometry, tile_keys, TILE_DEG
+from .v_dev_engine import calculate_v_dev_batch
+
+ZONES_PATH = 'config/zones.json'
+ALL_ZONES = '*'
+
+ZONE_KEYS = {'bbox', 'polygon', 'line', 'point', 'buffer_m'}
+RULE_KEYS = {'zones', 'sog_min', 'sog_max', 'v_dev_min', 'vessel_types', 'exclude_types',
+             'statuses', 'hours', 'months', 'start', 'end'}
+
+
+def zone_geometry(name, spec):
+    """WGS84 polygon for one zone spec; buffer_m is applied in the zone's own UTM zone."""
+    unknown = set(spec) - ZONE_KEYS
+    shapes = [k for k in ('bbox', 'polygon', 'line', 'point') if k in spec]
+    if unknown or len(shapes) != 1:
+        raise ValueError(f"Zone '{name}': needs exactly one of bbox/polygon/line/point "
+                         f"(unknown keys: {sorted(unknown)})")
+    kind = shapes[0]
+    if kind == 'bbox':
+        geom = shapely.box(*spec['bbox'])
+    elif kind == 'polygon':
+        geom = shapely.Polygon(spec['polygon'])
+    elif kind == 'line':
+        geom = shapely.LineString(spec['line'])
+    else:
+        geom = shapely.Point(spec['point'])
+
+    buffer_m = spec.get('buffer_m', 0)
+    if buffer_m:
+        c = geom.centroid
+        epsg = int(utm_epsg(c.x, c.y))
+        metric = project_geometry(geom, epsg).buffer(buffer_m)
+        geom = shapely.transform(metric, lambda xy: np.column_stack(to_lonlat(xy[:, 0], xy[:, 1], epsg)))
+    elif kind in ('line', 'point'):
+        raise ValueError(f"Zone '{name}': a {kind} needs buffer_m")
+    if not geom.is_valid or geom.is_empty:
+        raise ValueError(f"Zone '{name}': invalid geometry")
+    return geom
+
+
+def load_config(path=ZONES_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_zones(path=ZONES_PATH):
+    """{zone name: zone spec} from the zone config."""
+    return load_config(path).get('zones', {})
+
+
+def zone_bbox(name, path=ZONES_PATH):
+    """[lon_min, lat_min, lon_max, lat_max] around one configured zone (buffer included)."""
+    zones = load_zones(path)
+    if name not in zones:
+        raise ValueError(f"Zone '{name}' is not defined in {path}")
+    return [float(v) for v in zone_geometry(name, zones[name]).bounds]
+
+
+def _hour_window(start, end):
+    # [start, end) in UTC hours; wraps past midnight when start > end
+    if start <= end:
+        return lambda c, i: (c['hour'][i] >= start) & (c['hour'][i] < end)
+    return lambda c, i: (c['hour'][i] >= start) | (c['hour'][i] < end)
+
+
+def compile_rule(name, spec, zone_names):
+    """
+    (zone mask over zone_names, predicates, needs_v_dev). A predicate takes the
+    per-ping rule columns and the ping index of each pair still alive.
+    """
+    unknown = set(spec) - RULE_KEYS
+    if unknown:
+        raise ValueError(f"Rule '{name}': unknown keys {sorted(unknown)}")
+
+    zones = spec.get('zones', ALL_ZONES)
+    if zones == ALL_ZONES:
+        mask = np.ones(len(zone_names), dtype=bool)
+    else:
+        missing = set(zones) - set(zone_names)
+        if missing:
+            raise ValueError(f"Rule '{name}': unknown zones {sorted(missing)}")
+        mask = np.isin(zone_names, list(zones))
+
+    preds = []
+    if 'sog_min' in spec:
+        preds.append(lambda c, i, v=float(spec['sog_min']): c['sog'][i] >= v)
+    if 'sog_max' in spec:
+        preds.append(lambda c, i, v=float(spec['sog_max']): c['sog'][i] <= v)
+    if 'v_dev_min' in spec:
+        preds.append(lambda c, i, v=float(spec['v_dev_min']): c['v_dev'][i] > v)
+    if 'vessel_types' in spec:
+        preds.append(lambda c, i, v=np.array(spec['vessel_types']): np.isin(c['vessel_type'][i], v))
+    if 'exclude_types' in spec:
+        preds.append(lambda c, i, v=np.array(spec['exclude_types']): ~np.isin(c['vessel_type'][i], v))
+    if 'statuses' in spec:
+        preds.append(lambda c, i, v=np.array(spec['statuses']): np.isin(c['status'][i], v))
+    if 'hours' in spec:
+        preds.append(_hour_window(*spec['hours']))
+    if 'months' in spec:
+        preds.append(lambda c, i, v=np.array(spec['months']): np.isin(c['month'][i], v))
+    if 'start' in spec:
+        preds.append(lambda c, i, v=pd.Timestamp(spec['start']).to_datetime64(): c['time'][i] >= v)
+    if 'end' in spec:
+        preds.append(lambda c, i, v=pd.Timestamp(spec['end']).to_datetime64(): c['time'][i] < v)
+    return mask, preds, 'v_dev_min' in spec
+
+
+class ZoneRuleEngine:
+    def __init__(self, zones, rules, baseline=None, tile_deg=TILE_DEG):
+        """
+        zones: {name: zone spec}; rules: {name: rule spec} (see module docstring).
+        baseline: FleetBaselineStore, required by rules with v_dev_min.
+        """
+        if not zones or not rules:
+            raise ValueError("Zone config needs at least one zone and one rule")
+        self.zone_names = np.array(list(zones), dtype=object)
+        self.geoms = np.array([zone_geometry(n, s) for n, s in zones.items()], dtype=object)
+        shapely.prepare(self.geoms)
+        self.tree = shapely.STRtree(self.geoms)
+        self.tile_deg = tile_deg
+        self.tiles = np.unique(np.concatenate([tiles_for_geometry(g, tile_deg) for g in self.geoms]))
+
+        self.rule_names = np.array(list(rules), dtype=object)
+        compiled = [compile_rule(n, s, self.zone_names) for n, s in rules.items()]
+        self.rule_zones = np.array([c[0] for c in compiled])  # rules x zones
+        self.rule_preds = [c[1] for c in compiled]
+        self.needs_v_dev = any(c[2] for c in compiled)
+        self.baseline = baseline
+        if self.needs_v_dev and baseline is None:
+            print("[!] V_dev rules configured but no fleet baseline loaded; they will not match.")
+
+    @classmethod
+    def load(cls, path=ZONES_PATH, baseline=None):
+        config = load_config(path)
+        return cls(config.get('zones', {}), config.get('rules', {}), baseline=baseline)
+
+    def bbox(self):
+        """[lon_min, lat_min, lon_max, lat_max] around every zone."""
+        return [float(v) for v in shapely.total_bounds(self.geoms)]
+
+    def _columns(self, batch, rows):
+        # Rule inputs for the in-zone pings only (computed once, shared by all rules)
+        t = batch['BaseDateTime'].to_numpy()[rows]
+        cols = {
+            'sog': batch['SOG'].to_numpy(dtype=float, na_value=np.nan)[rows],
+            'vessel_type': batch['VesselType'].to_numpy(dtype=float, na_value=np.nan)[rows]
+            if 'VesselType' in batch else np.full(len(rows), np.nan),
+            'status': batch['Status'].to_numpy(dtype=float, na_value=np.nan)[rows]
+            if 'Status' in batch else np.full(len(rows), np.nan),
+            'time': t,
+            'hour': pd.DatetimeIndex(t).hour.to_numpy(),
+            'month': pd.DatetimeIndex(t).month.to_numpy(),
+        }
+        if self.needs_v_dev:
+            cols['v_dev'] = np.full(len(rows), np.nan)
+            if self.baseline is not None and len(rows):
+                # Unknown ship type falls back to the "not available" (0) peer group
+                vtype = np.nan_to_num(cols['vessel_type'], nan=0).astype(np.int64)
+                found = self.baseline.lookup_batch(vtype, batch['LAT'].to_numpy()[rows],
+                                                   batch['LON'].to_numpy()[rows], cols['month'])
+                cols['v_dev'] = calculate_v_dev_batch(cols['sog'], found['type_avg_speed'].to_numpy(),
+                                                      found['type_std_dev'].fillna(0).to_numpy())
+        return cols
+
+    def evaluate(self, batch, in_zone=False):
+        """
+        Every (ping, zone, rule) match in one AIS batch: the matching rows of
+        the batch (original index kept) with ZONE and RULE columns, plus V_DEV
+        when any rule uses it. With in_zone=True, returns (matches, pings):
+        pings are the batch rows inside any zone, once each, whatever the rules.
+        """
+        # 1. Tile prefilter: only pings in a tile touched by some zone
+        lon, lat = batch['LON'].to_numpy(dtype=float), batch['LAT'].to_numpy(dtype=float)
+        keys = tile_keys(lon, lat, self.tile_deg)
+        pos = np.minimum(np.searchsorted(self.tiles, keys), len(self.tiles) - 1)
+        cand = np.flatnonzero(self.tiles[pos] == keys)
+
+        # 2. Exact zone membership for all zones at once
+        pt, zone = self.tree.query(shapely.points(lon[cand], lat[cand]), predicate='intersects')
+        pt = cand[pt]
+        rows, inverse = np.unique(pt, return_inverse=True)
+        cols = self._columns(batch, rows)
+
+        # 3. Rules: zone mask, then each compiled predicate on the pairs still alive
+        match_pair, match_rule = [], []
+        for r, preds in enumerate(self.rule_preds):
+            alive = np.flatnonzero(self.rule_zones[r][zone])
+            for pred in preds:
+                if not len(alive):
+                    break
+                alive = alive[pred(cols, inverse[alive])]
+            match_pair.append(alive)
+            match_rule.append(np.full(len(alive), r))
+        pair = np.concatenate(match_pair)
+        rule = np.concatenate(match_rule)
+
+        out = batch.iloc[pt[pair]].assign(ZONE=self.zone_names[zone[pair]], RULE=self.rule_names[rule])
+        if self.needs_v_dev:
+            out['V_DEV'] = np.round(cols['v_dev'][inverse[pair]], 2)
+        return (out, batch.iloc[rows]) if in_zone else out
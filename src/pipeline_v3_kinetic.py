@@ -1,62 +1,78 @@
 import pandas as pd
-import geopandas as gpd
-import zipfile
-import csv
-import io
-import pyproj
-from shapely.geometry import Point
-from shapely.ops import transform
 import os
+from models.ais_reader import AISReader, DATE_FORMAT
+from models.infrastructure import get_registry
+from models.tracks import loiter_events
+from models.zone_rules import zone_bbox
+
+CORRIDOR_COLUMNS = ['MMSI', 'BaseDateTime', 'LAT', 'LON', 'SOG', 'COG', 'VesselName']
+KINETIC_ZONE = 'san_pedro_pipeline'  # San Pedro Bay box, defined in config/zones.json
 
 class MaritimeForensicPipeline:
     def __init__(self, pipe_zip, cable_zip):
         print("[*] Initializing Kinetic Infrastructure Engine...")
-        self.pipes = gpd.read_file(f"zip://{pipe_zip}").to_crs(epsg=26911)
-        self.cables = gpd.read_file(f"zip://{cable_zip}").to_crs(epsg=26911)
+        # Layers come pre-projected from the registry cache; trees are shared per process
+        registry = get_registry(pipe_zip, cable_zip)
+        self.pipes = registry.layer('pipe', 26911)
+        self.cables = registry.layer('cable', 26911)
+        self.pipe_index = registry.engine('pipe', crs=26911, id_column=None)
+        self.cable_index = registry.engine('cable', crs=26911, id_column=None)
         print(f"[+] Infrastructure Loaded. Ready for Kinetic Analysis.")
 
     def analyze_ais_stream(self, ais_zip, distance_threshold_m=3000, speed_limit=5.0):
         anomalies = []
+        corridor = []  # Every BBOX ping (slim columns), kept for the track stage
         # Expanded BBOX to catch the MSC DANIT's approach
-        BBOX = [-118.4, 33.4, -117.7, 33.9] 
+        BBOX = zone_bbox(KINETIC_ZONE)
         
-        project = pyproj.Transformer.from_crs("epsg:4326", "epsg:26911", always_xy=True).transform
-
         print(f"[*] Opening AIS Stream: {ais_zip}")
-        with zipfile.ZipFile(ais_zip, 'r') as z:
-            csv_name = [n for n in z.namelist() if n.endswith('.csv')][0]
-            with z.open(csv_name) as f:
-                reader = csv.DictReader(io.TextIOWrapper(f, encoding='utf-8'))
-                
-                for i, row in enumerate(reader):
-                    try:
-                        v_lat, v_lon = float(row['LAT']), float(row['LON'])
+        reader = AISReader(ais_zip)
+
+        # 1. BBOX Filter (vectorized, applied per chunk by the reader)
+        for batch in reader.batches(bbox=BBOX):
+            # 2. KINETIC SPEED FILTER (Capturing 0-5 knots)
+            slow = batch[batch['SOG'] <= speed_limit]
+
+            # 3. EXPANDED PROXIMITY FILTER (one nearest-segment query per batch)
+            min_dist_pipe, pipe_id = self.pipe_index.nearest(
+                slow['LON'], slow['LAT'], max_distance=distance_threshold_m)
+            near = min_dist_pipe <= distance_threshold_m
+            hits = slow[near]
+
+            dist_all = pd.Series(float('nan'), index=batch.index)
+            dist_all[slow.index] = min_dist_pipe
+            corridor.append(batch[CORRIDOR_COLUMNS].assign(DIST_METERS=dist_all.to_numpy()))
 
-                        # 1. BBOX Filter
-                        if (BBOX[1] <= v_lat <= BBOX[3]) and (BBOX[0] <= v_lon <= BBOX[2]):
-                            v_speed = float(row.get('SOG', 0))
-                            
-                            # 2. KINETIC SPEED FILTER (Capturing 0-5 knots)
-                            if v_speed <= speed_limit:
-                                v_point_meters = transform(project, Point(v_lon, v_lat))
-                                min_dist_pipe = self.pipes.distance(v_point_meters).min()
-                                
-                                # 3. EXPANDED PROXIMITY FILTER
-                                if min_dist_pipe <= distance_threshold_m:
-                                    anomalies.append({
-                                        'VESSEL_NAME': row.get('VesselName', row['MMSI']),
-                                        'MMSI': row['MMSI'],
-                                        'LAT': v_lat, 'LON': v_lon,
-                                        'TIMESTAMP': row['BaseDateTime'],
-                                        'SPEED': v_speed,
-                                        'DIST_METERS': round(min_dist_pipe, 2)
-                                    })
-                    except: continue
-                    
-                    if i % 1000000 == 0:
-                        print(f"    ...scanned {i//1000000}M records (Hits: {len(anomalies)})")
+            if len(hits):
+                cable_dist, _ = self.cable_index.nearest(hits['LON'], hits['LAT'])
+                names = hits['VesselName'].where(hits['VesselName'].fillna('') != '', hits['MMSI'].astype(str))
+                anomalies.extend(pd.DataFrame({
+                    'VESSEL_NAME': names.to_numpy(),
+                    'MMSI': hits['MMSI'].to_numpy(),
+                    'LAT': hits['LAT'].to_numpy(), 'LON': hits['LON'].to_numpy(),
+                    'TIMESTAMP': hits['BaseDateTime'].dt.strftime(DATE_FORMAT).to_numpy(),
+                    'SPEED': hits['SOG'].to_numpy(),
+                    'DIST_METERS': min_dist_pipe[near].round(2),
+                    'PIPE_ID': pipe_id[near],
+                    'CABLE_DIST_METERS': cable_dist.round(2),
+                }).to_dict('records'))
+
+            print(f"    ...scanned {reader.rows_scanned//1000000}M records (Hits: {len(anomalies)})")
+
+        self.corridor_pings = pd.concat(corridor, ignore_index=True) if corridor else pd.DataFrame()
         return anomalies
 
+    def loiter_events(self, distance_threshold_m=3000, speed_limit=5.0, **kwargs):
+        """
+        Collapses the last analyze_ais_stream run into one row per loiter episode
+        (slow AND inside the pipeline buffer), instead of one row per ping.
+        """
+        pings = self.corridor_pings
+        if pings.empty:
+            return pd.DataFrame()
+        in_zone = (pings['SOG'] <= speed_limit) & (pings['DIST_METERS'] <= distance_threshold_m)
+        return loiter_events(pings, in_zone.to_numpy(), **kwargs)
+
 # Update these lines at the bottom of src/pipeline_v3_kinetic.py
 if __name__ == "__main__":
     engine = MaritimeForensicPipeline(
@@ -68,13 +84,13 @@ if __name__ == "__main__":
     results = engine.analyze_ais_stream("data/raw_ais/AIS_2021_01_25.zip")
     
     if results:
-        df = pd.DataFrame(results)
+        df = pd.DataFrame(results).sort_values('TIMESTAMP', kind='stable', ignore_index=True)
         df.to_csv("data/kinetic_sync_list.csv", index=False)
         print(f"\n[!] SUCCESS: Found {len(df)} kinetic proximity events.")
         
         # SEARCH FOR THE TARGET
         # MSC DANIT MMSI is 371716000
-        target = df[(df['VESSEL_NAME'].str.contains("DANIT", na=False)) | (df['MMSI'] == "371716000")]
+        target = df[(df['VESSEL_NAME'].str.contains("DANIT", na=False)) | (df['MMSI'] == 371716000)]
         
         if not target.empty:
             print(f"\n[!!!] TARGET IDENTIFIED: MSC DANIT")
@@ -82,4 +98,10 @@ if __name__ == "__main__":
         else:
             print("\n[?] MSC DANIT not found. Check if the speed or distance needs further adjustment.")
     else:
-        print("[-] No events found with current parameters.")
\ No newline at end of file
+        print("[-] No events found with current parameters.")
+
+    # One event per loiter episode for KML/reporting/SAR tasking
+    episodes = engine.loiter_events()
+    if not episodes.empty:
+        episodes.to_csv("data/kinetic_loiter_events.csv", index=False)
+        print(f"\n[+] Collapsed into {len(episodes)} loiter episodes -> data/kinetic_loiter_events.csv")
\ No newline at end of file
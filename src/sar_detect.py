@@ -0,0 +1,91 @@
+"""
+Runs the CFAR ship detector over every fetched SAR evidence chip and matches
+the detections against AIS at the pass time. Detections with no AIS vessel
+nearby are reported as dark-ship candidates.
+
+Input is the output of `python src/sar_event_join.py --fetch` (one row per
+event/pass with CHIP_PATH). AIS for each pass day is read once for the union
+of that day's chips.
+
+Usage: python src/sar_detect.py [--passes data/event_sar_passes.csv] [--k 5.0]
+"""
+import os
+import time
+import argparse
+import pandas as pd
+from models.ais_reader import AISReader
+from models.cfar import load_chip, detect_targets, match_ais, K_SIGMA, MATCH_DIST_M
+from models.sar_evidence import CHIP_OFFSET_DEG
+from models.timeline import VesselTimeline
+from models.interpolate import vessels_at
+
+PASSES_PATH = 'data/event_sar_passes.csv'
+OUTPUT_PATH = 'data/sar_detections.csv'
+RAW_DIR = 'data/raw_ais'
+AIS_WINDOW = pd.Timedelta(minutes=10)  # Vessels are dead-reckoned at most this far from their nearest fix
+
+
+def ais_at_pass(timeline, when, bbox):
+    """Each vessel's position at the exact pass time (interpolated or dead-reckoned), inside bbox."""
+    at = vessels_at(timeline, when, max_extrapolate_s=AIS_WINDOW.total_seconds())
+    return at[(at['LON'] >= bbox[0]) & (at['LON'] <= bbox[2]) & (at['LAT'] >= bbox[1]) & (at['LAT'] <= bbox[3])]
+
+
+def run_detection(passes_path=PASSES_PATH, output_path=OUTPUT_PATH, k=K_SIGMA, max_dist_m=MATCH_DIST_M,
+                  raw_dir=RAW_DIR):
+    passes = pd.read_csv(passes_path)
+    passes = passes[passes['CHIP_PATH'].notna()] if 'CHIP_PATH' in passes else passes.iloc[:0]
+    chips = passes.drop_duplicates('CHIP_PATH').copy()
+    if chips.empty:
+        print("[!] No fetched chips; run sar_event_join.py --fetch first.")
+        return pd.DataFrame()
+    chips['WHEN'] = pd.to_datetime(chips['SAR_TIME'], utc=True).dt.tz_localize(None)
+    chips['DAY'] = chips['WHEN'].dt.normalize()
+    print(f"[*] {len(chips)} chips over {chips['DAY'].nunique()} pass day(s)")
+
+    results = []
+    t_detect = 0.0
+    for day, group in chips.groupby('DAY'):
+        # 1. AIS for every chip of this day in one read
+        zip_path = os.path.join(raw_dir, day.strftime('AIS_%Y_%m_%d.zip'))
+        day_bbox = [group['LON'].min() - CHIP_OFFSET_DEG, group['LAT'].min() - CHIP_OFFSET_DEG,
+                    group['LON'].max() + CHIP_OFFSET_DEG, group['LAT'].max() + CHIP_OFFSET_DEG]
+        if os.path.exists(zip_path):
+            pings = AISReader(zip_path).scan(bbox=day_bbox, start=group['WHEN'].min() - AIS_WINDOW,
+                                             end=group['WHEN'].max() + AIS_WINDOW)
+        else:
+            print(f"[!] Missing daily file: {zip_path} (detections will be unmatched)")
+            pings = pd.DataFrame(columns=['MMSI', 'BaseDateTime', 'LAT', 'LON'])
+        timeline = VesselTimeline.from_frame(pings)
+
+        # 2. CFAR per chip, then match against the vessels present at the pass
+        for chip in group.itertuples(index=False):
+            bbox = [chip.LON - CHIP_OFFSET_DEG, chip.LAT - CHIP_OFFSET_DEG,
+                    chip.LON + CHIP_OFFSET_DEG, chip.LAT + CHIP_OFFSET_DEG]
+            t0 = time.perf_counter()
+            det = detect_targets(load_chip(chip.CHIP_PATH), bbox, k=k)
+            t_detect += time.perf_counter() - t0
+
+            det = match_ais(det, ais_at_pass(timeline, chip.WHEN, bbox), max_dist_m)
+            det.insert(0, 'SCENE_ID', chip.SCENE_ID)
+            det.insert(1, 'SAR_TIME', chip.SAR_TIME)
+            det.insert(2, 'CHIP_PATH', chip.CHIP_PATH)
+            results.append(det)
+
+    out = pd.concat(results, ignore_index=True)
+    out.to_csv(output_path, index=False)
+    print(f"[+] {len(out)} targets in {len(chips)} chips ({t_detect / len(chips) * 1000:.0f} ms/chip), "
+          f"{int(out['DARK'].sum())} without AIS")
+    print(f"[+] Saved to {output_path}")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CFAR ship detection on fetched SAR chips, matched to AIS.")
+    parser.add_argument('--passes', default=PASSES_PATH, help="Event/pass table with CHIP_PATH")
+    parser.add_argument('--out', default=OUTPUT_PATH)
+    parser.add_argument('--k', type=float, default=K_SIGMA, help="CFAR threshold in clutter sigmas")
+    parser.add_argument('--match-m', type=float, default=MATCH_DIST_M, help="AIS match radius (metres)")
+    args = parser.parse_args()
+
+    run_detection(args.passes, args.out, args.k, args.match_m)
@@ -0,0 +1,81 @@
+"""
+Attaches Sentinel-1 passes to every flagged AIS event.
+Reads one or more event tables (kinetic_sync_list, anomalies_flagged, loiter
+or dark-gap events), optionally refreshes the local SAR catalogue over their
+extent, joins each event to every pass covering it within +/- window, and can
+hand the result straight to the batch evidence fetcher.
+
+Usage: python src/sar_event_join.py [EVENTS.csv ...] [--window-hours 6] [--refresh] [--fetch]
+"""
+import os
+import time
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+from models.sar_catalog import SARCatalog, STAC_URL, CATALOG_PATH
+from models.sar_join import join_events_to_passes, event_times, PASS_WINDOW
+from models.sar_evidence import SAREvidenceFetcher
+
+EVENT_PATHS = ['data/kinetic_sync_list.csv']
+OUTPUT_PATH = 'data/event_sar_passes.csv'
+EXTENT_PAD_DEG = 0.5
+
+
+def load_events(paths):
+    frames = []
+    for path in paths:
+        df = pd.read_csv(path)
+        if 'LAT' not in df and 'LAT_BEFORE' in df:
+            # Dark gaps: the vessel was last seen at the fix before the gap
+            df['LAT'], df['LON'] = df['LAT_BEFORE'], df['LON_BEFORE']
+        df.insert(0, 'EVENT_SOURCE', os.path.basename(path))
+        frames.append(df)
+    events = pd.concat(frames, ignore_index=True)
+    events.insert(0, 'EVENT_ID', range(len(events)))
+    return events
+
+
+def run_join(paths, window=PASS_WINDOW, refresh=False, fetch=False, url=STAC_URL,
+             catalog_path=CATALOG_PATH, output_path=OUTPUT_PATH):
+    events = load_events(paths)
+    times = event_times(events)
+    print(f"[*] {len(events)} events from {len(paths)} table(s), {times.min()} .. {times.max()}")
+
+    bbox = [events['LON'].min() - EXTENT_PAD_DEG, events['LAT'].min() - EXTENT_PAD_DEG,
+            events['LON'].max() + EXTENT_PAD_DEG, events['LAT'].max() + EXTENT_PAD_DEG]
+    catalog = SARCatalog(catalog_path, url=url)
+    try:
+        if refresh:
+            queried = catalog.refresh(bbox, times.min() - window, times.max() + window)
+            print(f"[*] {queried} catalogue tiles refreshed")
+        scenes = catalog.scenes(bbox, times.min() - window, times.max() + window)
+    finally:
+        catalog.close()
+    print(f"[*] {len(scenes)} candidate SAR passes in the local catalogue")
+
+    t0 = time.perf_counter()
+    joined = join_events_to_passes(events, scenes, window)
+    print(f"[+] {len(joined)} event/pass pairs, {joined['EVENT_ID'].nunique()} of {len(events)} events covered "
+          f"({time.perf_counter() - t0:.2f}s)")
+
+    if fetch and len(joined):
+        load_dotenv()
+        fetcher = SAREvidenceFetcher(os.getenv("SH_CLIENT_ID"), os.getenv("SH_CLIENT_SECRET"))
+        joined = fetcher.fetch_events(joined)
+
+    joined.to_csv(output_path, index=False)
+    print(f"[+] Saved to {output_path}")
+    return joined
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Join flagged AIS events to covering Sentinel-1 passes.")
+    parser.add_argument('events', nargs='*', default=EVENT_PATHS, help="Event CSVs (default: kinetic sync list)")
+    parser.add_argument('--window-hours', type=float, default=PASS_WINDOW.total_seconds() / 3600)
+    parser.add_argument('--refresh', action='store_true', help="Refresh the SAR catalogue over the events' extent first")
+    parser.add_argument('--url', default=STAC_URL, help="STAC search endpoint used by --refresh")
+    parser.add_argument('--fetch', action='store_true', help="Download (or reuse cached) evidence chips for every pair")
+    parser.add_argument('--out', default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    run_join(args.events, pd.Timedelta(hours=args.window_hours), args.refresh, args.fetch, args.url, output_path=args.out)
@@ -0,0 +1,266 @@
+"""
+Streaming gray-zone monitor.
+Consumes a live AIS feed (TCP socket, a tailed file, or a replayed CSV/NMEA
+file or daily zip) and runs the main_monitor decision on every position
+report: V_dev against the fleet baseline AND inside the hot zone of a
+pipeline or cable. Messages are micro-batched: whatever queued up while the
+previous batch was being evaluated is decided in one vectorized pass, so
+throughput grows with load while a quiet feed is answered line by line.
+Every alert carries the end-to-end latency of its message (arrival ->
+decision -> alert written).
+
+Usage:
+    python src/stream_monitor.py --connect 127.0.0.1:10110
+    python src/stream_monitor.py --tail data/live_feed.csv
+    python src/stream_monitor.py --replay data/raw_ais/AIS_2024_01_19.zip --speed 600
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+import pandas as pd
+from models.ais_stream import LineParser, socket_source, tail_source, replay_source
+from models.v_dev_engine import calculate_v_dev_batch
+from models.geospatial_filter import HOT_ZONE_M
+from models.baseline_store import FleetBaselineStore, BASELINE_STORE_PATH
+from models.infrastructure import get_registry, PIPE_ZIP, CABLE_ZIP
+from models.vessel_state import VesselStateTable, MAX_VESSELS, IDLE_S
+
+V_DEV_ALERT = 3.0          # Same threshold as main_monitor
+BATCH_MAX = 20_000         # Most messages decided in one vectorized pass
+QUEUE_BLOCKS = 256         # Read blocks buffered before the source is throttled
+LATENCY_WINDOW = 100_000   # Recent per-message latencies kept for percentiles
+IDLE_CHECK_S = 600         # Feed time between idle-vessel sweeps
+REPORT_S = 10.0
+ALERTS_PATH = 'data/stream_alerts.jsonl'
+
+
+def _iso(t):
+    return pd.Timestamp(int(t), unit='s').strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class StreamMonitor:
+    def __init__(self, infrastructure, baseline=None, buffer_m=HOT_ZONE_M, v_dev_alert=V_DEV_ALERT,
+                 max_vessels=MAX_VESSELS, idle_s=IDLE_S, alerts_path=ALERTS_PATH):
+        """infrastructure: a (Zoned)ProximityEngine; baseline: FleetBaselineStore or None."""
+        self.infra = infrastructure
+        self.baseline = baseline
+        self.buffer_m = buffer_m
+        self.v_dev_alert = v_dev_alert
+        self.parser = LineParser()
+        self.vessels = VesselStateTable(max_vessels=max_vessels, idle_s=idle_s)
+        self._idle_checked = None
+        self.alerts_path = alerts_path
+
+        self.latency = np.zeros(LATENCY_WINDOW)
+        self.n_latency = 0
+        self.messages = self.positions = self.alerts = self.batches = 0
+        self.started = time.perf_counter()
+
+    def _record_latency(self, latency):
+        latency = latency[-LATENCY_WINDOW:]
+        idx = (self.n_latency + np.arange(len(latency))) % LATENCY_WINDOW
+        self.latency[idx] = latency
+        self.n_latency += len(latency)
+
+    def decide(self, mmsi, t, lat, lon, sog, vessel_type):
+        """Vectorized V_dev + proximity decision. Returns (v_score, distance_m, nearest_id, risk)."""
+        # 1. Check Speed Anomaly (Stage 2)
+        if self.baseline is not None:
+            month = t.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+            found = self.baseline.lookup_batch(vessel_type, lat, lon, month)
+            v_score = calculate_v_dev_batch(sog, found['type_avg_speed'], found['type_std_dev'].fillna(0))
+        else:
+            v_score = np.zeros(len(sog))
+
+        # 2. Check Proximity (Stage 3): only pings inside the buffer need a distance
+        distance, nearest = self.infra.nearest(lon, lat, max_distance=self.buffer_m)
+
+        # 3. Decision Logic (The Attribution Logic)
+        risk = (v_score > self.v_dev_alert) & (distance <= self.buffer_m)
+        return v_score, distance, nearest, risk
+
+    def process(self, blocks):
+        """Decides one micro-batch of (recv_t, lines) blocks; returns the alerts it opened."""
+        rows, recv, static = [], [], []
+        parse = self.parser.parse
+        for recv_t, lines in blocks:
+            self.messages += len(lines)
+            for line in lines:
+                msg = parse(line)
+                if msg is None or msg[0] <= 0:
+                    continue
+                if msg[2] is None:
+                    static.append((msg[0], msg[7]))
+                    continue
+                rows.append(msg)
+                recv.append(recv_t)
+        self.batches += 1
+        if static:
+            # Static reports: remember the ship type for later position reports
+            self.vessels.set_types(*(np.array(c) for c in zip(*static)))
+        if not rows:
+            return []
+
+        mmsi, t, lat, lon, sog, cog, _, vtype = (np.array(c) for c in zip(*rows))
+        mmsi, t = mmsi.astype(np.int64), t.astype(np.int64)
+        lat, lon, sog, cog = (c.astype(float) for c in (lat, lon, sog, cog))
+        vtype = np.array([-1 if v is None else v for v in vtype], dtype=np.int64)
+        known = np.where(vtype >= 0, vtype, self.vessels.vessel_types(mmsi))
+        # Unknown ship type falls back to the "not available" (0) peer group
+        v_score, distance, nearest, risk = self.decide(mmsi, t, lat, lon, sog, np.maximum(known, 0))
+
+        # 4. Per-vessel state: one alert per episode, not per ping
+        opened, zone_since = self.vessels.update(mmsi, t, lat, lon, sog, cog, vtype,
+                                                 distance <= self.buffer_m, risk)
+        opened = np.flatnonzero(opened)
+        alerts = [{
+            'mmsi': int(mmsi[i]),
+            'time': _iso(t[i]),
+            'lat': float(lat[i]), 'lon': float(lon[i]), 'sog': float(sog[i]),
+            'vessel_type': int(known[i]) if known[i] >= 0 else None,
+            'v_dev_score': round(float(v_score[i]), 2),
+            'distance_m': round(float(distance[i]), 1),
+            'nearest': nearest[i],
+            'zone_entered': _iso(zone_since[i]),
+        } for i in opened]
+        self._emit(alerts, np.array(recv), opened)
+        self.positions += len(rows)
+
+        now = int(t.max())
+        if self._idle_checked is None or now - self._idle_checked >= IDLE_CHECK_S:
+            self.vessels.evict_idle(now)
+            self._idle_checked = now
+        return alerts
+
+    def _emit(self, alerts, recv, opened):
+        done = time.perf_counter()
+        latency = done - recv
+        for alert, i in zip(alerts, opened):
+            alert['latency_ms'] = round(latency[i] * 1000, 2)
+            print(f"[!] ALERT {alert['mmsi']} @ {alert['time']}: V_dev {alert['v_dev_score']} "
+                  f"{alert['distance_m']:.0f} m from {alert['nearest']} (latency {alert['latency_ms']} ms)")
+        if alerts and self.alerts_path:
+            os.makedirs(os.path.dirname(self.alerts_path) or '.', exist_ok=True)
+            with open(self.alerts_path, 'a') as f:
+                f.writelines(json.dumps(a) + '\n' for a in alerts)
+        # Latency covers the whole path for every position report, alerting or not
+        self._record_latency(time.perf_counter() - recv)
+        self.alerts += len(alerts)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        lat_ms = self.latency[:min(self.n_latency, LATENCY_WINDOW)] * 1000
+        p50, p99, pmax = np.percentile(lat_ms, [50, 99, 100]) if len(lat_ms) else (np.nan,) * 3
+        mem = self.vessels.memory_report()
+        per = f"{mem['bytes_per_vessel']:.0f} B each" if mem['bytes_per_vessel'] is not None \
+            else f"{mem['array_bytes'] / 1e6:.1f} MB preallocated"
+        return (f"{self.messages:,} msgs ({self.messages / max(elapsed, 1e-9):,.0f}/s), "
+                f"{self.positions:,} positions in {self.batches:,} batches, "
+                f"{mem['vessels']:,} vessels ({per}), "
+                f"latency p50 {p50:.2f} / p99 {p99:.2f} / max {pmax:.2f} ms, {self.alerts} alert(s)")
+
+    async def run(self, source, report_s=REPORT_S):
+        """
+        Consumes an ais_stream source until it ends (or the task is cancelled).
+        An error from the source (refused or reset connection, undecodable
+        block) is raised here once the messages before it are processed.
+        """
+        queue = asyncio.Queue(maxsize=QUEUE_BLOCKS)
+
+        async def produce():
+            try:
+                async for block in source:
+                    await queue.put(block)
+            finally:
+                await queue.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        next_report = time.perf_counter() + report_s
+        try:
+            finished = False
+            while not finished:
+                # Micro-batch: everything that queued up while the last batch ran
+                blocks, n = [], 0
+                block = await queue.get()
+                while True:
+                    if block is None:
+                        finished = True
+                        break
+                    blocks.append(block)
+                    n += len(block[1])
+                    if n >= BATCH_MAX or queue.empty():
+                        break
+                    block = queue.get_nowait()
+                if blocks:
+                    self.process(blocks)
+                if time.perf_counter() >= next_report:
+                    print(f"[*] {self.summary()}")
+                    next_report = time.perf_counter() + report_s
+            # The source has ended: re-raise whatever ended it
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+
+def load_baseline(path=BASELINE_STORE_PATH):
+    if not os.path.exists(path):
+        print(f"[!] No fleet baseline at {path} (build it with src/build_baselines.py); V_dev is disabled.")
+        return None
+    store = FleetBaselineStore.load(path)
+    print(f"[+] Fleet baseline loaded: {len(store.acc.table):,} peer groups over {len(store.days)} day(s)")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time gray-zone monitor over a live or replayed AIS feed.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument('--connect', metavar='HOST:PORT', help="TCP feed of CSV rows or !AIVDM sentences")
+    src.add_argument('--tail', metavar='PATH', help="Follow a file that is being appended to")
+    src.add_argument('--replay', metavar='PATH', help="Daily AIS zip or CSV/NMEA file to replay")
+    parser.add_argument('--from-start', action='store_true', help="With --tail, read the existing lines first")
+    parser.add_argument('--speed', type=float, default=0.0, help="Replay speed (x real time, 0 = flat out)")
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('LON_MIN', 'LAT_MIN', 'LON_MAX', 'LAT_MAX'),
+                        help="With --replay of a zip, only replay this area")
+    parser.add_argument('--buffer-m', type=float, default=HOT_ZONE_M)
+    parser.add_argument('--v-dev', type=float, default=V_DEV_ALERT)
+    parser.add_argument('--max-vessels', type=int, default=MAX_VESSELS)
+    parser.add_argument('--idle-hours', type=float, default=IDLE_S / 3600,
+                        help="Forget vessels silent for this long (feed time)")
+    parser.add_argument('--layers', nargs='+', default=['pipe', 'cable'], choices=['pipe', 'cable'])
+    parser.add_argument('--baseline', default=BASELINE_STORE_PATH)
+    parser.add_argument('--alerts', default=ALERTS_PATH, help="JSON-lines alert log ('' to disable)")
+    parser.add_argument('--report-s', type=float, default=REPORT_S)
+    args = parser.parse_args()
+
+    infra = get_registry(PIPE_ZIP, CABLE_ZIP).engine(tuple(args.layers))
+    monitor = StreamMonitor(infra, load_baseline(args.baseline), buffer_m=args.buffer_m,
+                            v_dev_alert=args.v_dev, max_vessels=args.max_vessels,
+                            idle_s=args.idle_hours * 3600, alerts_path=args.alerts)
+
+    if args.connect:
+        host, port = args.connect.rsplit(':', 1)
+        source = socket_source(host, int(port))
+    elif args.tail:
+        source = tail_source(args.tail, from_start=args.from_start)
+    else:
+        source = replay_source(args.replay, speed=args.speed, bbox=args.bbox)
+
+    print(f"[*] Monitoring {args.connect or args.tail or args.replay} "
+          f"(hot zone {args.buffer_m / 1000:g} km, V_dev > {args.v_dev:g})...")
+    try:
+        asyncio.run(monitor.run(source, report_s=args.report_s))
+    except KeyboardInterrupt:
+        print("\n[*] Stopped.")
+    except Exception as e:
+        print(f"[-] Feed failed: {e!r}")
+        print(f"[+] {monitor.summary()}")
+        raise SystemExit(1)
+    print(f"[+] {monitor.summary()}")
+
+
+if __name__ == "__main__":
+    main()
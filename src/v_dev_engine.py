@@ -1,69 +1,80 @@
-import csv
-import statistics
-from collections import defaultdict
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from models.baseline_stats import SpeedAccumulator
 
 INPUT_PATH = 'data/cable_suspects.csv'
 OUTPUT_PATH = 'data/anomalies_flagged.csv'
+BASELINE_PATH = 'data/speed_baseline.json'
+CHUNK_ROWS = 250_000
 
-def calculate_v_dev():
-    vessels = defaultdict(list)
-    
+def _read_chunks(path):
+    # Raw strings so every original column is written back exactly as read
+    return pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS)
+
+def build_baseline(path=INPUT_PATH):
+    """One streaming pass: per-type SOG count/mean/M2, never holding the rows in memory."""
+    acc = SpeedAccumulator()
+    for chunk in _read_chunks(path):
+        acc.update(chunk['VesselType'], pd.to_numeric(chunk['SOG'], errors='coerce'))
+    return acc
+
+def calculate_v_dev(baseline_path=BASELINE_PATH, save_baseline=None):
     # 1. Group SOG by Vessel Type to find "Normal" behavior
-    type_speeds = defaultdict(list)
-    
-    with open(INPUT_PATH, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        data = list(reader)
-        for row in data:
-            sog = float(row['SOG'])
-            v_type = row['VesselType']
-            type_speeds[v_type].append(sog)
-            vessels[row['MMSI']].append(row)
+    # Either a persisted (possibly multi-day, merged) baseline, or one built from the input
+    if baseline_path and os.path.exists(baseline_path):
+        baseline = SpeedAccumulator.load(baseline_path)
+        print(f"[*] Using persisted baseline: {baseline_path}")
+    else:
+        if baseline_path:
+            print(f"[!] No baseline at {baseline_path}; building one from {INPUT_PATH} only.")
+        baseline = build_baseline(INPUT_PATH)
+        # Written only on request, so a merged multi-day baseline is never clobbered
+        if save_baseline:
+            baseline.save(save_baseline)
+            print(f"[*] Input baseline saved to {save_baseline}")
 
-    # 2. Calculate Mean and StdDev for each type
-    stats_map = {}
-    for v_type, speeds in type_speeds.items():
-        if len(speeds) > 1:
-            stats_map[v_type] = {
-                'mean': statistics.mean(speeds),
-                'stdev': statistics.stdev(speeds)
-            }
-        else:
-            stats_map[v_type] = {'mean': speeds[0], 'stdev': 0}
+    # 2. Mean and StdDev for each type
+    stats_map = baseline.stats()
 
-    # 3. Calculate Z-Score (V_dev) for each ping
+    # 3. Calculate Z-Score (V_dev) for each ping, streaming chunk by chunk
     # Formula: Z = (SOG - Mean) / StDev
-    anomalies = []
-    for row in data:
-        v_type = row['VesselType']
-        sog = float(row['SOG'])
-        mean = stats_map[v_type]['mean']
-        stdev = stats_map[v_type]['stdev']
-        
+    tmp_path = OUTPUT_PATH + '.tmp'
+    n_anomalies = 0
+    for chunk in _read_chunks(INPUT_PATH):
+        sog = pd.to_numeric(chunk['SOG'], errors='coerce').to_numpy()
+        mean = chunk['VesselType'].map(stats_map['mean']).to_numpy(dtype=float)
+        stdev = chunk['VesselType'].map(stats_map['stdev']).to_numpy(dtype=float)
+
         # Avoid division by zero
-        z_score = (sog - mean) / stdev if stdev > 0 else 0
-        
+        z_score = np.where(stdev > 0, (sog - mean) / np.where(stdev > 0, stdev, 1.0), 0.0)
+
         # We look for NEGATIVE Z-scores (meaning slower than average)
         # Specifically Z < -1.5 is a "Strong Loitering Signal"
-        """In this framework, $V_{dev}$ (Velocity Deviation) serves as the primary kinematic indicator of loitering. 
-            By selecting pings with a Z-score of less than -1.5, we filter for vessels operating at the bottom 6% of their peer-group's recorded speed. 
+        """In this framework, $V_{dev}$ (Velocity Deviation) serves as the primary kinematic indicator of loitering.
+            By selecting pings with a Z-score of less than -1.5, we filter for vessels operating at the bottom 6% of their peer-group's recorded speed.
             This isolates vessels that are likely stationary or engaged in subsea operations, rather than those simply transitioning through the corridor."""
-        if z_score < -1.5:
-            row['Z_Score'] = round(z_score, 2)
-            row['V_Mean'] = round(mean, 2)
-            anomalies.append(row)
+        flagged = z_score < -1.5
+        anomalies = chunk[flagged].assign(Z_Score=z_score[flagged].round(2), V_Mean=mean[flagged].round(2))
+
+        # 4. Save High-Interest Anomalies (appended per chunk)
+        if len(anomalies):
+            anomalies.to_csv(tmp_path, mode='a' if n_anomalies else 'w', header=not n_anomalies, index=False)
+            n_anomalies += len(anomalies)
 
-    # 4. Save High-Interest Anomalies
-    if anomalies:
-        headers = list(data[0].keys()) + ['Z_Score', 'V_Mean']
-        with open(OUTPUT_PATH, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(anomalies)
-        print(f"[!] Analysis Complete: Found {len(anomalies)} anomalous slow-speed pings.")
+    if n_anomalies:
+        os.replace(tmp_path, OUTPUT_PATH)
+        print(f"[!] Analysis Complete: Found {n_anomalies} anomalous slow-speed pings.")
         print(f"Results saved to {OUTPUT_PATH}")
     else:
         print("No significant speed deviations found.")
 
 if __name__ == "__main__":
-    calculate_v_dev()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Flag slow-speed anomalies (V_dev) in the cable suspects.")
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help="Persisted per-type baseline to score against (e.g. a merged backfill baseline)")
+    parser.add_argument('--save-baseline', default=None, metavar='PATH',
+                        help="Save the baseline built from the input when none is loaded")
+    args = parser.parse_args()
+    calculate_v_dev(args.baseline, args.save_baseline)
@@ -0,0 +1,122 @@
+"""
+SARCatalog against a local mock STAC server (paged POST/GET 'next' links).
+Run from the repository root: python -m pytest tests
+"""
+import os
+import sys
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from models.sar_catalog import SARCatalog, search_tiles  # noqa: E402
+
+LON, LAT = -70.5, 42.4
+
+
+def _feature(scene_id, start):
+    start = pd.Timestamp(start)
+    end = start + pd.Timedelta(seconds=25)
+    ring = [[LON - 1, LAT - 1], [LON + 1, LAT - 1], [LON + 1, LAT + 1], [LON - 1, LAT + 1], [LON - 1, LAT - 1]]
+    return {'type': 'Feature', 'id': scene_id, 'collection': 'SENTINEL-1-GRD',
+            'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+            'bbox': [LON - 1, LAT - 1, LON + 1, LAT + 1],
+            'properties': {'datetime': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                           'start_datetime': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                           'end_datetime': end.strftime('%Y-%m-%dT%H:%M:%SZ')}}
+
+
+PAGES = [_feature('S1_A', '2024-01-19T10:00:00'),
+         _feature('S1_B', '2024-01-19T22:00:00'),
+         _feature('S1_C', '2024-01-20T10:00:00')]
+
+
+class MockSTAC(BaseHTTPRequestHandler):
+    """Page 1 by POST, page 2 by a merged POST body, page 3 by a GET link."""
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, page):
+        body = json.dumps(page).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        MockSTAC.requests.append(('POST', body))
+        base = f"http://{self.headers['Host']}"
+        if body.get('token') == 'p2':
+            self._send({'features': [PAGES[1]],
+                        'links': [{'rel': 'next', 'method': 'GET', 'href': f"{base}/search?page=3"}]})
+        else:
+            self._send({'features': [PAGES[0]],
+                        'links': [{'rel': 'next', 'method': 'POST', 'href': f"{base}/search",
+                                   'body': {'token': 'p2'}, 'merge': True}]})
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        MockSTAC.requests.append(('GET', query))
+        self._send({'features': [PAGES[2]] if query.get('page') == ['3'] else [], 'links': []})
+
+
+class SARCatalogTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), MockSTAC)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/search"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        MockSTAC.requests = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.catalog = SARCatalog(os.path.join(self.tmp.name, 'catalog.sqlite'), url=self.url, max_workers=2)
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmp.cleanup()
+
+    def test_search_follows_post_and_get_pages(self):
+        features = self.catalog.search([LON, LAT, LON, LAT], '2024-01-19', '2024-01-21')
+        self.assertEqual([f['id'] for f in features], ['S1_A', 'S1_B', 'S1_C'])
+        self.assertEqual([m for m, _ in MockSTAC.requests], ['POST', 'POST', 'GET'])
+        # The merged POST body keeps the original search
+        second = MockSTAC.requests[1][1]
+        self.assertEqual(second['token'], 'p2')
+        self.assertEqual(second['collections'], ['SENTINEL-1-GRD'])
+
+    def test_overlapping_refreshes_share_tiles(self):
+        self.assertEqual(len(search_tiles([LON - 0.3, LAT - 0.1, LON, LAT], '2024-01-19 03:00', '2024-01-19 09:00')), 1)
+        self.assertEqual(self.catalog.refresh([LON - 0.3, LAT - 0.1, LON, LAT], '2024-01-19 03:00', '2024-01-19 09:00'), 1)
+        n = len(MockSTAC.requests)
+        # Another event-derived bbox and time range inside the same grid tile: served from the cache
+        self.assertEqual(self.catalog.refresh([LON, LAT, LON + 0.2, LAT + 0.2], '2024-01-20 01:00', '2024-01-21'), 0)
+        self.assertEqual(len(MockSTAC.requests), n)
+        self.assertEqual(len(self.catalog.scenes()), 3)
+
+    def test_covering_passes_uses_exact_times(self):
+        self.catalog.refresh([LON, LAT, LON, LAT], '2024-01-19', '2024-01-20')
+        window = pd.Timedelta(hours=1)
+        # S1_A ends at 10:00:25; 30s beyond the window it must not match, whatever the R-tree rounding
+        late = pd.Timestamp('2024-01-19T10:00:25') + window + pd.Timedelta(seconds=30)
+        self.assertTrue(self.catalog.covering_passes(LON, LAT, late, window).empty)
+        edge = pd.Timestamp('2024-01-19T10:00:25') + window
+        self.assertEqual(self.catalog.covering_passes(LON, LAT, edge, window)['scene_id'].tolist(), ['S1_A'])
+
+
+if __name__ == '__main__':
+    unittest.main()